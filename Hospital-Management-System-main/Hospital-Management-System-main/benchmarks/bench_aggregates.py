@@ -0,0 +1,144 @@
+"""
+Dashboard reads from AnalyticsTotals versus the GROUP BY scans they replace, and the write-side cost.
+
+Seeds the source tables, rebuilds the totals, then times each dashboard query
+both ways. The write side compares Finance.track_revenue, which now also
+updates the revenue totals and the day's rollup bucket, with the bare INSERT
+it used to run; rebuild and check are timed once.
+
+    python benchmarks/bench_aggregates.py [--rows 1000000] [--repeat 20] [--rtt 0.0005]
+"""
+import argparse
+import random
+import time
+
+from common import measure, print_table, remove_database, use_sqlite
+
+import modules.aggregates as aggregates
+import modules.database as database
+from modules.finance import Finance
+from modules.pharmacy import PRESCRIPTION_TOTALS_QUERY
+
+DEPARTMENTS = 40
+MEDICATIONS = 2000
+SOURCES = ['insurance', 'out-of-pocket', 'government']
+CATEGORIES = ['salaries', 'utilities', 'maintenance', 'equipment']
+
+SCANS = {
+    "department workload": """
+        SELECT DepartmentName, COUNT(AppointmentID) AS PatientCount
+        FROM Appointments
+        JOIN Departments ON Appointments.Department = Departments.DepartmentName
+        GROUP BY DepartmentName
+    """,
+    "staff by role": "SELECT Role, COUNT(StaffID) AS StaffCount FROM Staff GROUP BY Role",
+    "medication usage": """
+        SELECT MedicationName, SUM(PrescriptionCount) AS TotalPrescriptions
+        FROM PrescriptionTrends
+        JOIN PharmacyInventory ON PrescriptionTrends.MedicationID = PharmacyInventory.MedicationID
+        GROUP BY MedicationName
+    """,
+    "revenue by source": "SELECT Source, SUM(Amount) AS TotalAmount FROM Revenue GROUP BY Source",
+    "profitability": "SELECT (SELECT SUM(Amount) FROM Revenue) AS TotalRevenue, (SELECT SUM(Amount) FROM Costs) AS TotalCost",
+}
+
+TOTALS = {
+    "department workload": """
+        SELECT Departments.DepartmentName, SUM(AnalyticsTotals.Entries) AS PatientCount
+        FROM AnalyticsTotals
+        JOIN Departments ON AnalyticsTotals.GroupKey = Departments.DepartmentName
+        WHERE AnalyticsTotals.Metric = 'appointments_by_department' AND AnalyticsTotals.Entries > 0
+        GROUP BY Departments.DepartmentName
+    """,
+    "staff by role": "SELECT GroupKey AS Role, Entries AS StaffCount FROM AnalyticsTotals WHERE Metric = 'staff_by_role' AND Entries > 0",
+    "medication usage": PRESCRIPTION_TOTALS_QUERY,
+    "revenue by source": """
+        SELECT GroupKey AS Source, Amount AS TotalAmount FROM AnalyticsTotals
+        WHERE Metric = 'revenue_by_source' AND Entries > 0
+    """,
+    "profitability": """
+        SELECT (SELECT SUM(Amount) FROM AnalyticsTotals WHERE Metric = 'revenue_by_source') AS TotalRevenue,
+               (SELECT SUM(Amount) FROM AnalyticsTotals WHERE Metric = 'costs_by_category') AS TotalCost
+    """,
+}
+
+
+def seed(rows):
+    rnd = random.Random(0)
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, "INSERT INTO Departments (DepartmentName) VALUES (?)",
+                             ((f"dept{i}",) for i in range(DEPARTMENTS)))
+        database.executemany(cursor, "INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES (?, ?, ?)",
+                             ((f"med{i}", 1000, 10) for i in range(MEDICATIONS)))
+        database.executemany(cursor, "INSERT INTO Staff (Username, Role) VALUES (?, ?)",
+                             ((f"staff{i}", rnd.choice(['doctor', 'nurse', 'admin'])) for i in range(rows // 100)))
+        database.executemany(cursor, """
+            INSERT INTO Appointments (Doctor, Patient, Date, Time, Room, Department, IsEmergency)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+        """, ((f"dr{i % 500}", f"patient{i}", "2024-01-01", "09:00", "1", f"dept{rnd.randrange(DEPARTMENTS)}")
+              for i in range(rows)), batch_size=50_000)
+        database.executemany(cursor, "INSERT INTO PrescriptionTrends (MedicationID, PrescriptionCount) VALUES (?, ?)",
+                             ((rnd.randrange(1, MEDICATIONS + 1), rnd.randrange(1, 5)) for _ in range(rows // 2)),
+                             batch_size=50_000)
+        database.executemany(cursor, "INSERT INTO Revenue (Source, Amount, Date) VALUES (?, ?, '2024-01-01')",
+                             ((rnd.choice(SOURCES), rnd.randrange(100, 10_000)) for _ in range(rows // 2)), batch_size=50_000)
+        database.executemany(cursor, "INSERT INTO Costs (Category, Amount, Date) VALUES (?, ?, '2024-01-01')",
+                             ((rnd.choice(CATEGORIES), rnd.randrange(100, 10_000)) for _ in range(rows // 2)), batch_size=50_000)
+        conn.commit()
+
+
+def query(sql):
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        return cursor.fetchall()
+
+
+def bare_revenue_insert(source, amount):
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            INSERT INTO Revenue (Source, Amount, Date)
+            VALUES (?, ?, {database.get_dialect().today})
+        """, (source, amount))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="appointments; the other tables scale from it")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--rtt", type=float, default=None, help="simulated round trip in seconds, e.g. 0.0005")
+    args = parser.parse_args()
+
+    path = use_sqlite()
+    try:
+        seed(args.rows)
+        use_sqlite(path, rtt=args.rtt)
+        started = time.perf_counter()
+        aggregates.rebuild()
+        print(f"rebuild: {time.perf_counter() - started:.2f} s")
+        started = time.perf_counter()
+        mismatches = aggregates.check()
+        print(f"check:   {time.perf_counter() - started:.2f} s, {len(mismatches)} mismatches\n")
+
+        results = {}
+        for name in SCANS:
+            assert sorted(map(tuple, query(SCANS[name]))) == sorted(map(tuple, query(TOTALS[name]))), name
+            results[f"{name}: GROUP BY scan"] = measure(lambda i: query(SCANS[name]), args.repeat)
+            results[f"{name}: totals"] = measure(lambda i: query(TOTALS[name]), args.repeat)
+        print_table(f"Dashboard reads, {args.rows} appointments", results)
+
+        finance = Finance()
+        print_table("Revenue writes", {
+            "bare INSERT": measure(lambda i: bare_revenue_insert(SOURCES[i % 3], 100), args.repeat * 10),
+            "track_revenue (INSERT + totals + rollup)": measure(
+                lambda i: finance.track_revenue(SOURCES[i % 3], 100), args.repeat * 10),
+        })
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
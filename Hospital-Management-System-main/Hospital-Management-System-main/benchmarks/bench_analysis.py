@@ -0,0 +1,86 @@
+"""
+Patient Analysis over a large Patient/Treatment join: whole DataFrame versus chunked streaming.
+
+Seeds --patients patients with --treatments treatments between them, then runs
+Admin.perform_analysis(1) both ways and reports time, peak traced memory
+(tracemalloc, which sees the NumPy buffers behind the DataFrames) and whether
+the printed output is identical. Plots go to the Agg backend.
+
+    python benchmarks/bench_analysis.py [--patients 200000] [--treatments 2000000] [--chunk-size 50000]
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+import tracemalloc
+import warnings
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from common import remove_database, use_sqlite
+
+import modules.database as database
+from modules.analytics import CHUNK_SIZE
+from modules.user import Admin
+
+DISEASES = [None, "Asthma", "Diabetes", "Hypertension", "None"]
+LOCATIONS = ["Cairo", "Giza", "Alexandria", "Aswan", "Luxor"]
+
+
+def seed(patients, treatments):
+    rnd = random.Random(0)
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, """
+            INSERT INTO Users (Username, Password, Role, ChronicDisease) VALUES (?, ?, ?, ?)
+        """, ((f"patient{i}", "x", "Patient", rnd.choice(DISEASES)) for i in range(patients)), batch_size=50_000)
+        database.executemany(cursor, """
+            INSERT INTO Patient (Username, Age, Gender, GeographicLocation) VALUES (?, ?, ?, ?)
+        """, ((f"patient{i}", rnd.randrange(100), rnd.choice(["Male", "Female"]), rnd.choice(LOCATIONS))
+              for i in range(patients)), batch_size=50_000)
+        database.executemany(cursor, """
+            INSERT INTO Treatment (PatientID, Condition, LengthOfStay, Readmission) VALUES (?, ?, ?, ?)
+        """, ((rnd.randrange(1, patients + 1), "Observation", rnd.randrange(1, 30), rnd.random() < 0.2)
+              for _ in range(treatments)), batch_size=50_000)
+        conn.commit()
+
+
+def run(admin, **options):
+    output = io.StringIO()
+    tracemalloc.start()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(output), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        admin.perform_analysis(1, **options)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    plt.close("all")
+    return output.getvalue(), seconds, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patients", type=int, default=200_000)
+    parser.add_argument("--treatments", type=int, default=2_000_000)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    path = use_sqlite()
+    try:
+        seed(args.patients, args.treatments)
+        admin = Admin("admin", "admin", "Admin")
+        whole, seconds, peak = run(admin)
+        print(f"{'whole DataFrame':<20} {seconds:7.2f} s  peak {peak:8.1f} MB")
+        streamed, seconds, peak = run(admin, streaming=True, chunk_size=args.chunk_size)
+        print(f"{'streaming':<20} {seconds:7.2f} s  peak {peak:8.1f} MB  (chunks of {args.chunk_size})")
+        print("output identical" if streamed == whole else "OUTPUT DIFFERS")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
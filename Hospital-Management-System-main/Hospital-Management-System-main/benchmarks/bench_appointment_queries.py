@@ -0,0 +1,70 @@
+"""
+Cost of one doctor's appointment view as the Appointments table grows.
+
+The doctor always has the same number of appointments; only the rest of the
+table grows. Compares the old load-everything-and-filter path with the indexed,
+paginated Appointment.find_appointments.
+
+    python benchmarks/bench_appointment_queries.py [--sizes 1000,100000,1000000]
+"""
+import argparse
+
+from common import measure, print_table, remove_database, use_sqlite
+
+import modules.database as database
+from modules.appointment import Appointment
+
+DOCTOR = "dr_house"
+DOCTOR_APPOINTMENTS = 100
+
+
+def seed(rows):
+    def generate():
+        for i in range(rows):
+            doctor = DOCTOR if i % max(1, rows // DOCTOR_APPOINTMENTS) == 0 else f"dr{i % 500}"
+            yield (doctor, f"patient{i % 20000}", f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+                   f"{8 + i % 10:02d}:00", str(100 + i % 400), "Cardiology", 0)
+
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, """
+            INSERT INTO Appointments (Doctor, Patient, Date, Time, Room, Department, IsEmergency)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, generate(), batch_size=10_000)
+        conn.commit()
+
+
+def load_and_filter(i):
+    return [details for details in Appointment.load_appointments().values() if details['doctor'] == DOCTOR]
+
+
+def find_all_pages(i):
+    found, next_key = [], None
+    while True:
+        page, next_key = Appointment.find_appointments(doctor=DOCTOR, after=next_key)
+        found.extend(page.values())
+        if next_key is None:
+            return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        path = use_sqlite()
+        try:
+            seed(size)
+            results[f"{size:>10,} rows  find_appointments"] = measure(find_all_pages, args.repeat)
+            results[f"{size:>10,} rows  load_appointments + filter"] = measure(load_and_filter, max(1, args.repeat // 10))
+        finally:
+            remove_database(path)
+
+    print_table(f"Doctor view, {DOCTOR_APPOINTMENTS} appointments for the doctor (ms)", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Throughput of many desks sharing one process through modules.async_api.
+
+Each desk cycles through booking an appointment, taking a payment, dispensing
+a medication, looking up a balance and listing a doctor's appointments. "one terminal" runs the same operations one after another, as the
+input() loop in main.py does; the async runs let every desk await its
+operations concurrently on a BoundedExecutor with the given number of workers.
+Use --rtt to model a networked SQL Server. SQLite serializes writers and holds
+its write lock across the simulated round trips, so writes scale worse here
+than they would on SQL Server.
+
+    python benchmarks/bench_async.py [--operations 1000] [--desks 32] [--workers 1,4,8,16] [--rtt 0.001]
+"""
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+
+from common import quiet, remove_database, use_sqlite
+
+import modules.database as database
+import modules.schedule as schedule
+from modules.appointment import Appointment
+from modules.async_api import AsyncAppointment, AsyncFinance, AsyncPharmacy, BoundedExecutor
+from modules.finance import Finance
+from modules.pharmacy import Pharmacy
+
+DOCTORS = 500
+MEDICATIONS = 50
+
+
+def seed():
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, "INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES (?, ?, ?)",
+                             ((f"med{i}", 1_000_000, 10) for i in range(MEDICATIONS)))
+        conn.commit()
+
+
+def booking(i):
+    """
+    Arguments of the i-th booking; every booking gets a free slot.
+    """
+    doctor, slot = i % DOCTORS, i // DOCTORS
+    day = date(2024, 1, 1) + timedelta(days=slot // 20)
+    minute = 8 * 60 + (slot % 20) * 30
+    return (f"dr{doctor}", f"patient{i}", day.isoformat(), f"{minute // 60:02d}:{minute % 60:02d}",
+            f"room{doctor}", "General")
+
+
+def one_terminal(operations):
+    finance, pharmacy = Finance(), Pharmacy()
+    for i in range(operations):
+        kind = i % 5
+        if kind == 0:
+            Appointment(*booking(i)).book_appointment()
+        elif kind == 1:
+            finance.save_transaction(f"patient{i}", 'Appointment Payment', -200)
+        elif kind == 2:
+            pharmacy.dispense_medication(f"patient{i}", f"med{i % MEDICATIONS}", 1)
+        elif kind == 3:
+            finance.get_balance(f"patient{i - 2}")
+        else:
+            Appointment.find_appointments(doctor=f"dr{i % DOCTORS}")
+
+
+async def many_desks(operations, desks, workers):
+    executor = BoundedExecutor(max_workers=workers)
+    appointments = AsyncAppointment(executor)
+    finance = await AsyncFinance.create(executor=executor)
+    pharmacy = await AsyncPharmacy.create(executor=executor)
+
+    async def desk(number):
+        for i in range(number, operations, desks):
+            kind = i % 5
+            if kind == 0:
+                await appointments.book_appointment(*booking(i))
+            elif kind == 1:
+                await finance.save_transaction(f"patient{i}", 'Appointment Payment', -200)
+            elif kind == 2:
+                await pharmacy.dispense_medication(f"patient{i}", f"med{i % MEDICATIONS}", 1)
+            elif kind == 3:
+                await finance.get_balance(f"patient{i - 2}")
+            else:
+                await appointments.find_appointments(doctor=f"dr{i % DOCTORS}")
+
+    await asyncio.gather(*(desk(number) for number in range(desks)))
+    executor.shutdown()
+    return executor.stats()
+
+
+def measure_run(label, operations, run, pool_size, rtt):
+    path = use_sqlite(pool_size=pool_size)
+    try:
+        seed()
+        use_sqlite(path, rtt=rtt, pool_size=pool_size)
+        schedule.reset_index()
+        started = time.perf_counter()
+        with quiet():
+            run()
+        seconds = time.perf_counter() - started
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM Appointments")
+            booked = cursor.fetchone()[0]
+        print(f"{label:<28} {operations / seconds:8.0f} ops/s  ({seconds:6.2f} s, {booked} appointments)")
+    finally:
+        remove_database(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--operations", type=int, default=1000)
+    parser.add_argument("--desks", type=int, default=32)
+    parser.add_argument("--workers", default="1,4,8,16")
+    parser.add_argument("--rtt", type=float, default=None, help="simulated round trip in seconds")
+    args = parser.parse_args()
+
+    measure_run("one terminal", args.operations, lambda: one_terminal(args.operations), 1, args.rtt)
+    for workers in (int(w) for w in args.workers.split(",")):
+        measure_run(f"{args.desks} desks, {workers} workers", args.operations,
+                    lambda: asyncio.run(many_desks(args.operations, args.desks, workers)), workers, args.rtt)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Login cost: one Users row through AuthService versus loading the whole Users table.
+
+main() used to call User.load_users(), building a dict for every user, to read
+the role of the one who logged in. The script seeds --users users and times,
+for random usernames, the old path, AuthService.lookup with an empty cache (one
+primary-key seek) and with the profile cached, plus the peak memory of one
+login each way.
+
+    python benchmarks/bench_auth.py [--users 1000000] [--repeat 200] [--old-repeat 3] [--rtt 0.0005]
+"""
+import argparse
+import random
+import tracemalloc
+
+from common import measure, print_table, remove_database, use_sqlite
+
+import modules.database as database
+from modules.auth import AuthService
+from modules.user import USER_COLUMNS, User
+
+ROLES = ['Doctor', 'Nurse', 'Receptionist', 'Patient', 'Patient', 'Patient']
+
+
+def seed(count):
+    rnd = random.Random(0)
+    rows = ((f"user{i}", f"pw{i}", rnd.choice(ROLES), f"0100{i:07d}", rnd.randrange(18, 90),
+             rnd.choice(['Male', 'Female']), None, None, None, None, 'Egyptian') for i in range(count))
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, f"INSERT INTO Users ({', '.join(USER_COLUMNS)}) VALUES ({', '.join('?' for _ in USER_COLUMNS)})", rows)
+        conn.commit()
+
+
+def peak_mb(operation):
+    tracemalloc.start()
+    operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--old-repeat", type=int, default=3)
+    parser.add_argument("--rtt", type=float, default=None, help="simulated network round trip in seconds")
+    args = parser.parse_args()
+
+    path = use_sqlite(rtt=args.rtt)
+    try:
+        seed(args.users)
+        rnd = random.Random(1)
+        names = [f"user{rnd.randrange(args.users)}" for _ in range(args.repeat)]
+
+        def old_login(i):
+            users = User.load_users()
+            return users[names[i]]['role'].lower()
+
+        cold = AuthService()
+
+        def cold_login(i):
+            cold.invalidate()
+            return cold.role(names[i])
+
+        warm = AuthService()
+        for name in names:
+            warm.lookup(name)
+
+        results = {
+            "load_users() + pick one": measure(old_login, args.old_repeat),
+            "AuthService, not cached": measure(cold_login, args.repeat),
+            "AuthService, cached": measure(lambda i: warm.role(names[i]), args.repeat),
+        }
+        print_table(f"Role lookup at login, {args.users} users", results)
+        print(f"peak memory of one login: load_users() {peak_mb(lambda: old_login(0)):.1f} MB, "
+              f"AuthService {peak_mb(lambda: cold_login(0)):.3f} MB")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
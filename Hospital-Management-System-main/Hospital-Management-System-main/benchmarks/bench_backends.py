@@ -0,0 +1,67 @@
+"""
+Per-operation latency of the embedded SQLite backend versus SQL Server.
+
+The SQL Server side is a local SQLite stand-in that adds a simulated network
+round trip to every statement (see common.RemoteStandIn), so both columns run
+the same SQL and the difference is the cost of leaving the process.
+
+    python benchmarks/bench_backends.py [--repeat N] [--rtt-ms MS]
+"""
+import argparse
+
+from common import measure, print_table, quiet, remove_database, use_sqlite
+
+from modules.appointment import Appointment
+from modules.finance import Finance
+from modules.hospital import Hospital
+from modules.pharmacy import Pharmacy
+
+
+def run_operations(repeat):
+    with quiet():
+        hospital = Hospital("Benchmark Hospital")
+        hospital.add_department("Cardiology", "Heart")
+        for i in range(repeat):
+            hospital.add_room(1000 + i, "Single")
+        hospital.add_medication("Aspirin", repeat * 10, 5.0)
+        pharmacy = Pharmacy()
+    finance = Finance()
+
+    return {
+        "Hospital.allocate_room": measure(lambda i: hospital.allocate_room("Single"), repeat),
+        "Hospital.release_room": measure(lambda i: hospital.release_room(1000 + i), repeat),
+        "Appointment.book_appointment": measure(
+            lambda i: Appointment(f"dr{i % 20}", f"patient{i}", "2024-08-01", "10:00", 1000 + i, "Cardiology").book_appointment(),
+            repeat),
+        "Finance.deposit": measure(lambda i: finance.deposit(f"patient{i % 50}", 100), repeat),
+        "Finance.get_balance": measure(lambda i: finance.get_balance(f"patient{i % 50}"), repeat),
+        "Pharmacy.dispense_medication": measure(lambda i: pharmacy.dispense_medication(f"patient{i % 50}", "Aspirin", 1), repeat),
+        "Appointment.load_appointments": measure(lambda i: Appointment.load_appointments(), max(1, repeat // 10)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="simulated SQL Server round trip")
+    args = parser.parse_args()
+
+    results = {}
+    for label, rtt in (("sqlite", None), ("sqlserver (stand-in)", args.rtt_ms / 1000)):
+        path = use_sqlite(rtt=rtt)
+        try:
+            results[label] = run_operations(args.repeat)
+        finally:
+            remove_database(path)
+
+    for label, operations in results.items():
+        print_table(f"{label}, {args.repeat} operations each (ms)", operations)
+
+    baseline, embedded = results["sqlserver (stand-in)"], results["sqlite"]
+    print("Speed-up of embedded SQLite (mean latency):")
+    for name in embedded:
+        print(f"  {name}: {baseline[name]['mean_ms'] / embedded[name]['mean_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Booking throughput with double-booking checks: BookingIndex versus an SQL range check.
+
+Seeds a year of appointments, then books random slots in the first weeks of
+it for random doctors and rooms. "blind insert" is the old book_appointment
+with no check at all; "SQL check" looks for an overlapping booking with one
+range query per booking; "BookingIndex" checks its in-memory per-doctor and
+per-room slot lists.
+
+    python benchmarks/bench_booking.py [--appointments 200000] [--bookings 2000] [--rtt 0.0005]
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from common import quiet, remove_database, use_sqlite
+
+import modules.database as database
+from modules.schedule import SLOT_MINUTES, BookingConflict, BookingIndex
+
+DOCTORS = 300
+ROOMS = 200
+DAYS = 365
+
+
+def slot(rnd, days=DAYS):
+    minute = 8 * 60 + rnd.randrange(20) * 30
+    day = date(2024, 1, 1) + timedelta(days=rnd.randrange(days))
+    return day.isoformat(), f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def seed(count):
+    rnd = random.Random(0)
+
+    def generate():
+        for i in range(count):
+            day, start = slot(rnd)
+            yield (f"dr{rnd.randrange(DOCTORS)}", f"patient{i}", day, start, str(rnd.randrange(ROOMS)), "General", 0)
+
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, """
+            INSERT INTO Appointments (Doctor, Patient, Date, Time, Room, Department, IsEmergency)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, generate(), batch_size=10_000)
+        conn.commit()
+
+
+def requests(count, days):
+    rnd = random.Random(1)
+    return [(f"dr{rnd.randrange(DOCTORS)}", f"new{i}", *slot(rnd, days), str(rnd.randrange(ROOMS))) for i in range(count)]
+
+
+def blind_insert(doctor, patient, day, start, room):
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO Appointments (Doctor, Patient, Date, Time, Room, Department, IsEmergency)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+        """, (doctor, patient, day, start, room, "General"))
+        conn.commit()
+    return True
+
+
+def sql_checked_insert(doctor, patient, day, start, room):
+    minute = int(start[:2]) * 60 + int(start[3:])
+    earliest, latest = minute - SLOT_MINUTES, minute + SLOT_MINUTES
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT 1 FROM Appointments
+            WHERE (Doctor = ? OR Room = ?) AND Date = ? AND Time > ? AND Time < ?
+        """, (doctor, room, day, f"{earliest // 60:02d}:{earliest % 60:02d}", f"{latest // 60:02d}:{latest % 60:02d}"))
+        if cursor.fetchone():
+            return False
+        cursor.execute("""
+            INSERT INTO Appointments (Doctor, Patient, Date, Time, Room, Department, IsEmergency)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+        """, (doctor, patient, day, start, room, "General"))
+        conn.commit()
+    return True
+
+
+def run(label, book, bookings):
+    booked = 0
+    started = time.perf_counter()
+    with quiet():
+        for request in bookings:
+            booked += bool(book(*request))
+    seconds = time.perf_counter() - started
+    print(f"{label:<16} {len(bookings)} requests in {seconds:6.2f} s "
+          f"({len(bookings) / seconds * 60:9.0f}/min), {booked} booked, {len(bookings) - booked} refused")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--appointments", type=int, default=200_000)
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=28, help="bookings fall in the first N days of the year")
+    parser.add_argument("--rtt", type=float, default=None, help="simulated round trip in seconds, e.g. 0.0005")
+    args = parser.parse_args()
+    bookings = requests(args.bookings, args.days)
+
+    for label, make in (("blind insert", lambda: blind_insert),
+                        ("SQL check", lambda: sql_checked_insert),
+                        ("BookingIndex", lambda: booking_index_insert(BookingIndex()))):
+        path = use_sqlite()
+        try:
+            seed(args.appointments)
+            use_sqlite(path, rtt=args.rtt)
+            run(label, make(), bookings)
+        finally:
+            remove_database(path)
+
+
+def booking_index_insert(index):
+    def book(doctor, patient, day, start, room):
+        try:
+            return index.book(doctor, patient, day, start, room, "General")
+        except BookingConflict:
+            return False
+    return book
+
+
+if __name__ == "__main__":
+    main()
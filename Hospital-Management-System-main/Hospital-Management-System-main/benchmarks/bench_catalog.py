@@ -0,0 +1,110 @@
+"""
+Price catalog loading: CatalogLoader's streamed diff-apply versus loading the file whole and updating every entry.
+
+Generates a catalog in the layout of medications_New_prices_up_to_03-08-2024.json
+with --entries medications, seeds the inventory with --existing of them, and
+changes the price of a --changed share of those. Then times a dry run, the
+apply and a second apply with nothing left to change. "whole file" is
+json.load followed by one UPDATE (or INSERT) per entry; it runs on the first
+--baseline-entries entries and its rate is extrapolated. Peak memory is the
+growth of the process's maximum resident set size, so json.load of the whole
+file is measured last.
+
+    python benchmarks/bench_catalog.py [--entries 2000000] [--existing 1000000] [--changed 0.05]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+
+from common import remove_database, use_sqlite
+
+import modules.database as database
+from modules.catalog import CHUNK_SIZE, CatalogLoader
+
+
+def generate(path, entries, existing, changed):
+    """
+    Write the catalog, inserting its first `existing` entries into the inventory as it goes.
+    """
+    rnd = random.Random(0)
+
+    def rows(file):
+        file.write("{\n")
+        for i in range(entries):
+            price = rnd.randrange(100, 100_000) / 100
+            stock = rnd.randrange(1000)
+            file.write(f'{"," if i else ""}\n  "Medication {i}": {{\n    "price": {price},\n    "stock": {stock}\n  }}')
+            if i < existing:
+                yield f"Medication {i}", stock, price + 1 if rnd.random() < changed else price
+        file.write("\n}\n")
+
+    with open(path, 'w') as file, database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, "INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES (?, ?, ?)",
+                             rows(file))
+        conn.commit()
+
+
+def whole_file(path, limit):
+    with open(path) as file:
+        catalog = json.load(file)
+    started = time.perf_counter()
+    for done, (name, entry) in enumerate(catalog.items()):
+        if done >= limit:
+            break
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE PharmacyInventory SET Price = ? WHERE MedicationName = ?", (entry['price'], name))
+            if cursor.rowcount == 0:
+                cursor.execute("INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES (?, ?, ?)",
+                               (name, entry['stock'], entry['price']))
+            conn.commit()
+    return limit / (time.perf_counter() - started)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=2_000_000)
+    parser.add_argument("--existing", type=int, default=1_000_000, help="catalog entries already in the inventory")
+    parser.add_argument("--changed", type=float, default=0.05, help="share of existing entries with a new price")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--baseline-entries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    catalog_path = tempfile.mktemp(prefix="hms-catalog-", suffix=".json")
+    path = use_sqlite()
+    try:
+        generate(catalog_path, args.entries, args.existing, args.changed)
+        print(f"{args.entries} entries, {os.path.getsize(catalog_path) / 1e6:.0f} MB; {args.existing} in the inventory")
+
+        loader = CatalogLoader(chunk_size=args.chunk_size)
+        before = peak_rss_mb()
+        for label, dry_run in (("dry run", True), ("apply", False), ("apply again", False)):
+            stats = loader.run(catalog_path, dry_run=dry_run)
+            print(f"{label:<14} {stats['entries'] / stats['seconds']:10.0f} entries/s  ({stats['seconds']:.1f} s, "
+                  f"{stats['price_changes']} price changes, {stats['new']} new, {stats['unchanged']} unchanged)")
+        print(f"{'':<14} peak RSS +{peak_rss_mb() - before:.0f} MB")
+    finally:
+        remove_database(path)
+
+    path = use_sqlite()
+    try:
+        before = peak_rss_mb()
+        rate = whole_file(catalog_path, args.baseline_entries)
+        print(f"{'whole file':<14} {rate:10.0f} entries/s  (first {args.baseline_entries} entries), "
+              f"peak RSS +{peak_rss_mb() - before:.0f} MB")
+    finally:
+        remove_database(path)
+        os.remove(catalog_path)
+
+
+if __name__ == "__main__":
+    main()
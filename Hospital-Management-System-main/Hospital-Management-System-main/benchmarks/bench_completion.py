@@ -0,0 +1,81 @@
+"""
+Cost of one Tab press: the indexed Completer versus the old list-comprehension completer.
+
+readline calls the completer with state 0, 1, 2, ... until it returns None, so
+one Tab press with k candidates is k + 1 calls. The old completer filtered the
+whole word list on every call (O(n) per call, O(n * k) per press); Completer
+bisects a case-folded sorted index once and serves the rest from its cache.
+The old completer is timed on its first --old-calls calls and extrapolated to
+the whole press.
+
+    python benchmarks/bench_completion.py [--words 200000] [--prefixes a,am,amo,amox,zz]
+"""
+import argparse
+import random
+import string
+import time
+
+from common import print_table
+
+from modules.completion import Completer, StaticSource
+
+
+def words(count):
+    rnd = random.Random(0)
+    stems = ["".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randrange(3, 8))) for _ in range(count // 20)]
+    stems += ["amoxicillin", "amlodipine", "atorvastatin", "azithromycin"]
+    return [f"{rnd.choice(stems).capitalize()} {rnd.randrange(5, 1000)}mg" for _ in range(count)]
+
+
+def old_completer(names):
+    def complete(text, state):
+        options = [i for i in names if i.lower().startswith(text.lower())]
+        if state < len(options):
+            return options[state]
+        return None
+    return complete
+
+
+def tab_press(complete, text, max_calls=None):
+    """
+    Return (seconds, calls, candidates); stops after max_calls calls if given.
+    """
+    started = time.perf_counter()
+    state = 0
+    while complete(text, state) is not None:
+        state += 1
+        if max_calls is not None and state >= max_calls:
+            break
+    return time.perf_counter() - started, state + 1, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", type=int, default=200_000)
+    parser.add_argument("--prefixes", default="a,am,amo,amox,zz")
+    parser.add_argument("--old-calls", type=int, default=20)
+    args = parser.parse_args()
+
+    names = words(args.words)
+    completer = Completer(StaticSource(names))
+    started = time.perf_counter()
+    completer.matches("")
+    print(f"index of {args.words} words built in {(time.perf_counter() - started) * 1000:.0f} ms\n")
+    old = old_completer(names)
+
+    results = {}
+    for prefix in args.prefixes.split(","):
+        candidates = len(completer.matches(prefix))
+        completer.refresh()
+        completer.matches("")
+        first, _, _ = tab_press(completer.complete, prefix)
+        again, _, _ = tab_press(completer.complete, prefix)
+        seconds, calls, _ = tab_press(old, prefix, max_calls=args.old_calls)
+        old_total = seconds / calls * (candidates + 1)
+        label = f"'{prefix}' ({candidates} candidates)"
+        results[label] = {"old_ms": old_total * 1000, "first_ms": first * 1000, "cached_ms": again * 1000}
+    print_table("One Tab press", results, columns=("old_ms", "first_ms", "cached_ms"))
+
+
+if __name__ == "__main__":
+    main()
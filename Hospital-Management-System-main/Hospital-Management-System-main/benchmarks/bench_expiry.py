@@ -0,0 +1,78 @@
+"""
+Lot-level pharmacy stock: FEFO dispensing and the expiry sweep over a large MedicationLots table.
+
+Seeds --medications medications with --lots lots each, expiring over the next
+two years (a few already expired), and times Pharmacy.dispense_medication,
+which reads one medication's lots in expiry order, and
+Pharmacy.expiring_lots(--days), which reads only the lots expiring in the
+window. The sweep is timed again without IX_MedicationLots_ExpiryDate, i.e.
+scanning every lot, for comparison.
+
+    python benchmarks/bench_expiry.py [--medications 100000] [--lots 10] [--days 7] [--repeat 200]
+"""
+import argparse
+import datetime
+import random
+
+from common import measure, print_table, quiet, remove_database, use_sqlite
+
+import modules.database as database
+from modules.pharmacy import Pharmacy
+
+PATIENTS = 100
+
+
+def seed(medications, lots):
+    rnd = random.Random(0)
+    today = datetime.date.today()
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, "INSERT INTO Users (Username, Password, Role) VALUES (?, 'x', 'Patient')",
+                             ((f"patient{i}",) for i in range(PATIENTS)))
+        database.executemany(cursor, "INSERT INTO PatientBalances (Patient, Balance) VALUES (?, 1000000000)",
+                             ((f"patient{i}",) for i in range(PATIENTS)))
+        database.executemany(cursor, "INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES (?, ?, ?)",
+                             ((f"med{i}", lots * 1000, 5) for i in range(medications)))
+        database.executemany(cursor, """
+            INSERT INTO MedicationLots (MedicationID, LotNumber, ExpiryDate, Quantity) VALUES (?, ?, ?, 1000)
+        """, ((i // lots + 1, f"L{i}", (today + datetime.timedelta(days=rnd.randrange(-5, 730))).isoformat())
+              for i in range(medications * lots)))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--medications", type=int, default=100_000)
+    parser.add_argument("--lots", type=int, default=10, help="lots per medication")
+    parser.add_argument("--days", type=int, default=7, help="expiry window of the sweep")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    path = use_sqlite()
+    try:
+        seed(args.medications, args.lots)
+        with quiet():
+            pharmacy = Pharmacy()
+        rnd = random.Random(1)
+        names = [f"med{rnd.randrange(args.medications)}" for _ in range(args.repeat)]
+
+        def dispense(i):
+            with quiet():
+                pharmacy.dispense_medication(f"patient{i % PATIENTS}", names[i], 1)
+
+        found = len(pharmacy.expiring_lots(args.days))
+        results = {
+            "dispense_medication (FEFO)": measure(dispense, args.repeat),
+            f"expiring_lots({args.days}), indexed": measure(lambda i: pharmacy.expiring_lots(args.days), 20),
+        }
+        with database.connection() as conn:
+            conn.execute("DROP INDEX IX_MedicationLots_ExpiryDate")
+            conn.commit()
+        results[f"expiring_lots({args.days}), full scan"] = measure(lambda i: pharmacy.expiring_lots(args.days), 5)
+        print_table(f"{args.medications} medications x {args.lots} lots, {found} lots in the window", results)
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
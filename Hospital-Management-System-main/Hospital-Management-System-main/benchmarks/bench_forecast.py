@@ -0,0 +1,110 @@
+"""
+Demand forecasting: reorder points for every medication in one NumPy pass versus a loop per medication.
+
+The vectorized pass (forecast.demand_statistics and forecast.reorder_points)
+is timed on synthetic history for --medications medications over --days days,
+each day having demand with probability --density. The same statistics are
+computed with a Python loop over each medication's days for --loop-sample
+medications, extrapolated to all of them, and checked against the vectorized
+result. Then DemandForecast.compute() is timed end to end, from a SQLite
+database seeded with --db-medications medications over the same days.
+
+    python benchmarks/bench_forecast.py [--medications 100000] [--days 1095] [--density 0.2] [--db-medications 10000]
+"""
+import argparse
+import datetime
+import math
+import time
+
+import numpy as np
+
+from common import remove_database, use_sqlite
+
+import modules.database as database
+import modules.forecast as forecast
+
+
+def history(medications, days, density, seed=0):
+    """
+    Return (medication index, age in days, units) arrays, sorted by medication.
+    """
+    rng = np.random.default_rng(seed)
+    present = rng.random((medications, days), dtype=np.float32) < density
+    index, ages = np.nonzero(present)
+    del present
+    units = rng.poisson(3 + index % 20, size=len(index)).astype(np.float64) + 1
+    return index, ages, units
+
+
+def loop_statistics(index, ages, units, sample, days, half_life_days):
+    """
+    Weighted mean and std of daily demand for medications 0..sample-1, one day at a time.
+    """
+    weights = [0.5 ** (age / half_life_days) for age in range(days)]
+    total = sum(weights)
+    end = int(np.searchsorted(index, sample))
+    by_medication = [dict() for _ in range(sample)]
+    for medication, age, amount in zip(index[:end].tolist(), ages[:end].tolist(), units[:end].tolist()):
+        by_medication[medication][age] = amount
+    means, stds = [], []
+    for demand in by_medication:
+        mean = sum(weights[age] * demand.get(age, 0.0) for age in range(days)) / total
+        second = sum(weights[age] * demand.get(age, 0.0) ** 2 for age in range(days)) / total
+        means.append(mean)
+        stds.append(math.sqrt(max(second - mean * mean, 0)))
+    return means, stds
+
+
+def seed_database(medications, days, density):
+    index, ages, units = history(medications, days, density, seed=1)
+    today = datetime.date.today()
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, "INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES (?, ?, 1)",
+                             ((f"med{i}", (i * 37) % 200) for i in range(medications)))
+        database.executemany(cursor, "INSERT INTO MedicationDemand (MedicationID, Day, Units) VALUES (?, ?, ?)",
+                             ((medication + 1, (today - datetime.timedelta(days=age)).isoformat(), int(amount))
+                              for medication, age, amount in zip(index.tolist(), ages.tolist(), units.tolist())))
+        conn.commit()
+    return len(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--medications", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=forecast.HISTORY_DAYS)
+    parser.add_argument("--density", type=float, default=0.2, help="share of days with demand")
+    parser.add_argument("--loop-sample", type=int, default=200)
+    parser.add_argument("--db-medications", type=int, default=10_000)
+    args = parser.parse_args()
+
+    index, ages, units = history(args.medications, args.days, args.density)
+    started = time.perf_counter()
+    mean, std = forecast.demand_statistics(index, ages, units, args.medications, args.days)
+    stock = np.zeros(args.medications)
+    forecast.reorder_points(mean, std, stock)
+    vectorized = time.perf_counter() - started
+
+    started = time.perf_counter()
+    loop_mean, loop_std = loop_statistics(index, ages, units, args.loop_sample, args.days, forecast.HALF_LIFE_DAYS)
+    loop = (time.perf_counter() - started) * args.medications / args.loop_sample
+    same = np.allclose(mean[:args.loop_sample], loop_mean) and np.allclose(std[:args.loop_sample], loop_std)
+    print(f"{args.medications} medications x {args.days} days, {len(index)} days with demand:")
+    print(f"  {'NumPy pass':<28} {vectorized:9.2f} s")
+    print(f"  {'loop per medication (est.)':<28} {loop:9.2f} s  ({'same results' if same else 'RESULTS DIFFER'})")
+    del index, ages, units
+
+    path = use_sqlite()
+    try:
+        rows = seed_database(args.db_medications, args.days, args.density)
+        started = time.perf_counter()
+        purchases = forecast.DemandForecast(history_days=args.days).purchase_list()
+        seconds = time.perf_counter() - started
+        print(f"DemandForecast.purchase_list(), {args.db_medications} medications and {rows} MedicationDemand rows "
+              f"in SQLite: {seconds:.2f} s, {len(purchases)} to reorder")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
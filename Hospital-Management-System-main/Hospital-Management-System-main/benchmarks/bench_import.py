@@ -0,0 +1,118 @@
+"""
+Bulk import of a ledger CSV: TransactionImporter versus row-by-row inserts.
+
+Generates a financial_data.csv-style file with a header repeated every
+--header-every lines and a share of rows repeating an earlier row (imported
+like any other row), then imports it with TransactionImporter. "row by row"
+is one INSERT and commit per row, as Finance.save_transaction does; it runs
+on the first --baseline-rows rows only and its rate is extrapolated. Peak memory is the growth of the process's
+maximum resident set size during the import.
+
+    python benchmarks/bench_import.py [--rows 1000000] [--chunk-size 10000] [--rtt 0.0005]
+"""
+import argparse
+import csv
+import os
+import random
+import resource
+import tempfile
+import time
+
+from common import quiet, remove_database, use_sqlite
+
+import modules.database as database
+from modules.importer import CHUNK_SIZE, HEADER, TransactionImporter
+
+PATIENTS = 20_000
+TYPES = ['Deposit', 'Appointment Payment', 'Medication Payment (Aspirin)', 'Medication Payment (Ibuprofen)']
+
+
+def generate(path, rows, header_every, duplicate_share):
+    rnd = random.Random(0)
+    written = []
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        for i in range(rows):
+            if i % header_every == 0:
+                writer.writerow(HEADER)
+            if written and rnd.random() < duplicate_share:
+                writer.writerow(written[rnd.randrange(len(written))])
+                continue
+            row = (f"patient{rnd.randrange(PATIENTS)}", rnd.choice(TYPES), f"{rnd.randrange(-50_000, 100_000) / 100:.2f}",
+                   f"{rnd.randrange(0, 1_000_000) / 100:.2f}")
+            writer.writerow(row)
+            if len(written) < 10_000:
+                written.append(row)
+
+
+def row_by_row(path, limit):
+    with open(path, newline='') as file:
+        reader = csv.reader(file)
+        done = 0
+        started = time.perf_counter()
+        for fields in reader:
+            if fields == HEADER:
+                continue
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO FinancialTransactions (Patient, TransactionType, Amount, Balance)
+                    VALUES (?, ?, ?, ?)
+                """, fields)
+                conn.commit()
+            done += 1
+            if done >= limit:
+                break
+        return done / (time.perf_counter() - started)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--header-every", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=float, default=0.01, help="share of rows repeating an earlier row's values")
+    parser.add_argument("--baseline-rows", type=int, default=20_000)
+    parser.add_argument("--rtt", type=float, default=None, help="simulated round trip in seconds, e.g. 0.0005")
+    args = parser.parse_args()
+
+    csv_path = tempfile.mktemp(prefix="hms-ledger-", suffix=".csv")
+    try:
+        generate(csv_path, args.rows, args.header_every, args.duplicates)
+        print(f"{args.rows} rows, {os.path.getsize(csv_path) / 1e6:.0f} MB")
+
+        path = use_sqlite(rtt=args.rtt)
+        try:
+            with quiet():
+                rate = row_by_row(csv_path, args.baseline_rows)
+            print(f"{'row by row':<22} {rate:10.0f} rows/s  (first {args.baseline_rows} rows)")
+        finally:
+            remove_database(path)
+
+        path = use_sqlite(rtt=args.rtt)
+        try:
+            before = peak_rss_mb()
+            stats = TransactionImporter(chunk_size=args.chunk_size).run(csv_path)
+            print(f"{'TransactionImporter':<22} {stats['lines_read'] / stats['seconds']:10.0f} rows/s  "
+                  f"({stats['seconds']:.1f} s, {stats['imported']} imported, {stats['duplicates']} duplicates, "
+                  f"{stats['headers']} headers, peak RSS +{peak_rss_mb() - before:.0f} MB)")
+
+            started = time.perf_counter()
+            stats = TransactionImporter(chunk_size=args.chunk_size).run(csv_path)
+            print(f"{'resume (nothing left)':<22} {time.perf_counter() - started:10.3f} s")
+            started = time.perf_counter()
+            stats = TransactionImporter(chunk_size=args.chunk_size).run(csv_path, resume=False)
+            print(f"{'re-import, all dupes':<22} {stats['lines_read'] / stats['seconds']:10.0f} rows/s  "
+                  f"({stats['imported']} imported, {stats['duplicates']} duplicates)")
+        finally:
+            remove_database(path)
+    finally:
+        os.remove(csv_path)
+
+
+if __name__ == "__main__":
+    main()
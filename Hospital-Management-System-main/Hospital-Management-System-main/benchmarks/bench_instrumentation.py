@@ -0,0 +1,89 @@
+"""
+Overhead of the query instrumentation in modules.database.
+
+Times Finance.get_balance (one connection checkout, one primary-key SELECT)
+and a batch of point SELECTs on one connection with instrumentation off, on
+for another module only (the caller check, no wrapping), and on for the
+calling module. The modes are interleaved over --rounds rounds and each
+reports its best median, which keeps a busy machine from skewing one mode.
+In-process SQLite answers a point SELECT in microseconds, so this shows the
+overhead at its largest; --rtt adds a simulated network round trip per
+statement, as with SQL Server.
+
+    python benchmarks/bench_instrumentation.py [--patients 100000] [--repeat 5000] [--rounds 5] [--rtt 0.0005]
+"""
+import argparse
+
+from common import measure, print_table, remove_database, use_sqlite
+
+import modules.database as database
+from modules.finance import Finance
+
+# Modules instrumented in each mode; __main__ is this script, which runs the batch case.
+MODES = {
+    "off": None,
+    "on, other module": ["pharmacy"],
+    "on, this module": ["finance", "__main__"],
+}
+STATEMENTS = 100
+
+
+def seed(patients):
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, "INSERT INTO PatientBalances (Patient, Balance) VALUES (?, ?)",
+                             ((f"patient{i}", i % 1000) for i in range(patients)), batch_size=50_000)
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--rtt", type=float, default=None, help="simulated network round trip in seconds")
+    args = parser.parse_args()
+
+    path = use_sqlite(rtt=args.rtt)
+    try:
+        seed(args.patients)
+        finance = Finance()
+
+        def get_balance(i):
+            finance.get_balance(f"patient{i % args.patients}")
+
+        def batch(i):
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                for n in range(STATEMENTS):
+                    cursor.execute("SELECT Balance FROM PatientBalances WHERE Patient = ?",
+                                   (f"patient{(i + n) % args.patients}",))
+                    cursor.fetchone()
+
+        cases = {"get_balance": (get_balance, args.repeat),
+                 f"{STATEMENTS} SELECTs": (batch, max(1, args.repeat // STATEMENTS))}
+        results = {}
+        for _ in range(args.rounds):
+            for label, modules in MODES.items():
+                database.disable_instrumentation()
+                if modules is not None:
+                    database.enable_instrumentation(modules)
+                for case, (operation, repeat) in cases.items():
+                    stats = measure(operation, repeat)
+                    best = results.get(f"{case}, {label}")
+                    if best is None or stats["p50_ms"] < best["p50_ms"]:
+                        results[f"{case}, {label}"] = stats
+        database.disable_instrumentation()
+        print_table(f"Instrumentation overhead (best of {args.rounds} rounds)", results)
+
+        for case, statements in (("get_balance", 1), (f"{STATEMENTS} SELECTs", STATEMENTS)):
+            off = results[f"{case}, off"]["p50_ms"] / statements
+            for label in ("on, other module", "on, this module"):
+                on = results[f"{case}, {label}"]["p50_ms"] / statements
+                print(f"{case}, {label}: {(on - off) * 1000:+.1f} us per statement ({(on / off - 1) * 100:+.1f}%)")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Pending-payments report from Receivables versus the GROUP BY over FinancialTransactions it replaces.
+
+Seeds a ledger in which most patients have paid what they owe, rebuilds
+Receivables from it, then times the report query both ways. The write side
+compares posting a deposit, which leaves Receivables alone, with posting an
+appointment payment, which also updates it; the rebuild is timed once.
+
+    python benchmarks/bench_receivables.py [--rows 1000000] [--patients 100000] [--repeat 20] [--rtt 0.0005]
+"""
+import argparse
+import random
+import time
+
+from common import measure, print_table, remove_database, use_sqlite
+
+import modules.database as database
+from modules.ledger import CATEGORIES, Ledger
+
+ITEMS = ["Amoxicillin", "Paracetamol", "Ibuprofen", "Metformin", "Omeprazole"]
+# Share of patients who have paid off everything they were charged.
+SETTLED_SHARE = 0.9
+
+GROUP_BY_SCAN = """
+    SELECT Patient, SUM(Amount) AS PendingAmount
+    FROM FinancialTransactions
+    WHERE TransactionType = 'Appointment Payment' OR TransactionType LIKE 'Medication Payment%'
+    GROUP BY Patient
+    HAVING SUM(Amount) < 0
+"""
+
+RECEIVABLES = "SELECT Patient, Outstanding FROM Receivables WHERE Outstanding > 0"
+
+
+def seed(rows, patients):
+    rnd = random.Random(0)
+    owed = {}
+
+    def transactions():
+        for i in range(rows):
+            patient = f"patient{i % patients}"
+            if rnd.random() < 0.5:
+                amount = -rnd.randrange(1, 50) * 100
+                owed[patient] = owed.get(patient, 0) - amount
+                yield patient, CATEGORIES["Medication Payment"], "Medication Payment", rnd.choice(ITEMS), amount
+            elif rnd.random() < 0.5:
+                amount = -200
+                owed[patient] = owed.get(patient, 0) - amount
+                yield patient, CATEGORIES["Appointment Payment"], "Appointment Payment", None, amount
+            else:
+                yield patient, CATEGORIES["Deposit"], "Deposit", None, rnd.randrange(1, 50) * 100
+
+        # Most patients pay off what they owe.
+        for patient, amount in owed.items():
+            if rnd.random() < SETTLED_SHARE:
+                yield patient, CATEGORIES["Appointment Payment"], "Appointment Payment", None, amount
+
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, """
+            INSERT INTO FinancialTransactions (Patient, Category, TransactionType, Item, Amount, Balance)
+            VALUES (?, ?, ?, ?, ?, 0)
+        """, transactions(), batch_size=50_000)
+        conn.commit()
+
+
+def query(sql):
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        return cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="transactions before the settling payments")
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--rtt", type=float, default=None, help="simulated round trip in seconds, e.g. 0.0005")
+    args = parser.parse_args()
+
+    path = use_sqlite()
+    try:
+        seed(args.rows, args.patients)
+        use_sqlite(path, rtt=args.rtt)
+        ledger = Ledger()
+        started = time.perf_counter()
+        ledger.rebuild_receivables()
+        print(f"rebuild: {time.perf_counter() - started:.2f} s")
+
+        scanned = sorted((patient, -amount) for patient, amount in query(GROUP_BY_SCAN))
+        assert scanned == sorted(map(tuple, query(RECEIVABLES)))
+        print(f"{len(scanned)} of {args.patients} patients owe money\n")
+        print_table(f"Pending payments, {args.rows} transactions", {
+            "GROUP BY scan": measure(lambda i: query(GROUP_BY_SCAN), args.repeat),
+            "Receivables": measure(lambda i: query(RECEIVABLES), args.repeat),
+        })
+
+        print_table("Ledger writes", {
+            "deposit": measure(lambda i: ledger.post_transaction(f"patient{i}", "Deposit", 100), args.repeat * 10),
+            "appointment payment (+ Receivables)": measure(
+                lambda i: ledger.post_transaction(f"patient{i}", "Appointment Payment", -200), args.repeat * 10),
+        })
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Prescription/record appends and single-patient reads: LogStore versus the JSON file rewrite.
+
+The old Doctor.write_prescriptions loaded the whole JSON file, appended one
+item and dumped the file again; reads loaded the whole file too. LogStore
+appends one line and reads one patient's lines through its offset index.
+
+    python benchmarks/bench_record_store.py [--sizes 1000,10000,100000]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+from common import measure, print_table
+
+from modules.logstore import LogStore
+
+PATIENTS = 5000
+
+
+def seed(size):
+    return {f"patient{p}": [f"Amoxicillin 500mg, 3x daily, visit {i}" for i in range(p, size, PATIENTS)]
+            for p in range(min(size, PATIENTS))}
+
+
+def json_append(path, patient, item):
+    with open(path, 'r') as file:
+        data = json.load(file)
+    data.setdefault(patient, []).append(item)
+    with open(path, 'w') as file:
+        json.dump(data, file)
+
+
+def json_read(path, patient):
+    with open(path, 'r') as file:
+        return json.load(file).get(patient, [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        directory = tempfile.mkdtemp(prefix="hms_records_")
+        try:
+            data = seed(size)
+            legacy = os.path.join(directory, "legacy.txt")
+            with open(legacy, 'w') as file:
+                json.dump(data, file)
+            store = LogStore(os.path.join(directory, "log.txt"))
+            store.replace_all(data)
+            unsynced = LogStore(os.path.join(directory, "unsynced.txt"), fsync=False)
+            unsynced.replace_all(data)
+
+            patient = lambda i: f"patient{i % PATIENTS}"
+            results = {
+                "JSON rewrite: append": measure(lambda i: json_append(legacy, patient(i), "new"), args.repeat),
+                "LogStore: append (fsync)": measure(lambda i: store.append(patient(i), "new"), args.repeat),
+                "LogStore: append (no fsync)": measure(lambda i: unsynced.append(patient(i), "new"), args.repeat),
+                "JSON rewrite: read one patient": measure(lambda i: json_read(legacy, patient(i)), args.repeat),
+                "LogStore: read one patient": measure(lambda i: store.get(patient(i)), args.repeat),
+            }
+            print_table(f"{size} existing items", results)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Headless report rendering: every Admin report in-process versus in a pool of worker processes.
+
+Seeds a SQLite stand-in with datagen.py, renders all reports with
+modules.reports.render_reports() once with workers=0 and once with --workers
+processes (default: one per CPU), and reports wall time and whether the
+text reports are identical. Worker processes are spawned, so each
+pays the pandas/matplotlib/plotly imports once; the pool wins when the
+queries dominate, at the larger presets.
+
+    python benchmarks/bench_reports.py [--preset smoke] [--workers 4]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import warnings
+
+from common import remove_database, use_sqlite
+
+import datagen
+import modules.reports as reports
+
+
+def render(output_dir, workers):
+    # Spawned workers take their warning filters from the environment.
+    os.environ["PYTHONWARNINGS"] = "ignore"
+    started = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        manifest = reports.render_reports(output_dir, workers=workers)
+    return manifest, time.perf_counter() - started
+
+
+def texts(output_dir, manifest):
+    contents = {}
+    for entry in manifest["reports"]:
+        for name in entry["files"]:
+            if name.endswith(".txt"):
+                with open(os.path.join(output_dir, name)) as file:
+                    contents[name] = file.read()
+    return contents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    datagen.add_volume_arguments(parser)
+    parser.set_defaults(preset="smoke")
+    parser.add_argument("--workers", type=int, default=None, help="pool size (default: one per CPU)")
+    args = parser.parse_args()
+
+    volumes = datagen.volumes_for(args.preset, **{table: getattr(args, table) for table in datagen.PRESETS["default"]})
+    path = use_sqlite()
+    output = tempfile.mkdtemp()
+    try:
+        datagen.generate(volumes, seed=args.seed)
+        results = {}
+        for label, workers in (("in-process", 0), (f"pool ({args.workers or os.cpu_count()} workers)", args.workers)):
+            output_dir = os.path.join(output, str(workers))
+            manifest, seconds = render(output_dir, workers)
+            failed = [entry["name"] for entry in manifest["reports"] if "error" in entry]
+            results[label] = texts(output_dir, manifest)
+            print(f"{label:<22} {seconds:7.2f} s  {len(manifest['reports'])} reports"
+                  + (f"  FAILED: {', '.join(failed)}" if failed else ""))
+        first, second = results.values()
+        print("text reports identical" if first == second else "TEXT REPORTS DIFFER")
+    finally:
+        shutil.rmtree(output, ignore_errors=True)
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
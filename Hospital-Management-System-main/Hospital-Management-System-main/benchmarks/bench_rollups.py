@@ -0,0 +1,119 @@
+"""
+Period reports from FinancialRollups versus GROUP BY scans of Revenue, and the write-side cost.
+
+Seeds --rows revenue rows spread over --days days up to yesterday, rebuilds
+the day buckets, then times revenue per source and period three ways: a
+GROUP BY over Revenue, FinancialRollups with no closed period cached yet
+(cold), and with the closed periods cached (warm). The write side compares
+Finance.track_revenue with the bare INSERT it used to run.
+
+    python benchmarks/bench_rollups.py [--rows 2000000] [--days 1095] [--repeat 10]
+"""
+import argparse
+import datetime
+import random
+import time
+
+from common import measure, print_table, quiet, remove_database, use_sqlite
+
+import modules.database as database
+import modules.rollups as rollups
+from modules.finance import Finance
+
+SOURCES = ['insurance', 'out-of-pocket', 'government']
+
+# Period start per row in SQLite date functions, for the scans.
+SCAN_PERIODS = {
+    "day": "Date",
+    "week": "DATE(Date, '-6 days', 'weekday 1')",
+    "month": "DATE(Date, 'start of month')",
+}
+
+
+def seed(rows, days):
+    rnd = random.Random(0)
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    dates = [(yesterday - datetime.timedelta(days=day)).isoformat() for day in range(days)]
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, "INSERT INTO Revenue (Source, Amount, Date) VALUES (?, ?, ?)",
+                             ((rnd.choice(SOURCES), rnd.randrange(100, 1_000_000) / 100, rnd.choice(dates))
+                              for _ in range(rows)), batch_size=50_000)
+        conn.commit()
+
+
+def scan(period):
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {SCAN_PERIODS[period]} AS PeriodStart, Source, COUNT(*) AS Entries, SUM(Amount) AS Revenue
+            FROM Revenue
+            GROUP BY {SCAN_PERIODS[period]}, Source
+            ORDER BY 1, 2
+        """)
+        return cursor.fetchall()
+
+
+def clear_closed():
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM ClosedPeriods")
+        cursor.execute("DELETE FROM PeriodTotals")
+        conn.commit()
+
+
+def bare_revenue_insert(source, amount):
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            INSERT INTO Revenue (Source, Amount, Date)
+            VALUES (?, ?, {database.get_dialect().today})
+        """, (source, amount))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    path = use_sqlite()
+    try:
+        seed(args.rows, args.days)
+        started = time.perf_counter()
+        rollups.rebuild()
+        print(f"rebuild: {time.perf_counter() - started:.2f} s\n")
+
+        engine = rollups.FinancialRollups()
+        results = {}
+        for period in SCAN_PERIODS:
+            report = engine.report('source', period)
+            scanned = scan(period)
+            assert len(report) == len(scanned), period
+            assert all(abs(row.Revenue - revenue) < 0.005 and row.Entries == entries
+                       for row, (entries, revenue) in zip(scanned, zip(report['Entries'], report['Revenue']))), period
+            results[f"{period}: GROUP BY scan"] = measure(lambda i: scan(period), args.repeat)
+
+            def cold(i):
+                clear_closed()
+                return engine.report('source', period)
+            results[f"{period}: rollups, cold"] = measure(cold, args.repeat)
+            results[f"{period}: rollups, warm"] = measure(lambda i: engine.report('source', period), args.repeat)
+        print_table(f"Revenue per source and period, {args.rows} rows over {args.days} days", results)
+
+        finance = Finance()
+        with quiet():
+            writes = {
+                "bare INSERT": measure(lambda i: bare_revenue_insert(SOURCES[i % 3], 100), args.repeat * 20),
+                "track_revenue (INSERT + totals + rollup)": measure(
+                    lambda i: finance.track_revenue(SOURCES[i % 3], 100), args.repeat * 20),
+            }
+        print_table("Revenue writes", writes)
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
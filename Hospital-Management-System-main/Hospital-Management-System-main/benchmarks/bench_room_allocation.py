@@ -0,0 +1,125 @@
+"""
+Room allocation under contention: many threads allocating from the same room type.
+
+Compares the old two-step allocation (SELECT the first free room, then UPDATE it)
+with RoomAllocator. Several allocators stand in for several processes, each
+shared by a group of threads. Reports throughput and how many rooms were
+handed out more than once.
+
+    python benchmarks/bench_room_allocation.py [--rooms N] [--threads N] [--allocators N]
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+from common import quiet, remove_database, use_sqlite
+
+import modules.database as database
+from modules.rooms import RoomAllocator
+
+ROOM_TYPE = "Ward"
+
+
+def seed(rooms):
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, "INSERT INTO Rooms (RoomNumber, RoomType, IsAvailable) VALUES (?, ?, 1)",
+                             ((str(1000 + i), ROOM_TYPE) for i in range(rooms)))
+        conn.commit()
+
+
+def two_step_allocate():
+    """
+    The previous Hospital.allocate_room.
+    """
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(database.get_dialect().limit(
+            "SELECT RoomNumber FROM Rooms WHERE RoomType = ? AND IsAvailable = 1", 1), (ROOM_TYPE,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute("UPDATE Rooms SET IsAvailable = 0 WHERE RoomNumber = ?", (row.RoomNumber,))
+        conn.commit()
+        return row.RoomNumber
+
+
+def run(threads, allocate):
+    handed_out = []
+    lock = threading.Lock()
+
+    def worker(index):
+        mine = []
+        while True:
+            room = allocate(index)
+            if room is None:
+                break
+            mine.append(room)
+        with lock:
+            handed_out.extend(mine)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - started
+    duplicates = sum(count - 1 for count in Counter(handed_out).values() if count > 1)
+    return seconds, len(handed_out), duplicates
+
+
+def report(label, seconds, allocations, duplicates):
+    print(f"{label:<28} {allocations:>7} allocations in {seconds:7.3f} s  "
+          f"({allocations / seconds:9.0f}/s), rooms handed out twice: {duplicates}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--allocators", type=int, default=4, help="simulated processes")
+    parser.add_argument("--batch", type=int, default=25, help="rooms per allocate_many call")
+    args = parser.parse_args()
+
+    path = use_sqlite(pool_size=args.threads)
+    try:
+        seed(args.rooms)
+        with quiet():
+            result = run(args.threads, lambda i: two_step_allocate())
+        report("SELECT + UPDATE", *result)
+    finally:
+        remove_database(path)
+
+    for count in sorted({1, args.allocators}):
+        path = use_sqlite(pool_size=args.threads)
+        try:
+            seed(args.rooms)
+            allocators = [RoomAllocator() for _ in range(count)]
+            with quiet():
+                result = run(args.threads, lambda i: allocators[i % len(allocators)].allocate(ROOM_TYPE))
+            report(f"RoomAllocator x{count}", *result)
+        finally:
+            remove_database(path)
+
+    path = use_sqlite(pool_size=args.threads)
+    try:
+        seed(args.rooms)
+        allocator = RoomAllocator()
+        pending = []
+
+        def allocate_batch(i):
+            if not pending:
+                pending.extend(allocator.allocate_many(ROOM_TYPE, args.batch))
+            return pending.pop() if pending else None
+
+        with quiet():
+            result = run(1, allocate_batch)
+        report(f"allocate_many({args.batch})", *result)
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Appointment.save_appointments on a large table: the diff-based save versus the
+old delete-everything-and-reinsert rewrite.
+
+    python benchmarks/bench_save_appointments.py [--rows N] [--changes N] [--rtt-ms MS]
+"""
+import argparse
+import time
+
+from common import quiet, remove_database, use_sqlite
+
+import modules.database as database
+from modules.appointment import Appointment
+
+
+def seed(rows):
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, """
+            INSERT INTO Appointments (Doctor, Patient, Date, Time, Room, Department, IsEmergency)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, ((f"dr{i % 300}", f"patient{i}", f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", f"{8 + i % 10}:00",
+               str(100 + i % 400), "Cardiology", 0) for i in range(rows)))
+        conn.commit()
+
+
+def rewrite_all(appointments):
+    """
+    The previous save_appointments: clear the table and insert every row one at a time.
+    """
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM Appointments")
+        for details in appointments.values():
+            cursor.execute("""
+                INSERT INTO Appointments (Doctor, Patient, Date, Time, Room, Department, IsEmergency)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (details['doctor'], details['patient'], details['date'], details['time'], details['room'],
+                  details['department'], details['is_emergency']))
+        conn.commit()
+
+
+def edit(appointments, changes):
+    ids = sorted(appointments)
+    for appointment_id in ids[:changes]:
+        appointments[appointment_id]['time'] = "17:30"
+    del appointments[ids[-1]]
+    appointments[None] = dict(appointments[ids[0]], patient="walk-in")
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    with quiet():
+        result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--changes", type=int, default=1, help="appointments edited before saving")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="simulated SQL Server round trip")
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000 or None
+
+    path = use_sqlite(rtt=rtt)
+    try:
+        seed(args.rows)
+        with quiet():
+            appointments = Appointment.load_appointments()
+        edit(appointments, args.changes)
+        seconds, changes = timed(Appointment.save_appointments, appointments)
+        with quiet():
+            saved = Appointment.load_appointments()
+        kept = sum(1 for appointment_id in appointments if appointment_id in saved)
+        print(f"diff save:   {seconds * 1000:10.1f} ms  {changes}, ids preserved: {kept}/{len(appointments) - 1}")
+    finally:
+        remove_database(path)
+
+    path = use_sqlite(rtt=rtt)
+    try:
+        seed(args.rows)
+        with quiet():
+            appointments = Appointment.load_appointments()
+        edit(appointments, args.changes)
+        seconds, _ = timed(rewrite_all, appointments)
+        with quiet():
+            saved = Appointment.load_appointments()
+        kept = sum(1 for appointment_id in appointments if appointment_id in saved)
+        print(f"full rewrite:{seconds * 1000:10.1f} ms  {len(appointments)} rows written, ids preserved: {kept}/{len(appointments) - 1}")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Admin.search latency: the trigram SearchIndex versus the old LIKE '%query%' scans.
+
+Seeds patients, staff, medications, departments and financial transactions
+(about 1M rows in total by default), builds the index once, then times a mix of
+selective and broad queries.
+
+    python benchmarks/bench_search.py [--rows 1000000] [--repeat 20]
+"""
+import argparse
+import time
+
+from common import measure, print_table, quiet, remove_database, use_sqlite
+
+import modules.database as database
+from modules.search import ENTITIES, SearchIndex
+
+QUERIES = {
+    "exact patient": "patient123457",
+    "medication prefix": "amoxi",
+    "amount": "1234.5",
+    "broad": "cardio",
+}
+LOCATIONS = ["Cairo", "Giza", "Alexandria", "Aswan", "Luxor", "Mansoura"]
+SPECIALIZATIONS = ["Cardiology", "Neurology", "Oncology", "Pediatrics", "Orthopedics"]
+MEDICATIONS = ["Amoxicillin", "Paracetamol", "Ibuprofen", "Metformin", "Omeprazole", "Atorvastatin"]
+
+
+def seed(rows):
+    patients = rows // 4
+    staff = rows // 100
+    medications = rows // 20
+    transactions = rows - patients - staff - medications
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.executemany(cursor, "INSERT INTO Patient (Username, Age, Gender, GeographicLocation) VALUES (?, ?, ?, ?)",
+                             ((f"patient{i}", 20 + i % 60, "Male" if i % 2 else "Female", LOCATIONS[i % len(LOCATIONS)])
+                              for i in range(patients)), batch_size=10_000)
+        database.executemany(cursor, "INSERT INTO Staff (Username, Role, Specialization) VALUES (?, ?, ?)",
+                             ((f"staff{i}", "doctor" if i % 3 else "nurse", SPECIALIZATIONS[i % len(SPECIALIZATIONS)])
+                              for i in range(staff)), batch_size=10_000)
+        database.executemany(cursor, "INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES (?, ?, ?)",
+                             ((f"{MEDICATIONS[i % len(MEDICATIONS)]} {i}mg", i % 500, round(1 + i % 997 * 0.37, 2))
+                              for i in range(medications)), batch_size=10_000)
+        database.executemany(cursor, "INSERT INTO Departments (DepartmentName, Description) VALUES (?, ?)",
+                             ((name, f"{name} department") for name in SPECIALIZATIONS))
+        database.executemany(cursor, """
+            INSERT INTO FinancialTransactions (Patient, TransactionType, Amount, Balance) VALUES (?, ?, ?, ?)
+        """, ((f"patient{i % patients}", "Payment" if i % 2 else "Deposit", round(i % 100_000 * 0.05, 2), round(i * 0.01, 2))
+              for i in range(transactions)), batch_size=10_000)
+        conn.commit()
+
+
+def like_scan(query):
+    """
+    The previous Admin.search: one LIKE scan per entity over every searched column.
+    """
+    pattern = f"%{query}%"
+    found = 0
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        for spec in ENTITIES.values():
+            cursor.execute(f"SELECT {', '.join(spec['columns'])} FROM {spec['table']} WHERE "
+                           + " OR ".join(f"{column} LIKE ?" for column in spec['searched']),
+                           [pattern] * len(spec['searched']))
+            found += len(cursor.fetchall())
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--like-repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = use_sqlite()
+    try:
+        seed(args.rows)
+        index = SearchIndex()
+        started = time.perf_counter()
+        with quiet():
+            index.rebuild()
+        print(f"Indexed {len(index)} rows in {time.perf_counter() - started:.1f} s")
+
+        results = {}
+        for label, query in QUERIES.items():
+            _, total = index.search(query)
+            results[f"index: {label} ({total} hits)"] = measure(lambda i: index.search(query), args.repeat)
+            results[f"LIKE: {label} ({like_scan(query)} hits)"] = measure(lambda i: like_scan(query), args.like_repeat)
+        results["index: refresh, nothing new"] = measure(lambda i: index.refresh(), args.repeat)
+        print_table(f"Admin.search over {args.rows} rows", results)
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
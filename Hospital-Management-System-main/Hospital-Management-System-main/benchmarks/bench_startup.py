@@ -0,0 +1,78 @@
+"""
+Cold-start import time of main.py and modules.user, checked against a startup budget.
+
+Each run imports the target in a fresh interpreter under `python -X importtime`
+and reads the target's cumulative import time from the report. The script
+prints the median over --runs and the slowest modules of the last run, and
+exits with status 1 when the median is over --budget-ms or when a module that
+should load lazily (pandas, matplotlib, ...) was imported at startup, so it can
+gate CI.
+
+    python benchmarks/bench_startup.py [--runs 10] [--budget-ms 150] [--targets main,modules.user]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Cumulative import time allowed for each target, in milliseconds.
+STARTUP_BUDGET_MS = 150
+# Only the Admin reports and Admin.search use these; importing them at startup is a regression.
+LAZY_MODULES = ("pandas", "numpy", "matplotlib", "seaborn", "plotly", "readline", "asyncio")
+
+
+def import_once(target):
+    """
+    Import target in a fresh interpreter and return {module: (self_us, cumulative_us)}.
+    """
+    code = f"import sys; sys.path.insert(0, {os.path.abspath(SRC)!r}); import {target}"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            times[name] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--targets", default="main,modules.user")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    args = parser.parse_args()
+
+    failures = []
+    for target in args.targets.split(","):
+        samples = []
+        for _ in range(args.runs):
+            times = import_once(target)
+            samples.append(times[target][1] / 1000)
+        median = statistics.median(samples)
+        status = "ok" if median <= args.budget_ms else "OVER BUDGET"
+        print(f"{target}: median {median:.1f} ms, min {min(samples):.1f} ms, "
+              f"max {max(samples):.1f} ms (budget {args.budget_ms:.0f} ms) {status}")
+        if median > args.budget_ms:
+            failures.append(f"{target} takes {median:.1f} ms to import")
+
+        eager = sorted(name for name in LAZY_MODULES if name in times)
+        if eager:
+            failures.append(f"{target} imports {', '.join(eager)} at startup")
+        for name, (self_us, cumulative_us) in sorted(times.items(), key=lambda item: -item[1][0])[:args.top]:
+            print(f"    {self_us / 1000:7.2f} ms self {cumulative_us / 1000:8.2f} ms total  {name}")
+        print()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against SQLite so they work without a SQL Server instance.
+Where a script needs to model the networked SQL Server deployment, it uses
+RemoteStandIn: a SQLite connection that sleeps for one simulated network
+round trip on every statement, commit and rollback.
+"""
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import modules.database as database
+
+
+class RemoteStandIn:
+    """
+    Wrap a connection so every round trip to the "server" costs `rtt` seconds.
+    """
+
+    def __init__(self, raw, rtt):
+        self._raw = raw
+        self._rtt = rtt
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self):
+        return _RemoteCursor(self._raw.cursor(), self._rtt)
+
+    def commit(self):
+        time.sleep(self._rtt)
+        return self._raw.commit()
+
+    def rollback(self):
+        time.sleep(self._rtt)
+        return self._raw.rollback()
+
+
+class _RemoteCursor:
+    def __init__(self, raw, rtt):
+        self._raw = raw
+        self._rtt = rtt
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def execute(self, *args):
+        time.sleep(self._rtt)
+        self._raw.execute(*args)
+        return self
+
+    def executemany(self, *args):
+        time.sleep(self._rtt)
+        self._raw.executemany(*args)
+        return self
+
+
+def use_sqlite(path=None, rtt=None, pool_size=database.POOL_SIZE):
+    """
+    Point modules.database at a fresh SQLite file and return its path.
+
+    rtt: simulated network round trip in seconds (SQL Server stand-in).
+    """
+    path = path or tempfile.mktemp(prefix="hms-bench-", suffix=".db")
+    database.configure_backend("sqlite", sqlite_path=path, size=pool_size)
+    dialect = database.get_dialect()
+
+    def factory():
+        raw = dialect.connect()
+        if rtt:
+            # Connection handshake: a few round trips for login and session setup.
+            time.sleep(3 * rtt)
+            raw = RemoteStandIn(raw, rtt)
+        return raw
+
+    database.configure_pool(size=pool_size, factory=factory)
+    return path
+
+
+def remove_database(path):
+    for suffix in ("", "-wal", "-shm"):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + suffix)
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Swallow the progress messages the modules print.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def measure(operation, repeat):
+    """
+    Call `operation(i)` `repeat` times and return latency statistics in milliseconds.
+    """
+    samples = []
+    with quiet():
+        for i in range(repeat):
+            started = time.perf_counter()
+            operation(i)
+            samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "count": repeat,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max_ms": samples[-1],
+    }
+
+
+def print_table(title, results, columns=("mean_ms", "p50_ms", "p95_ms")):
+    print(title)
+    width = max(len(name) for name in results) + 2
+    print("".ljust(width) + "".join(c.rjust(12) for c in columns))
+    for name, stats in results.items():
+        print(name.ljust(width) + "".join(f"{stats[c]:12.3f}" for c in columns))
+    print()
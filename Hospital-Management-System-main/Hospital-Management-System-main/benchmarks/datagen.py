@@ -0,0 +1,229 @@
+"""
+Synthetic hospital data for the benchmark suite, at configurable volumes.
+
+Fills the configured database (SQLite in the benchmarks) with users and their
+Patient/Staff rows, departments, rooms, medications, appointments, treatments
+and financial transactions. The same seed gives the same rows. Patient balances
+and receivables are consistent with the transactions, and the dashboard totals are rebuilt at
+the end, so every module sees a database its own write paths could have
+produced.
+
+Generating the release volumes takes a while. Generate once into a file and
+point suite.py at it with --database:
+
+    python benchmarks/datagen.py --preset release --output data/bench-release.db
+    python benchmarks/datagen.py --users 50000 --appointments 200000 --output /tmp/bench.db
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+from common import quiet, use_sqlite
+
+import modules.aggregates as aggregates
+import modules.database as database
+from modules.ledger import RECEIVABLE_CATEGORIES, SETTLED, classify
+
+# Row counts per table. "release" is the volume release candidates are checked at.
+PRESETS = {
+    "smoke": {"users": 10_000, "appointments": 50_000, "transactions": 100_000,
+              "treatments": 20_000, "medications": 1_000, "rooms": 500, "departments": 20},
+    "default": {"users": 100_000, "appointments": 1_000_000, "transactions": 2_000_000,
+                "treatments": 200_000, "medications": 10_000, "rooms": 2_000, "departments": 40},
+    "release": {"users": 1_000_000, "appointments": 10_000_000, "transactions": 50_000_000,
+                "treatments": 2_000_000, "medications": 100_000, "rooms": 10_000, "departments": 60},
+}
+# Share of users in each staff role; the rest are patients.
+STAFF_SHARE = {"Doctor": 0.02, "Nurse": 0.03, "Receptionist": 0.005, "Admin": 0.0005}
+# Roles with a Staff row; the Staff.Role check allows only these.
+STAFF_ROLES = ("Doctor", "Nurse", "Admin")
+ROOM_TYPES = ["Single", "Double", "ICU", "Ward"]
+TRANSACTION_TYPES = [("Deposit", 1), ("Appointment Payment", -1), ("Medication Payment", -1)]
+LOCATIONS = ["Cairo", "Giza", "Alexandria", "Aswan", "Luxor", "Mansoura", "Tanta", "Suez"]
+SPECIALIZATIONS = ["Cardiology", "Neurology", "Oncology", "Pediatrics", "Orthopedics", "Dermatology", "Radiology"]
+MEDICATIONS = ["Amoxicillin", "Paracetamol", "Ibuprofen", "Metformin", "Omeprazole", "Atorvastatin", "Amlodipine"]
+DISEASES = [None, "Asthma", "Diabetes", "Hypertension", "None"]
+FIRST_DAY = datetime.date(2024, 1, 1)
+DAYS = 730
+BATCH_SIZE = 50_000
+
+
+def volumes_for(preset="default", **overrides):
+    """
+    Return the row counts of a preset with the non-None overrides applied.
+    """
+    volumes = dict(PRESETS[preset])
+    volumes.update({table: count for table, count in overrides.items() if count is not None})
+    return volumes
+
+
+def usernames(volumes):
+    """
+    Return {role: [usernames]} for the users generate() creates.
+    """
+    users = volumes["users"]
+    roles, start = {}, 0
+    for role, share in STAFF_SHARE.items():
+        count = max(1, int(users * share))
+        roles[role] = [f"{role.lower()}{i}" for i in range(count)]
+        start += count
+    roles["Patient"] = [f"patient{i}" for i in range(max(1, users - start))]
+    return roles
+
+
+def medication_names(volumes):
+    return [f"{MEDICATIONS[i % len(MEDICATIONS)]} {i}mg" for i in range(volumes["medications"])]
+
+
+def department_names(volumes):
+    return [f"{SPECIALIZATIONS[i % len(SPECIALIZATIONS)]} {i // len(SPECIALIZATIONS) + 1}"
+            for i in range(volumes["departments"])]
+
+
+def generate(volumes, seed=0, progress=None):
+    """
+    Insert the rows for `volumes` into the configured database. Returns seconds taken per table.
+    """
+    rnd = random.Random(seed)
+    roles = usernames(volumes)
+    patients = roles["Patient"]
+    doctors = roles["Doctor"]
+    departments = department_names(volumes)
+    timings = {}
+
+    def insert(table, query, rows):
+        started = time.perf_counter()
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            database.executemany(cursor, query, rows, batch_size=BATCH_SIZE)
+            conn.commit()
+        timings[table] = time.perf_counter() - started
+        if progress:
+            progress(table, timings[table])
+
+    def users():
+        for role, names in roles.items():
+            staff = role != "Patient"
+            for name in names:
+                yield (name, "password", role, f"010{rnd.randrange(10 ** 8):08d}", rnd.randrange(18 if staff else 0, 90),
+                       rnd.choice(["Male", "Female"]), round(rnd.uniform(8000, 60000), 2) if staff else None,
+                       rnd.choice(SPECIALIZATIONS) if role == "Doctor" else None,
+                       rnd.choice(departments) if staff else None,
+                       None if staff else rnd.choice(DISEASES), "Egyptian")
+
+    insert("Users", """
+        INSERT INTO Users (Username, Password, Role, PhoneNumber, Age, Gender, Salary, Profession, Department, ChronicDisease, Nationality)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, users())
+    insert("Patient", "INSERT INTO Patient (Username, Age, Gender, GeographicLocation) VALUES (?, ?, ?, ?)",
+           ((name, rnd.randrange(100), rnd.choice(["Male", "Female"]), rnd.choice(LOCATIONS)) for name in patients))
+    insert("Staff", "INSERT INTO Staff (Username, Role, Specialization) VALUES (?, ?, ?)",
+           ((name, role.lower(), rnd.choice(SPECIALIZATIONS)) for role, names in roles.items() if role in STAFF_ROLES for name in names))
+    insert("Departments", "INSERT INTO Departments (DepartmentName, Description) VALUES (?, ?)",
+           ((name, f"{name} department") for name in departments))
+    insert("Rooms", "INSERT INTO Rooms (RoomNumber, RoomType, IsAvailable) VALUES (?, ?, 1)",
+           ((str(100 + i), ROOM_TYPES[i % len(ROOM_TYPES)]) for i in range(volumes["rooms"])))
+    insert("PharmacyInventory", "INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES (?, ?, ?)",
+           ((name, rnd.randrange(10_000, 1_000_000), round(rnd.uniform(1, 500), 2)) for name in medication_names(volumes)))
+
+    def appointments():
+        for _ in range(volumes["appointments"]):
+            day = FIRST_DAY + datetime.timedelta(days=rnd.randrange(DAYS))
+            slot = rnd.randrange(20)
+            yield (rnd.choice(doctors), rnd.choice(patients), day.isoformat(), f"{8 + slot // 2:02d}:{slot % 2 * 30:02d}",
+                   str(100 + rnd.randrange(volumes["rooms"])), rnd.choice(departments), int(rnd.random() < 0.02))
+
+    insert("Appointments", """
+        INSERT INTO Appointments (Doctor, Patient, Date, Time, Room, Department, IsEmergency)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, appointments())
+    insert("Treatment", "INSERT INTO Treatment (PatientID, Condition, LengthOfStay, Readmission) VALUES (?, ?, ?, ?)",
+           ((rnd.randrange(1, len(patients) + 1), "Observation", rnd.randrange(1, 30), rnd.random() < 0.2)
+            for _ in range(volumes["treatments"])))
+
+    balances, owed = {}, {}
+    medications = medication_names(volumes)
+
+    def transactions():
+        for i in range(volumes["transactions"]):
+            patient = rnd.choice(patients)
+            transaction_type, sign = rnd.choice(TRANSACTION_TYPES)
+            category = classify(transaction_type)[0]
+            item = medications[i % len(medications)] if transaction_type == "Medication Payment" else None
+            amount = sign * rnd.randrange(100, 100_000) / 100
+            balance = round(balances.get(patient, 0) + amount, 2)
+            balances[patient] = balance
+            if category in RECEIVABLE_CATEGORIES:
+                owed[patient] = round(owed.get(patient, 0) - amount, 2)
+            yield (patient, category, transaction_type, item, amount, balance)
+
+    insert("FinancialTransactions", """
+        INSERT INTO FinancialTransactions (Patient, Category, TransactionType, Item, Amount, Balance)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, transactions())
+    insert("PatientBalances", "INSERT INTO PatientBalances (Patient, Balance) VALUES (?, ?)", balances.items())
+    insert("Receivables", "INSERT INTO Receivables (Patient, Outstanding) VALUES (?, ?)",
+           ((patient, amount) for patient, amount in owed.items() if abs(amount) >= SETTLED))
+
+    started = time.perf_counter()
+    with quiet():
+        aggregates.rebuild()
+    timings["AnalyticsTotals"] = time.perf_counter() - started
+    if progress:
+        progress("AnalyticsTotals", timings["AnalyticsTotals"])
+    return timings
+
+
+def write_manifest(path, volumes, seed):
+    """
+    Record the volumes and seed a database file was generated with, next to it.
+    """
+    with open(path + ".json", "w") as file:
+        json.dump({"volumes": volumes, "seed": seed}, file, indent=2)
+
+
+def read_manifest(path):
+    """
+    Return (volumes, seed) for a database file made by write_manifest, or None.
+    """
+    try:
+        with open(path + ".json") as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        return None
+    return manifest["volumes"], manifest["seed"]
+
+
+def add_volume_arguments(parser):
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="default")
+    for table in PRESETS["default"]:
+        parser.add_argument(f"--{table}", type=int, help=f"override the preset's {table} count")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def print_progress(table, seconds):
+    print(f"  {table:<22} {seconds:8.1f} s", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_volume_arguments(parser)
+    parser.add_argument("--output", required=True, help="SQLite file to create")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        parser.error(f"{args.output} exists; remove it first")
+    volumes = volumes_for(args.preset, **{table: getattr(args, table) for table in PRESETS["default"]})
+    use_sqlite(args.output)
+    print(f"Generating {args.output}: " + ", ".join(f"{count} {table}" for table, count in volumes.items()), file=sys.stderr)
+    timings = generate(volumes, seed=args.seed, progress=print_progress)
+    write_manifest(args.output, volumes, args.seed)
+    print(f"Done in {sum(timings.values()):.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Benchmark suite: times every hot path on synthetic data and compares against a baseline.
+
+Seeds a SQLite stand-in with datagen.py (or reuses a file it generated, with
+--database), times each case below, and writes the results as JSON. With
+--baseline, each case's median is compared with the same case in an earlier
+results file; a case more than --threshold slower is a regression and the
+script exits with status 1, so it can gate a release:
+
+    python benchmarks/suite.py --preset smoke --output results/main.json
+    python benchmarks/suite.py --preset smoke --baseline results/main.json --output results/branch.json
+    python benchmarks/suite.py --database data/bench-release.db --baseline results/1.4.json
+
+Cases that load whole tables run --heavy-repeat times, the rest --repeat times.
+"""
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import warnings
+from unittest import mock
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from common import measure, print_table, quiet, remove_database, use_sqlite
+
+import datagen
+import modules.search as search
+from modules.appointment import Appointment
+from modules.finance import Finance
+from modules.hospital import Hospital
+from modules.pharmacy import Pharmacy
+from modules.user import Admin
+
+# Version of the results file layout.
+RESULTS_FORMAT = 1
+# Slowdown of a case's median, relative to the baseline, that counts as a regression.
+THRESHOLD = 0.25
+# Slowdowns smaller than this are timer noise, whatever the ratio.
+NOISE_FLOOR_MS = 0.05
+# Queries Admin.search is timed with.
+SEARCH_QUERIES = ["patient1234", "amoxi", "cardio"]
+
+
+def answer(*replies):
+    """
+    Stand in for input(): the first prompt gets replies[0], each later one the next reply or the last.
+    """
+    replies = list(replies)
+    return mock.patch("builtins.input", side_effect=lambda prompt="": replies.pop(0) if len(replies) > 1 else replies[0])
+
+
+def case_load_appointments(volumes, rnd):
+    return lambda i: Appointment.load_appointments()
+
+
+def case_save_transaction(volumes, rnd):
+    finance = Finance()
+    patients = datagen.usernames(volumes)["Patient"]
+    return lambda i: finance.save_transaction(rnd.choice(patients), "Deposit", 100)
+
+
+def case_get_balance(volumes, rnd):
+    finance = Finance()
+    patients = datagen.usernames(volumes)["Patient"]
+    return lambda i: finance.get_balance(rnd.choice(patients))
+
+
+def case_dispense_medication(volumes, rnd):
+    pharmacy = Pharmacy()
+    patients = datagen.usernames(volumes)["Patient"]
+    medications = datagen.medication_names(volumes)
+    return lambda i: pharmacy.dispense_medication(rnd.choice(patients), rnd.choice(medications), 1)
+
+
+def case_allocate_room(volumes, rnd):
+    hospital = Hospital("Benchmark Hospital")
+
+    def allocate(i):
+        room_type = datagen.ROOM_TYPES[i % len(datagen.ROOM_TYPES)]
+        room_number = hospital.allocate_room(room_type)
+        if room_number is not None:
+            hospital.release_room(room_number)
+    return allocate
+
+
+def case_search(volumes, rnd):
+    admin = Admin("admin0", "password", "Admin")
+    search.get_index()
+
+    def run(i):
+        with answer(SEARCH_QUERIES[i % len(SEARCH_QUERIES)], "n"):
+            admin.search()
+    return run
+
+
+def case_perform_analysis(choice, streaming=False):
+    def make(volumes, rnd):
+        admin = Admin("admin0", "password", "Admin")
+        # The reports import pandas and seaborn lazily; keep that out of the timings.
+        for name in ("pandas", "seaborn"):
+            importlib.import_module(name)
+
+        def run(i):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                admin.perform_analysis(choice, streaming=streaming)
+            plt.close("all")
+        return run
+    return make
+
+
+# Case name -> (factory(volumes, rnd) returning operation(i), whether it reads whole tables).
+CASES = {
+    "Appointment.load_appointments": (case_load_appointments, True),
+    "Finance.save_transaction": (case_save_transaction, False),
+    "Finance.get_balance": (case_get_balance, False),
+    "Pharmacy.dispense_medication": (case_dispense_medication, False),
+    "Hospital.allocate_room": (case_allocate_room, False),
+    "Admin.search": (case_search, False),
+    "Admin.perform_analysis(1) streaming": (case_perform_analysis(1, streaming=True), True),
+    "Admin.perform_analysis(2)": (case_perform_analysis(2), False),
+    "Admin.perform_analysis(5)": (case_perform_analysis(5), False),
+}
+
+
+def run_cases(names, volumes, repeat, heavy_repeat, seed):
+    """
+    Time each named case and return {name: latency statistics}. Setup (caches,
+    the search index) is done before timing and reported as setup_ms.
+    """
+    results = {}
+    for name in names:
+        factory, heavy = CASES[name]
+        started = time.perf_counter()
+        with quiet():
+            operation = factory(volumes, random.Random(seed))
+        setup_ms = (time.perf_counter() - started) * 1000
+        stats = measure(operation, heavy_repeat if heavy else repeat)
+        stats["setup_ms"] = setup_ms
+        results[name] = stats
+        print(f"  {name:<40} p50 {stats['p50_ms']:10.3f} ms", file=sys.stderr)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def compare(results, baseline, threshold=THRESHOLD, noise_floor_ms=NOISE_FLOOR_MS):
+    """
+    Return a row of baseline median, current median and change per case in
+    both, and the names of the cases whose median grew by more than threshold
+    and by more than noise_floor_ms.
+    """
+    rows, regressions = {}, []
+    for name, stats in results["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        change = stats["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+        rows[name] = {"baseline_ms": before["p50_ms"], "p50_ms": stats["p50_ms"], "change_%": change * 100}
+        if change > threshold and stats["p50_ms"] - before["p50_ms"] > noise_floor_ms:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    datagen.add_volume_arguments(parser)
+    parser.add_argument("--database", help="database made by datagen.py; seeded from scratch if omitted")
+    parser.add_argument("--cases", help=f"comma-separated subset of: {', '.join(CASES)}")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--heavy-repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="slowdown of a median counted as a regression (0.25 = 25%%)")
+    parser.add_argument("--noise-floor-ms", type=float, default=NOISE_FLOOR_MS)
+    args = parser.parse_args()
+
+    names = args.cases.split(",") if args.cases else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    if args.database:
+        manifest = datagen.read_manifest(args.database)
+        if manifest is None:
+            parser.error(f"{args.database} has no datagen manifest ({args.database}.json)")
+        volumes, seed = manifest
+        use_sqlite(args.database)
+        path = None
+    else:
+        volumes = datagen.volumes_for(args.preset, **{table: getattr(args, table) for table in datagen.PRESETS["default"]})
+        seed = args.seed
+        path = use_sqlite()
+        print("Seeding: " + ", ".join(f"{count} {table}" for table, count in volumes.items()), file=sys.stderr)
+        datagen.generate(volumes, seed=seed, progress=datagen.print_progress)
+
+    try:
+        print("Timing:", file=sys.stderr)
+        results = {
+            "format": RESULTS_FORMAT,
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "environment": environment(),
+            "volumes": volumes,
+            "seed": seed,
+            "results": run_cases(names, volumes, args.repeat, args.heavy_repeat, seed),
+        }
+    finally:
+        if path is not None:
+            remove_database(path)
+
+    print_table(f"\nBenchmark suite ({', '.join(f'{count} {table}' for table, count in volumes.items())})",
+                results["results"], columns=("p50_ms", "p95_ms", "max_ms", "setup_ms"))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("volumes") != volumes:
+            print("WARNING: the baseline was measured at other volumes; changes are not comparable.")
+        rows, regressions = compare(results, baseline, args.threshold, args.noise_floor_ms)
+        print_table(f"Against {args.baseline} (median)", rows, columns=("baseline_ms", "p50_ms", "change_%"))
+        for name in regressions:
+            print(f"REGRESSION: {name} is {rows[name]['change_%']:.0f}% slower than the baseline")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -23,9 +23,14 @@ CREATE TABLE Appointments (
     Date DATE NOT NULL,
     Time TIME NOT NULL,
     Room NVARCHAR(50) NOT NULL,
-    Department NVARCHAR(50) NOT NULL
+    Department NVARCHAR(50) NOT NULL,
+    IsEmergency BIT NOT NULL DEFAULT 0
 );
 
+CREATE INDEX IX_Appointments_Doctor_Date ON Appointments (Doctor, Date);
+CREATE INDEX IX_Appointments_Patient_Date ON Appointments (Patient, Date);
+CREATE INDEX IX_Appointments_Date ON Appointments (Date);
+
 CREATE TABLE Prescriptions (
     PrescriptionID INT PRIMARY KEY IDENTITY(1,1),
     Patient NVARCHAR(50) NOT NULL,
@@ -41,30 +46,101 @@ CREATE TABLE PatientRecords (
 CREATE TABLE FinancialTransactions (
     TransactionID INT PRIMARY KEY IDENTITY(1,1),  
     Patient NVARCHAR(50) NOT NULL,
+    Category TINYINT NOT NULL DEFAULT 0,
     TransactionType NVARCHAR(50) NOT NULL,
+    Item NVARCHAR(100) NULL,
     Amount DECIMAL(18, 2) NOT NULL,
     Balance DECIMAL(18, 2) NOT NULL,
     TransactionDate DATETIME DEFAULT GETDATE()  
 );
 
+CREATE INDEX IX_FinancialTransactions_Patient_Date ON FinancialTransactions (Patient, TransactionDate);
+
+CREATE TABLE PatientBalances (
+    Patient NVARCHAR(50) PRIMARY KEY,
+    Balance DECIMAL(18, 2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE Receivables (
+    Patient NVARCHAR(50) PRIMARY KEY,
+    Outstanding DECIMAL(18, 2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE TransactionImports (
+    Source NVARCHAR(400) PRIMARY KEY,
+    Fingerprint CHAR(32) NOT NULL,
+    BytesRead BIGINT NOT NULL DEFAULT 0,
+    LinesRead BIGINT NOT NULL DEFAULT 0,
+    RowsImported BIGINT NOT NULL DEFAULT 0,
+    RowsDuplicate BIGINT NOT NULL DEFAULT 0,
+    RowsInvalid BIGINT NOT NULL DEFAULT 0,
+    RowsHeader BIGINT NOT NULL DEFAULT 0,
+    UpdatedAt DATETIME DEFAULT GETDATE()
+);
+
+CREATE TABLE ImportedTransactionKeys (
+    RowKey CHAR(32) PRIMARY KEY
+);
+
 CREATE TABLE Departments (
     DepartmentID INT PRIMARY KEY IDENTITY(1,1), 
     DepartmentName NVARCHAR(100) NOT NULL,
-    Description NVARCHAR(MAX)
+    Description NVARCHAR(MAX),
+    ChangeVersion ROWVERSION
 );
+
+CREATE INDEX IX_Departments_ChangeVersion ON Departments (ChangeVersion);
 CREATE TABLE Rooms (
     RoomID INT PRIMARY KEY IDENTITY(1,1),  
     RoomNumber NVARCHAR(50) NOT NULL,
     RoomType NVARCHAR(50) NOT NULL,
+    IsAvailable BIT NOT NULL DEFAULT 1
 );
+
+CREATE INDEX IX_Rooms_RoomNumber ON Rooms (RoomNumber);
+CREATE INDEX IX_Rooms_RoomType_IsAvailable ON Rooms (RoomType, IsAvailable);
 CREATE TABLE PharmacyInventory (
     MedicationID INT PRIMARY KEY IDENTITY(1,1),  
     MedicationName NVARCHAR(100) NOT NULL,
     Stock INT NOT NULL,
-    Price DECIMAL(18, 2) NOT NULL
+    Price DECIMAL(18, 2) NOT NULL,
+    ChangeVersion ROWVERSION
+);
+
+CREATE INDEX IX_PharmacyInventory_MedicationName ON PharmacyInventory (MedicationName);
+CREATE INDEX IX_PharmacyInventory_ChangeVersion ON PharmacyInventory (ChangeVersion);
+
+CREATE TABLE MedicationLots (
+    LotID INT PRIMARY KEY IDENTITY(1,1),
+    MedicationID INT NOT NULL,
+    LotNumber NVARCHAR(50),
+    ExpiryDate DATE NOT NULL,
+    Quantity INT NOT NULL,
+    FOREIGN KEY (MedicationID) REFERENCES PharmacyInventory(MedicationID)
+);
+
+CREATE INDEX IX_MedicationLots_MedicationID_ExpiryDate ON MedicationLots (MedicationID, ExpiryDate);
+CREATE INDEX IX_MedicationLots_ExpiryDate ON MedicationLots (ExpiryDate);
+
+CREATE TABLE MedicationDemand (
+    MedicationID INT NOT NULL,
+    Day DATE NOT NULL,
+    Units INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (MedicationID, Day)
+);
 
+CREATE TABLE PriceHistory (
+    PriceChangeID INT PRIMARY KEY IDENTITY(1,1),
+    MedicationID INT NOT NULL,
+    OldPrice DECIMAL(18, 2),
+    NewPrice DECIMAL(18, 2) NOT NULL,
+    Source NVARCHAR(400),
+    ChangedAt DATETIME DEFAULT GETDATE(),
+    FOREIGN KEY (MedicationID) REFERENCES PharmacyInventory(MedicationID)
 );
 
+CREATE INDEX IX_PriceHistory_MedicationID_ChangedAt ON PriceHistory (MedicationID, ChangedAt);
+
 
 CREATE TABLE Staff (
     StaffID INT PRIMARY KEY IDENTITY(1,1),
@@ -74,9 +150,12 @@ CREATE TABLE Staff (
     Shift VARCHAR(50) CHECK (Shift IN ('morning', 'afternoon', 'night')),
     OvertimeHours INT DEFAULT 0,
     Certifications TEXT,
-    TrainingPrograms TEXT
+    TrainingPrograms TEXT,
+    ChangeVersion ROWVERSION
 );
 
+CREATE INDEX IX_Staff_ChangeVersion ON Staff (ChangeVersion);
+
 CREATE TABLE PerformanceEvaluation (
     EvaluationID INT PRIMARY KEY IDENTITY(1,1),
     StaffID INT,
@@ -98,9 +177,12 @@ CREATE TABLE Patient (
     Username VARCHAR(50) UNIQUE,
     Age INT,
     Gender NVARCHAR(50),
-    GeographicLocation VARCHAR(100)
+    GeographicLocation VARCHAR(100),
+    ChangeVersion ROWVERSION
 );
 
+CREATE INDEX IX_Patient_ChangeVersion ON Patient (ChangeVersion);
+
 CREATE TABLE Treatment (
     TreatmentID INT PRIMARY KEY IDENTITY(1,1),
     PatientID INT,
@@ -180,7 +262,8 @@ CREATE TABLE Profitability (
     Department VARCHAR(100),
     Revenue DECIMAL(10, 2),
     Cost DECIMAL(10, 2),
-    Profit DECIMAL(10, 2)
+    Profit DECIMAL(10, 2),
+    Date DATE NULL
 );
 
 CREATE TABLE FinancialAid (
@@ -231,4 +314,41 @@ CREATE TABLE Reports (
     DateGenerated DATE
 );
 
+CREATE TABLE AnalyticsTotals (
+    Metric NVARCHAR(50) NOT NULL,
+    GroupKey NVARCHAR(100) NOT NULL,
+    Entries BIGINT NOT NULL DEFAULT 0,
+    Amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (Metric, GroupKey)
+);
+
+CREATE TABLE FinancialRollups (
+    Day DATE NOT NULL,
+    Dimension VARCHAR(20) NOT NULL,
+    GroupKey NVARCHAR(100) NOT NULL,
+    Entries BIGINT NOT NULL DEFAULT 0,
+    Revenue DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    Cost DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (Dimension, Day, GroupKey)
+);
+
+CREATE TABLE ClosedPeriods (
+    Period VARCHAR(10) NOT NULL,
+    Dimension VARCHAR(20) NOT NULL,
+    PeriodStart DATE NOT NULL,
+    ClosedAt DATETIME DEFAULT GETDATE(),
+    PRIMARY KEY (Period, Dimension, PeriodStart)
+);
+
+CREATE TABLE PeriodTotals (
+    Period VARCHAR(10) NOT NULL,
+    Dimension VARCHAR(20) NOT NULL,
+    PeriodStart DATE NOT NULL,
+    GroupKey NVARCHAR(100) NOT NULL,
+    Entries BIGINT NOT NULL,
+    Revenue DECIMAL(18, 2) NOT NULL,
+    Cost DECIMAL(18, 2) NOT NULL,
+    PRIMARY KEY (Period, Dimension, PeriodStart, GroupKey)
+);
+
 
@@ -1,13 +1,13 @@
 import json
-import readline
-import pyodbc
 from datetime import datetime
 from modules.finance import Finance
 from modules.user import Admin, Doctor, Patient, Receptionist, Nurse
 from modules.hospital import Hospital
 from modules.appointment import Appointment
 from modules.pharmacy import Pharmacy
-from modules.user import load_nationalities, complete
+from modules.user import enable_completion
+import modules.auth as auth
+import modules.completion as completion
 import modules.database as Database
 
 
@@ -17,90 +17,82 @@ class Admin:
         self.password = password
 
     def signup(self, username, password, role, phone_number, age, gender, salary, profession, department, chronic_disease, nationality):
-        conn = Database()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO Users (Username, Password, Role, PhoneNumber, Age, Gender, Salary, Profession, Department, ChronicDisease, Nationality)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, username, password, role, phone_number, age, gender, salary, profession, department, chronic_disease, nationality)
-        conn.commit()
-        conn.close()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO Users (Username, Password, Role, PhoneNumber, Age, Gender, Salary, Profession, Department, ChronicDisease, Nationality)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (username, password, role, phone_number, age, gender, salary, profession, department, chronic_disease, nationality))
+            conn.commit()
 
     def login(self, username, password):
-        conn = Database()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Users WHERE Username = ? AND Password = ?", username, password)
-        user = cursor.fetchone()
-        conn.close()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM Users WHERE Username = ? AND Password = ?", (username, password))
+            user = cursor.fetchone()
         return user is not None
 
     def add_user(self, username, password, role, phone_number, age, gender, salary, profession, department):
         self.signup(username, password, role, phone_number, age, gender, salary, profession, department, None, None)
 
     def remove_user(self, username):
-        conn = Database()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM Users WHERE Username = ?", username)
-        conn.commit()
-        conn.close()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM Users WHERE Username = ?", (username,))
+            conn.commit()
+        auth.get_service().invalidate([username])
 
     def view_financial_insights(self):
-        conn = Database()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM FinancialTransactions")
-        transactions = cursor.fetchall()
-        for transaction in transactions:
-            print(transaction)
-        conn.close()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM FinancialTransactions")
+            transactions = cursor.fetchall()
+            for transaction in transactions:
+                print(transaction)
 
     def update_pharmacy_inventory(self, medication, stock):
-        conn = Database()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE PharmacyInventory SET Stock = ? WHERE MedicationName = ?", stock, medication)
-        conn.commit()
-        conn.close()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE PharmacyInventory SET Stock = ? WHERE MedicationName = ?", (stock, medication))
+            conn.commit()
 
     def view_pharmacy_inventory(self):
-        conn = Database()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM PharmacyInventory")
-        inventory = cursor.fetchall()
-        for item in inventory:
-            print(item)
-        conn.close()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM PharmacyInventory")
+            inventory = cursor.fetchall()
+            for item in inventory:
+                print(item)
 
     def add_department(self, hospital, department_name, description):
-        conn = Database()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO Departments (DepartmentName, Description) VALUES (?, ?)", department_name, description)
-        conn.commit()
-        conn.close()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO Departments (DepartmentName, Description) VALUES (?, ?)", (department_name, description))
+            conn.commit()
 
     def remove_department(self, hospital, department_name):
-        conn = Database()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM Departments WHERE DepartmentName = ?", department_name)
-        conn.commit()
-        conn.close()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM Departments WHERE DepartmentName = ?", (department_name,))
+            conn.commit()
 
     def add_room(self, hospital, room_number, room_type):
-        conn = Database()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO Rooms (RoomNumber, RoomType) VALUES (?, ?)", room_number, room_type)
-        conn.commit()
-        conn.close()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO Rooms (RoomNumber, RoomType) VALUES (?, ?)", (room_number, room_type))
+            conn.commit()
 
     def view_all_users(self):
-        conn = Database()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Users")
-        users = cursor.fetchall()
-        for user in users:
-            print(user)
-        conn.close()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM Users")
+            users = cursor.fetchall()
+            for user in users:
+                print(user)
 
 
 def main():
+    enable_completion()
     hospital = Hospital('Al-Shifa Hospital')
     hospital.add_room(101, 'Single')
     hospital.add_room(102, 'Double')
@@ -108,15 +100,19 @@ def main():
     admin = Admin('admin', 'admin123')
     username = interactive_input(admin)
 
-    users = admin.load_users()
-    role = users[username]['role'].lower()
+    profile = auth.get_service().lookup(username)
+    if profile is None:
+        print(f"No user named {username}.")
+        return
+    role = profile['role'].lower()
+    # Profiles carry no password; it was checked when the user logged in.
 
     match role:
         case 'admin':
             print(f"Welcome, Admin {username}!")
             admin_menu(admin, hospital)
         case 'doctor':
-            doctor = Doctor(username, users[username]['password'])
+            doctor = Doctor(username, None)
             print(f"Welcome, Dr. {username}!")
             while True:
                 print("\n1. View Appointments\n2. Write Prescription\n3. View Patient Records\n4. Add Patient Record\n5. Exit")
@@ -125,14 +121,14 @@ def main():
                     case '1':
                         doctor.view_appointments()
                     case '2':
-                        patient = input("Enter patient username: ")
+                        patient = completion.prompt("Enter patient username: ", 'patient')
                         prescription = input("Enter prescription: ")
                         doctor.write_prescriptions(patient, prescription)
                     case '3':
-                        patient = input("Enter patient username: ")
+                        patient = completion.prompt("Enter patient username: ", 'patient')
                         doctor.view_patient_records(patient)
                     case '4':
-                        patient = input("Enter patient username: ")
+                        patient = completion.prompt("Enter patient username: ", 'patient')
                         record = input("Enter record details: ")
                         doctor.add_patient_record(patient, record)
                     case '5':
@@ -141,7 +137,7 @@ def main():
                     case _:
                         print("Invalid choice. Please try again.")
         case 'patient':
-            patient = Patient(username, users[username]['password'])
+            patient = Patient(username, None)
             print(f"Welcome, {username}!")
             while True:
                 print("\n1. View Appointments\n2. Request Appointment\n3. Exit")
@@ -150,13 +146,13 @@ def main():
                     case '1':
                         patient.view_appointments()
                     case '2':
-                        doctor = input("Enter doctor username: ")
+                        doctor = completion.prompt("Enter doctor username: ", 'doctor')
                         date = input("Enter date (YYYY-MM-DD): ")
                         time = input("Enter time (HH:MM): ")
                         room = int(input("Enter room number: "))
                         print("Available departments:")
                         hospital.view_departments()
-                        department = input("Enter department: ")
+                        department = completion.prompt("Enter department: ", 'department')
                         patient.request_appointments(doctor, date, time, room, department)
                     case '3':
                         print("Thank you for using our HMS. Have a nice day!")
@@ -164,21 +160,21 @@ def main():
                     case _:
                         print("Invalid choice. Please try again.")
         case 'receptionist':
-            receptionist = Receptionist(username, users[username]['password'])
+            receptionist = Receptionist(username, None)
             print(f"Welcome, {username}!")
             while True:
                 print("\n1. Book Appointment\n2. Cancel Appointment\n3. Allocate Room\n4. Release Room\n5. View Rooms\n6. Exit")
                 choice = input("Enter your choice: ")
                 match choice:
                     case '1':
-                        doctor = input("Enter doctor username: ")
-                        patient = input("Enter patient username: ")
+                        doctor = completion.prompt("Enter doctor username: ", 'doctor')
+                        patient = completion.prompt("Enter patient username: ", 'patient')
                         date = input("Enter date (YYYY-MM-DD): ")
                         time = input("Enter time (HH:MM): ")
                         room = int(input("Enter room number: "))
                         print("Available departments:")
                         hospital.view_departments()
-                        department = input("Enter department: ")
+                        department = completion.prompt("Enter department: ", 'department')
                         receptionist.book_appointments(doctor, patient, date, time, room, department)
                     case '2':
                         appointment_id = int(input("Enter appointment ID to cancel: "))
@@ -197,7 +193,7 @@ def main():
                     case _:
                         print("Invalid choice. Please try again.")
         case 'nurse':
-            nurse = Nurse(username, users[username]['password'])
+            nurse = Nurse(username, None)
             print(f"Welcome, Nurse {username}!")
             while True:
                 print("\n1. View Patient Records\n2. View Prescriptions\n3. Exit")
@@ -1,17 +1,48 @@
-from .user import User, Doctor, Patient, Receptionist, Nurse
-from .hospital import Hospital
-from .appointment import Appointment
-from .finance import Finance
-from .pharmacy import Pharmacy
+import importlib
 
-__all__ = [
-    "User",
-    "Doctor",
-    "Patient",
-    "Receptionist",
-    "Nurse",
-    "Hospital",
-    "Appointment",
-    "Finance",
-    "Pharmacy",
-]
\ No newline at end of file
+# Public names and the submodule defining each. They are imported on first
+# access, so importing one module (say modules.user at login) does not import
+# all of them.
+_EXPORTS = {
+    "User": "user",
+    "Doctor": "user",
+    "Patient": "user",
+    "Receptionist": "user",
+    "Nurse": "user",
+    "Hospital": "hospital",
+    "Appointment": "appointment",
+    "Finance": "finance",
+    "TransactionImporter": "importer",
+    "Ledger": "ledger",
+    "LogStore": "logstore",
+    "Pharmacy": "pharmacy",
+    "RoomAllocator": "rooms",
+    "BookingIndex": "schedule",
+    "BookingConflict": "schedule",
+    "AsyncHospital": "async_api",
+    "AsyncFinance": "async_api",
+    "AsyncPharmacy": "async_api",
+    "AsyncAppointment": "async_api",
+    "BoundedExecutor": "async_api",
+    "SearchIndex": "search",
+    "StreamingSummary": "analytics",
+    "Completer": "completion",
+    "AuthService": "auth",
+    "DemandForecast": "forecast",
+    "CatalogLoader": "catalog",
+    "FinancialRollups": "rollups",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,114 @@
+from decimal import Decimal
+import modules.database as database
+
+# Totals behind the admin dashboards, kept in AnalyticsTotals: per metric and
+# group, the number of source rows (Entries) and the sum of one column (Amount).
+# The write paths add to them in the same transaction as the rows they write
+# (bookings, save_appointments and cancellations; dispense_medication;
+# Finance.track_revenue and track_costs), so dashboards read one row per group
+# instead of scanning. Staff has no write path in the application; rows written
+# by anything else are picked up by rebuild(), and check() reports any drift.
+#
+# metric: (source table, grouped column, summed column or None to only count rows)
+METRICS = {
+    'appointments_by_department': ('Appointments', 'Department', None),
+    'staff_by_role': ('Staff', 'Role', None),
+    'prescriptions_by_medication': ('PrescriptionTrends', 'MedicationID', 'PrescriptionCount'),
+    'revenue_by_source': ('Revenue', 'Source', 'Amount'),
+    'costs_by_category': ('Costs', 'Category', 'Amount'),
+}
+
+# Amounts closer than this are taken as equal by check().
+TOLERANCE = Decimal('0.005')
+
+def record(cursor, metric, key, entries=1, amount=0):
+    """
+    Add to one group's totals inside the caller's transaction. Errors are raised.
+    """
+    record_many(cursor, metric, {key: (entries, amount)})
+
+
+def record_many(cursor, metric, deltas):
+    """
+    Add {key: (entries, amount)} to a metric's totals inside the caller's transaction.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}.")
+    database.executemany(cursor, _upsert(), (
+        (metric, str(key), entries, amount)
+        for key, (entries, amount) in deltas.items() if key is not None and (entries or amount)))
+
+
+def totals(metric):
+    """
+    Return {group key: (entries, amount)} for the metric's non-empty groups.
+    """
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT GroupKey, Entries, Amount FROM AnalyticsTotals
+            WHERE Metric = ? AND Entries <> 0
+        """, (metric,))
+        return {row.GroupKey: (row.Entries, row.Amount) for row in cursor}
+
+
+def rebuild():
+    """
+    Recompute every metric from its source table in one transaction. Run it
+    after upgrading a database or bulk-loading rows, while nothing else writes.
+
+    Returns:
+        dict: Number of groups per metric.
+    """
+    groups = {}
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM AnalyticsTotals")
+        for metric in METRICS:
+            cursor.execute(f"""
+                INSERT INTO AnalyticsTotals (Metric, GroupKey, Entries, Amount)
+                SELECT ?, GroupKey, Entries, Amount FROM ({_source_query(metric)}) AS source
+            """, (metric,))
+            groups[metric] = cursor.rowcount
+        conn.commit()
+    return groups
+
+
+def check():
+    """
+    Compare the stored totals with the source tables.
+
+    Returns:
+        list: (metric, key, stored (entries, amount), actual (entries, amount))
+        for every group that differs; empty if everything matches.
+    """
+    mismatches = []
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        for metric in METRICS:
+            cursor.execute(_source_query(metric))
+            actual = {row.GroupKey: (row.Entries, row.Amount) for row in cursor}
+            cursor.execute("SELECT GroupKey, Entries, Amount FROM AnalyticsTotals WHERE Metric = ?", (metric,))
+            stored = {row.GroupKey: (row.Entries, row.Amount) for row in cursor}
+            for key in stored.keys() | actual.keys():
+                have, want = stored.get(key, (0, 0)), actual.get(key, (0, 0))
+                if have[0] != want[0] or abs(Decimal(str(have[1])) - Decimal(str(want[1]))) >= TOLERANCE:
+                    mismatches.append((metric, key, have, want))
+    return mismatches
+
+
+def _source_query(metric):
+    table, column, summed = METRICS[metric]
+    amount = f"COALESCE(SUM({summed}), 0)" if summed else "0"
+    return f"""
+        SELECT CAST({column} AS NVARCHAR(100)) AS GroupKey, COUNT(*) AS Entries, {amount} AS Amount
+        FROM {table}
+        WHERE {column} IS NOT NULL
+        GROUP BY {column}
+    """
+
+
+def _upsert():
+    return database.get_dialect().upsert('AnalyticsTotals', ['Metric', 'GroupKey'],
+                                         ['Metric', 'GroupKey', 'Entries', 'Amount'],
+                                         increment=['Entries', 'Amount'])
@@ -0,0 +1,235 @@
+import math
+from modules.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Rows per chunk when Admin.perform_analysis streams a query.
+CHUNK_SIZE = 50_000
+# Bins kept by a QuantileSketch. Columns with at most this many distinct values
+# get exact quantiles.
+SKETCH_BINS = 4096
+# Percentiles reported by describe(), as in DataFrame.describe().
+PERCENTILES = (0.25, 0.5, 0.75)
+
+class QuantileSketch:
+    """
+    Streaming quantiles of the numeric values seen, kept as at most `max_bins`
+    (value, count) bins.
+
+    Each distinct value has its own bin until there are more than max_bins of
+    them, so a column like Age gets exactly the quantiles pandas computes
+    (linear interpolation). Past that, neighbouring bins are merged into bins of
+    about equal count and quantile() is off by roughly 2 / max_bins in rank.
+    """
+
+    def __init__(self, max_bins=SKETCH_BINS):
+        self.max_bins = max_bins
+        self.values = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.exact = True
+
+    def update(self, values):
+        """
+        Add an array of non-null values.
+        """
+        if len(values):
+            self._merge(*np.unique(values, return_counts=True))
+
+    def merge(self, other):
+        self.exact = self.exact and other.exact
+        self._merge(other.values, other.counts)
+
+    def quantile(self, q):
+        total = int(self.counts.sum())
+        if not total:
+            return math.nan
+        position = (total - 1) * q
+        below = math.floor(position)
+        cumulative = np.cumsum(self.counts)
+        low = self.values[np.searchsorted(cumulative, below, side='right')]
+        high = self.values[np.searchsorted(cumulative, min(below + 1, total - 1), side='right')]
+        # Same interpolation as numpy.quantile, so exact sketches match pandas to the bit.
+        fraction = position - below
+        if fraction >= 0.5:
+            return float(high - (high - low) * (1 - fraction))
+        return float(low + (high - low) * fraction)
+
+    def _merge(self, values, counts):
+        merged, inverse = np.unique(np.concatenate([self.values, values]), return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts]),
+                                  minlength=len(merged)).astype(np.int64)
+        self.values = merged
+        if len(merged) > self.max_bins:
+            self._compress()
+
+    def _compress(self):
+        # Group neighbouring bins into max_bins // 2 groups of about equal count;
+        # each group becomes one bin at its weighted mean.
+        total = self.counts.sum()
+        groups = (np.cumsum(self.counts) - self.counts) * (self.max_bins // 2) // total
+        counts = np.bincount(groups, weights=self.counts)
+        sums = np.bincount(groups, weights=self.values * self.counts)
+        keep = counts > 0
+        self.values = sums[keep] / counts[keep]
+        self.counts = counts[keep].astype(np.int64)
+        self.exact = False
+
+
+class RunningStats:
+    """
+    Count, mean, standard deviation, min, max and quantiles of one numeric
+    column, merged chunk by chunk (the pairwise update of Chan et al. for the
+    variance).
+    """
+
+    def __init__(self, max_bins=SKETCH_BINS):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch(max_bins)
+
+    def update(self, values):
+        """
+        Add an array of non-null values.
+        """
+        n = len(values)
+        if not n:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.sketch.update(values)
+
+    def describe(self, percentiles=PERCENTILES):
+        """
+        Return the DataFrame.describe() statistics as a dict.
+        """
+        empty = self.count == 0
+        result = {
+            'count': float(self.count),
+            'mean': math.nan if empty else self.mean,
+            'std': math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan,
+            'min': math.nan if empty else self.min,
+        }
+        for q in percentiles:
+            result[f"{q * 100:g}%"] = self.sketch.quantile(q)
+        result['max'] = math.nan if empty else self.max
+        return result
+
+
+class StreamingSummary:
+    """
+    Aggregates a query read in chunks (pd.read_sql(..., chunksize=...)) into
+    the figures Admin.perform_analysis reports: describe() of the numeric
+    columns, value counts of the `counted` columns and counts of each
+    (x, hue) pair in `pairs`.
+
+    Memory grows with the number of distinct values counted and the sketch
+    size, not with the number of rows. Results are laid out as the pandas
+    calls on the whole result would lay them out, so the printed output
+    matches; quantiles are exact while a column has at most max_bins distinct
+    values.
+    """
+
+    def __init__(self, columns, counted=(), pairs=(), max_bins=SKETCH_BINS):
+        self.columns = list(columns)
+        self.rows = 0
+        self._stats = {column: RunningStats(max_bins) for column in self.columns}
+        self._counts = {column: {} for column in counted}
+        self._pairs = {tuple(pair): {} for pair in pairs}
+        # Per column: dtypes of the chunks that had values, and whether any value was null.
+        self._dtypes = {}
+        self._nulls = {}
+
+    def consume(self, chunks):
+        for chunk in chunks:
+            self.update(chunk)
+        return self
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        columns = set(self.columns) | set(self._counts) | {column for pair in self._pairs for column in pair}
+        for column in columns:
+            series = chunk[column]
+            present = series.notna()
+            if not present.all():
+                self._nulls[column] = True
+            if present.any():
+                self._dtypes.setdefault(column, set()).add(series.dtype)
+
+        for column in self.columns:
+            series = chunk[column]
+            if _is_numeric(series.dtype):
+                values = series.to_numpy(dtype=float, na_value=np.nan)
+                self._stats[column].update(values[~np.isnan(values)])
+
+        for column, counts in self._counts.items():
+            for value, count in chunk[column].value_counts(sort=False).items():
+                counts[value] = counts.get(value, 0) + int(count)
+
+        for pair, counts in self._pairs.items():
+            for key, count in chunk.groupby(list(pair), sort=False, dropna=True).size().items():
+                counts[key] = counts.get(key, 0) + int(count)
+
+    def describe(self, percentiles=PERCENTILES):
+        """
+        DataFrame.describe() of the numeric columns, as computed on the whole result.
+        """
+        numeric = [column for column in self.columns if self._numeric(column)]
+        return pd.DataFrame({column: self._stats[column].describe(percentiles) for column in numeric},
+                            columns=numeric)
+
+    def value_counts(self, column, normalize=False):
+        """
+        Series.value_counts() of a counted column, as computed on the whole result.
+        """
+        counts = self._counts[column]
+        series = pd.Series(list(counts.values()), index=self._index(column, list(counts)),
+                           name='proportion' if normalize else 'count', dtype='int64')
+        series = series.sort_values(ascending=False, kind='stable')
+        if normalize:
+            series = series / series.sum()
+        return series
+
+    def pair_counts(self, x, hue):
+        """
+        Rows per (x, hue) pair as a DataFrame with columns x, hue and 'count', in
+        order of first appearance; what sns.countplot(x=x, hue=hue) would count.
+        """
+        counts = self._pairs[(x, hue)]
+        keys = list(counts)
+        return pd.DataFrame({
+            x: self._index(x, [key[0] for key in keys]),
+            hue: self._index(hue, [key[1] for key in keys]),
+            'count': list(counts.values()),
+        })
+
+    def _numeric(self, column):
+        dtypes = self._dtypes.get(column)
+        return bool(dtypes) and all(_is_numeric(dtype) for dtype in dtypes)
+
+    def _index(self, column, values):
+        # Chunks of one column can differ in dtype (int64 in a chunk without
+        # NULLs, float64 in one with them); use the dtype of the whole result.
+        dtypes = self._dtypes.get(column, ())
+        index = pd.Index(values, name=column)
+        if dtypes and all(_is_numeric(dtype) for dtype in dtypes):
+            dtype = np.result_type(*dtypes)
+            if self._nulls.get(column) and dtype.kind in 'iu':
+                dtype = np.dtype(float)
+            index = index.astype(dtype)
+        return index
+
+
+def _is_numeric(dtype):
+    # DataFrame.describe() leaves booleans out of the numeric columns.
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
@@ -1,5 +1,13 @@
-import pyodbc
+from operator import itemgetter
+import modules.aggregates as aggregates
 import modules.database as database
+import modules.schedule as schedule
+
+# Order of the appointment fields as stored in the Appointments table.
+APPOINTMENT_FIELDS = ('doctor', 'patient', 'date', 'time', 'room', 'department', 'is_emergency')
+
+# Appointments returned per page by Appointment.find_appointments.
+PAGE_SIZE = 50
 
 class Appointment:
     def __init__(self, doctor, patient, date, time, room, department, is_emergency=False):
@@ -11,93 +19,176 @@ class Appointment:
         self.department = department
         self.is_emergency = is_emergency
 
-    @staticmethod
-    def database():
+    def book_appointment(self):
         """
-        Establish a connection to the database.
+        Book an appointment and save it to the database, unless the doctor or room
+        is already booked for that slot; then suggest the nearest free slot instead.
         """
         try:
-            conn = database
-            return conn
+            self.appointment_id = schedule.get_index().book(self.doctor, self.patient, self.date, self.time,
+                                                            self.room, self.department, self.is_emergency)
+            print("Appointment booked successfully.")
+            return self.appointment_id
+        except schedule.BookingConflict as e:
+            print(f"Cannot book appointment: {e}.")
+            Appointment.suggest_slot(self.date, self.time, doctor=self.doctor, room=self.room)
         except Exception as e:
-            print(f"Error connecting to the database: {e}")
-            return None
+            print(f"Error booking appointment: {e}")
+        return None
 
-    def book_appointment(self):
+    @staticmethod
+    def suggest_slot(date, time, doctor=None, room=None):
         """
-        Book an appointment and save it to the database.
+        Print and return the free slot nearest to the requested one.
         """
-        conn = self.database()
-        if conn is None:
-            return
-
-        cursor = conn.cursor()
         try:
-            cursor.execute("""
-                INSERT INTO Appointments (Doctor, Patient, Date, Time, Room, Department, IsEmergency)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (self.doctor, self.patient, self.date, self.time, self.room, self.department, self.is_emergency))
-            
-            conn.commit()
-            print("Appointment booked successfully.")
+            slot = schedule.get_index().nearest_free_slot(date, time, doctor=doctor, room=room)
+            if slot is None:
+                print("No free slot found in the next two weeks.")
+            else:
+                print(f"Nearest free slot: {slot[0]} at {slot[1]}.")
+            return slot
         except Exception as e:
-            print(f"Error booking appointment: {e}")
-        finally:
-            conn.close()
+            print(f"Error finding a free slot: {e}")
+            return None
 
     @staticmethod
     def load_appointments():
         """
         Load all appointments from the database.
         """
-        conn = Appointment.database()
-        if conn is None:
-            return {}
-
-        cursor = conn.cursor()
         appointments = {}
         try:
-            cursor.execute("SELECT * FROM Appointments")
-            for row in cursor:
-                appointments[row.AppointmentID] = {
-                    'doctor': row.Doctor,
-                    'patient': row.Patient,
-                    'date': row.Date,
-                    'time': row.Time,
-                    'room': row.Room,
-                    'department': row.Department,
-                    'is_emergency': row.IsEmergency
-                }
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM Appointments")
+                for row in cursor:
+                    appointments[row.AppointmentID] = Appointment._details(row)
         except Exception as e:
             print(f"Error loading appointments: {e}")
-        finally:
-            conn.close()
         return appointments
 
+    @staticmethod
+    def find_appointments(doctor=None, patient=None, department=None, room=None, date_from=None, date_to=None,
+                          after=None, limit=PAGE_SIZE):
+        """
+        Load one page of appointments matching the given filters, ordered by date, time and ID.
+
+        Filtering happens in the database, so a doctor's or patient's page is an index lookup
+        on (Doctor, Date) / (Patient, Date) however large the table is. date_from and date_to
+        are inclusive. Pass the returned key as `after` to fetch the next page.
+
+        Returns:
+            tuple: (appointments, next_key). next_key is None on the last page.
+        """
+        conditions, params = [], []
+        for column, value in (('Doctor', doctor), ('Patient', patient), ('Department', department), ('Room', room)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if date_from is not None:
+            conditions.append("Date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append("Date <= ?")
+            params.append(date_to)
+        if after is not None:
+            last_date, last_time, last_id = after
+            conditions.append("(Date > ? OR (Date = ? AND (Time > ? OR (Time = ? AND AppointmentID > ?))))")
+            params.extend([last_date, last_date, last_time, last_time, last_id])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = database.get_dialect().limit(f"""
+            SELECT AppointmentID, Doctor, Patient, Date, Time, Room, Department, IsEmergency
+            FROM Appointments
+            {where}
+            ORDER BY Date, Time, AppointmentID
+        """, limit + 1)
+
+        appointments = {}
+        next_key = None
+        try:
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+            for row in rows[:limit]:
+                appointments[row.AppointmentID] = Appointment._details(row)
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                next_key = (last.Date, last.Time, last.AppointmentID)
+        except Exception as e:
+            print(f"Error finding appointments: {e}")
+        return appointments, next_key
+
+    @staticmethod
+    def _details(row):
+        return {
+            'doctor': row.Doctor,
+            'patient': row.Patient,
+            'date': row.Date,
+            'time': row.Time,
+            'room': row.Room,
+            'department': row.Department,
+            'is_emergency': row.IsEmergency
+        }
+
     @staticmethod
     def save_appointments(appointments):
         """
         Save all appointments to the database.
-        """
-        conn = Appointment.database()
-        if conn is None:
-            return
 
-        cursor = conn.cursor()
+        Only the difference from the stored table is written: appointments whose ID is
+        already stored are updated if they changed, stored IDs missing from `appointments`
+        are deleted, and the remaining entries are inserted and receive new IDs.
+        Returns the number of rows inserted, updated and deleted.
+        """
+        changes = {'inserted': 0, 'updated': 0, 'deleted': 0}
         try:
-            # Clear  appointments
-            cursor.execute("DELETE FROM Appointments")
-            
-            # Insert updated appointments
-            for appointment_id, details in appointments.items():
+            with database.connection() as conn:
+                cursor = conn.cursor()
                 cursor.execute("""
+                    SELECT AppointmentID, Doctor, Patient, Date, Time, Room, Department, IsEmergency
+                    FROM Appointments
+                """)
+                stored = {row[0]: tuple(row[1:]) for row in cursor}
+
+                inserts, updates = [], []
+                departments = {}
+                fields = itemgetter(*APPOINTMENT_FIELDS)
+                department = APPOINTMENT_FIELDS.index('department')
+                for appointment_id, details in appointments.items():
+                    values = fields(details)
+                    current = stored.pop(appointment_id, None)
+                    if current is None:
+                        inserts.append(values)
+                        departments[values[department]] = departments.get(values[department], 0) + 1
+                    elif current != values:
+                        updates.append(values + (appointment_id,))
+                        departments[current[department]] = departments.get(current[department], 0) - 1
+                        departments[values[department]] = departments.get(values[department], 0) + 1
+                for current in stored.values():
+                    departments[current[department]] = departments.get(current[department], 0) - 1
+
+                changes['deleted'] = database.executemany(cursor, """
+                    DELETE FROM Appointments WHERE AppointmentID = ?
+                """, ((appointment_id,) for appointment_id in stored))
+                changes['updated'] = database.executemany(cursor, """
+                    UPDATE Appointments
+                    SET Doctor = ?, Patient = ?, Date = ?, Time = ?, Room = ?, Department = ?, IsEmergency = ?
+                    WHERE AppointmentID = ?
+                """, updates)
+                changes['inserted'] = database.executemany(cursor, """
                     INSERT INTO Appointments (Doctor, Patient, Date, Time, Room, Department, IsEmergency)
                     VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (details['doctor'], details['patient'], details['date'], details['time'], details['room'], details['department'], details['is_emergency']))
-            
-            conn.commit()
-            print("Appointments saved successfully.")
+                """, inserts)
+                aggregates.record_many(cursor, 'appointments_by_department',
+                                       {name: (count, 0) for name, count in departments.items()})
+
+                conn.commit()
+                schedule.reset_index()
+                print(f"Appointments saved successfully ({changes['inserted']} added, "
+                      f"{changes['updated']} updated, {changes['deleted']} removed).")
         except Exception as e:
             print(f"Error saving appointments: {e}")
-        finally:
-            conn.close()
\ No newline at end of file
+        return changes
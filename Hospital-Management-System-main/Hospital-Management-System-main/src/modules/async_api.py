@@ -0,0 +1,211 @@
+import asyncio
+import functools
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import modules.database as database
+from modules.appointment import Appointment
+from modules.finance import Finance
+from modules.hospital import Hospital
+from modules.pharmacy import Pharmacy
+
+# Calls admitted per worker (running or queued) before callers have to wait.
+PENDING_PER_WORKER = 4
+
+class ServiceBusy(Exception):
+    """
+    Raised when a call is not admitted within the executor's admission_timeout.
+    """
+
+
+class BoundedExecutor:
+    """
+    Runs the blocking module operations on a fixed set of worker threads.
+
+    At most `max_pending` calls are admitted at once; further callers wait on
+    an asyncio.Semaphore, which is the backpressure: a burst of desks queues
+    in the event loop instead of piling work onto the database. With
+    `admission_timeout` set, a caller that waits longer gets ServiceBusy. A
+    call keeps its slot until its worker is done with it, even when the
+    caller is cancelled first.
+
+    Each worker holds at most one pooled connection, so max_workers defaults to
+    the size of the connection pool; more workers would only wait on the pool.
+    The workers are shared by every event loop that uses the executor, such as
+    successive asyncio.run() calls; each loop gets its own semaphore.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, admission_timeout=None):
+        max_workers = max_workers or database.get_pool().size
+        self.max_workers = max_workers
+        self.max_pending = max_pending or PENDING_PER_WORKER * max_workers
+        self.admission_timeout = admission_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hms-worker")
+        # Semaphores are bound to the event loop they are first used in.
+        self._slots = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Run function(*args, **kwargs) on a worker thread and return its result.
+        """
+        loop = asyncio.get_running_loop()
+        slots = self._loop_slots(loop)
+        started = time.perf_counter()
+        try:
+            if self.admission_timeout is None:
+                await slots.acquire()
+            else:
+                await asyncio.wait_for(slots.acquire(), self.admission_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._rejected += 1
+            raise ServiceBusy(f"No capacity for {function.__name__} within {self.admission_timeout} seconds.") from None
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._pending += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            work = self._executor.submit(functools.partial(function, *args, **kwargs))
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            slots.release()
+            raise
+        # The slot is released when the worker finishes, not when the caller stops waiting.
+        work.add_done_callback(functools.partial(self._finish, loop, slots))
+        return await asyncio.wrap_future(work)
+
+    def _loop_slots(self, loop):
+        with self._lock:
+            slots = self._slots.get(loop)
+            if slots is None:
+                slots = self._slots[loop] = asyncio.Semaphore(self.max_pending)
+            return slots
+
+    def _finish(self, loop, slots, work):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            if work.cancelled() or work.exception() is not None:
+                self._failed += 1
+        try:
+            loop.call_soon_threadsafe(slots.release)
+        except RuntimeError:
+            # The loop is closed, and its semaphore is gone with it.
+            pass
+
+    def stats(self):
+        """
+        Return a snapshot of executor usage counters.
+        """
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'avg_admission_wait_seconds': self._wait_total / self._completed if self._completed else 0.0,
+                'max_admission_wait_seconds': self._wait_max,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class AsyncFacade:
+    """
+    Exposes every method of the wrapped object as a coroutine run on the executor,
+    e.g. `await facade.get_balance(patient)`. Other attributes are passed through.
+    """
+
+    def __init__(self, target, executor=None):
+        self.target = target
+        self.executor = executor or get_executor()
+
+    def __getattr__(self, name):
+        attribute = getattr(self.target, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def call(*args, **kwargs):
+            return await self.executor.run(attribute, *args, **kwargs)
+        return call
+
+
+class AsyncHospital(AsyncFacade):
+    """
+    Hospital operations: `await hospital.schedule_appointment(...)`, `allocate_room(...)`, ...
+    """
+
+    @classmethod
+    async def create(cls, name, executor=None):
+        executor = executor or get_executor()
+        return cls(await executor.run(Hospital, name), executor)
+
+
+class AsyncFinance(AsyncFacade):
+    """
+    Finance operations: `await finance.save_transaction(...)`, `get_balance(...)`, ...
+    """
+
+    @classmethod
+    async def create(cls, executor=None):
+        executor = executor or get_executor()
+        return cls(await executor.run(Finance), executor)
+
+
+class AsyncPharmacy(AsyncFacade):
+    """
+    Pharmacy operations: `await pharmacy.dispense_medication(...)`, `update_inventory(...)`, ...
+    One Pharmacy, and so one inventory cache, is shared by every desk.
+    """
+
+    @classmethod
+    async def create(cls, reconcile_interval=None, executor=None):
+        executor = executor or get_executor()
+        return cls(await executor.run(Pharmacy, reconcile_interval), executor)
+
+
+class AsyncAppointment(AsyncFacade):
+    """
+    Appointment operations: `await appointments.book_appointment(...)` and the
+    Appointment static methods (find_appointments, load_appointments, ...).
+    """
+
+    def __init__(self, executor=None):
+        super().__init__(Appointment, executor)
+
+    async def book_appointment(self, doctor, patient, date, time, room, department, is_emergency=False):
+        """
+        Book an appointment; returns its AppointmentID, or None if it was refused.
+        """
+        appointment = Appointment(doctor, patient, date, time, room, department, is_emergency)
+        return await self.executor.run(appointment.book_appointment)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Return the executor shared by facades created without one.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = BoundedExecutor()
+        return _executor
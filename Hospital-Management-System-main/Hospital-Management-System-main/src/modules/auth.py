@@ -0,0 +1,129 @@
+import threading
+from collections import OrderedDict
+import modules.database as database
+
+# Profiles kept by an AuthService; about 1 KB each.
+SESSION_CACHE_SIZE = 1024
+
+# Users columns and the profile keys they are returned under, as in User.load_users().
+PROFILE_FIELDS = {
+    'Password': 'password',
+    'Role': 'role',
+    'PhoneNumber': 'phone_number',
+    'Age': 'age',
+    'Gender': 'gender',
+    'Salary': 'salary',
+    'Profession': 'profession',
+    'Department': 'department',
+    'ChronicDisease': 'chronic_disease',
+    'Nationality': 'nationality',
+}
+
+PROFILE_QUERY = f"SELECT {', '.join(PROFILE_FIELDS)} FROM Users WHERE Username = ?"
+
+
+def profile_from_row(row):
+    """
+    Return the profile dict of a Users row.
+    """
+    return {key: getattr(row, column) for column, key in PROFILE_FIELDS.items()}
+
+
+class AuthService:
+    """
+    Logins and profile lookups, one Users row each.
+
+    The row is fetched by primary key, so a lookup costs one index seek however
+    many users there are. The profiles of the last `cache_size` users looked up
+    are kept, without their passwords, so the role and profile checks during a
+    session do not go back to the database. Whatever changes or deletes
+    existing users should call invalidate(); users that do not exist are never
+    cached, so inserts need not.
+
+    authenticate() always reads the user's row, so a password changed or a user
+    deleted elsewhere (another process, a direct UPDATE) takes effect at the
+    next login, and the cached profile is refreshed from that row.
+    """
+
+    def __init__(self, cache_size=SESSION_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._profiles = OrderedDict()
+
+    def lookup(self, username):
+        """
+        Return the profile of `username` (the dict User.load_users() keeps per
+        user, without the password), or None.
+        """
+        with self._lock:
+            profile = self._profiles.get(username)
+            if profile is not None:
+                self._profiles.move_to_end(username)
+                return profile
+        row = self._fetch(username)
+        return self._remember(username, row) if row is not None else None
+
+    def authenticate(self, username, password):
+        """
+        Return the profile of `username` if `password` is theirs, else None.
+        The password is checked against the database, never the cache.
+        """
+        row = self._fetch(username)
+        if row is None:
+            self.invalidate([username])
+            return None
+        profile = self._remember(username, row)
+        return profile if row.Password == password else None
+
+    def role(self, username):
+        """
+        Return the role of `username` in lower case, or None if there is no such user.
+        """
+        profile = self.lookup(username)
+        return profile['role'].lower() if profile is not None else None
+
+    def invalidate(self, usernames=None):
+        """
+        Drop the cached profiles of `usernames` (an iterable), or all of them.
+        """
+        with self._lock:
+            if usernames is None:
+                self._profiles.clear()
+            else:
+                for username in usernames:
+                    self._profiles.pop(username, None)
+
+    def __len__(self):
+        return len(self._profiles)
+
+    @staticmethod
+    def _fetch(username):
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(PROFILE_QUERY, (username,))
+            return cursor.fetchone()
+
+    def _remember(self, username, row):
+        profile = profile_from_row(row)
+        del profile['password']
+        with self._lock:
+            self._profiles[username] = profile
+            self._profiles.move_to_end(username)
+            if len(self._profiles) > self.cache_size:
+                self._profiles.popitem(last=False)
+        return profile
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """
+    Return the AuthService shared by everything in this process.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = AuthService()
+        return _service
@@ -0,0 +1,270 @@
+import json
+import math
+import os
+import re
+import time
+from decimal import Decimal, InvalidOperation
+import modules.database as database
+
+# Catalog entries diffed and applied together.
+CHUNK_SIZE = 10_000
+# Names per IN (...) list when looking up medications.
+NAME_LOOKUP_CHUNK = 500
+# Characters read from the file at a time.
+READ_SIZE = 1 << 20
+# Characters kept buffered past the start of a value, more than any number or literal needs.
+LOOKAHEAD = 64
+# Longest single entry, in characters; past this an undecodable entry is an error, not a partial read.
+MAX_ENTRY_SIZE = 1 << 24
+# Invalid entries and price changes kept in the stats as examples.
+MAX_SAMPLES = 20
+
+CENT = Decimal('0.01')
+MAX_PRICE_CENTS = 10 ** 18
+WHITESPACE = re.compile(r'[ \t\r\n]*')
+
+
+class CatalogError(ValueError):
+    """
+    The catalog file is not a JSON object or array of medication entries.
+    """
+
+
+def iter_catalog(path, read_size=READ_SIZE):
+    """
+    Yield (name, entry) for each medication in a catalog file, reading it
+    `read_size` characters at a time. The file holds either an object keyed
+    by medication name ({"Aspirin": {"price": 10.0, "stock": 100}, ...}) or an
+    array of entries with a "name" field. Only one entry is decoded at a time,
+    so memory does not grow with the file.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig') as file:
+        buffer, position, eof = '', 0, False
+
+        def fill():
+            nonlocal buffer, position, eof
+            more = file.read(read_size)
+            eof = not more
+            buffer, position = buffer[position:] + more, 0
+            return not eof
+
+        def next_char():
+            nonlocal position
+            while True:
+                position = WHITESPACE.match(buffer, position).end()
+                if position < len(buffer):
+                    return buffer[position]
+                if not fill():
+                    raise CatalogError("unexpected end of file")
+
+        def decode():
+            nonlocal position
+            next_char()
+            # Numbers and literals are not self-delimiting; keep enough of the
+            # file buffered that one is never cut off by the end of the buffer.
+            while len(buffer) - position < LOOKAHEAD and fill():
+                pass
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as e:
+                    if len(buffer) - position > MAX_ENTRY_SIZE or eof or not fill():
+                        raise CatalogError(f"invalid JSON: {e.msg}") from None
+                    continue
+                position = end
+                return value
+
+        def expect(*chars):
+            nonlocal position
+            char = next_char()
+            if char not in chars:
+                raise CatalogError(f"expected {' or '.join(repr(c) for c in chars)}, found {char!r}")
+            position += 1
+            return char
+
+        opening = expect('{', '[')
+        closing = '}' if opening == '{' else ']'
+        if next_char() == closing:
+            return
+        while True:
+            if opening == '{':
+                name = decode()
+                if not isinstance(name, str):
+                    raise CatalogError("object keys must be strings")
+                expect(':')
+                entry = decode()
+            else:
+                entry = decode()
+                name = entry.get('name') if isinstance(entry, dict) else None
+            yield name, entry
+            if expect(',', closing) == closing:
+                return
+
+
+class CatalogLoader:
+    """
+    Applies a medication price catalog to PharmacyInventory.
+
+    The file is parsed incrementally (see iter_catalog) and handled in chunks
+    of `chunk_size` entries. Each chunk's medications are looked up by name,
+    and only the differences are written, in batched statements. A changed
+    price updates the medication. A medication not yet in the inventory is
+    added with the catalog's price and stock. Both are recorded in
+    PriceHistory. Stock of existing medications is left alone; it is counted
+    by the pharmacy, not by the price list. Each chunk is committed on its own.
+
+    With dry_run=True nothing is written, and the stats describe the delta the
+    catalog would apply. Errors are raised to the caller.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, progress=None):
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+    def run(self, path, dry_run=False):
+        """
+        Diff the catalog against the inventory, apply it unless dry_run, and return the counters.
+        """
+        source = os.path.abspath(path)
+        stats = {
+            'source': source,
+            'dry_run': dry_run,
+            'entries': 0,
+            'unchanged': 0,
+            'price_changes': 0,
+            'new': 0,
+            'invalid': 0,
+            'rejects': [],
+            'changes': [],
+            'seconds': 0.0,
+        }
+        # Names changed or added so far in a dry run, since the database does not record them.
+        pending = {} if dry_run else None
+        started = time.perf_counter()
+        chunk = {}
+        for name, entry in iter_catalog(path):
+            stats['entries'] += 1
+            item, reason = self._parse(name, entry)
+            if reason is not None:
+                stats['invalid'] += 1
+                if len(stats['rejects']) < MAX_SAMPLES:
+                    stats['rejects'].append((stats['entries'], reason))
+                continue
+            chunk[item[0]] = item
+            if len(chunk) >= self.chunk_size:
+                self._apply(source, chunk, stats, pending, started)
+                chunk = {}
+        self._apply(source, chunk, stats, pending, started)
+        return stats
+
+    @staticmethod
+    def _parse(name, entry):
+        """
+        Return ((name, price in cents, stock), None) for a valid entry, (None, reason) otherwise.
+        """
+        if not isinstance(name, str) or not 0 < len(name) <= 100 or not name.strip():
+            return None, "name must be 1-100 characters"
+        if not isinstance(entry, dict):
+            return None, f"{name}: entry must be an object"
+        price = _cents(entry.get('price'))
+        if price is None:
+            return None, f"{name}: price must be a number"
+        if not 0 <= price < MAX_PRICE_CENTS:
+            return None, f"{name}: price out of range"
+        stock = entry.get('stock', 0)
+        if type(stock) is not int or stock < 0:
+            return None, f"{name}: stock must be a non-negative integer"
+        return (name.strip(), price, stock), None
+
+    def _apply(self, source, chunk, stats, pending, started):
+        if not chunk:
+            return
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            current = _lookup(cursor, list(chunk))
+
+            changes, new = [], []
+            for name, price, stock in chunk.values():
+                if pending is not None and name in pending:
+                    old = pending[name]
+                elif name in current:
+                    old = current[name][1]
+                else:
+                    new.append((name, stock, _price(price)))
+                    continue
+                if old == price:
+                    stats['unchanged'] += 1
+                else:
+                    changes.append((name, _price(old), _price(price)))
+            for name, old, price in changes:
+                if len(stats['changes']) < MAX_SAMPLES:
+                    stats['changes'].append((name, old, price))
+            stats['price_changes'] += len(changes)
+            stats['new'] += len(new)
+
+            if pending is not None:
+                pending.update((name, _cents(price)) for name, _, price in changes)
+                pending.update((name, _cents(price)) for name, _, price in new)
+            else:
+                database.executemany(cursor, "UPDATE PharmacyInventory SET Price = ? WHERE MedicationID = ?",
+                                     ((price, current[name][0]) for name, _, price in changes))
+                database.executemany(cursor, "INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES (?, ?, ?)",
+                                     new)
+                added = _lookup(cursor, [name for name, _, _ in new]) if new else {}
+                history = [(current[name][0], old, price, source) for name, old, price in changes]
+                history.extend((added[name][0], None, price, source) for name, _, price in new)
+                database.executemany(cursor, "INSERT INTO PriceHistory (MedicationID, OldPrice, NewPrice, Source) VALUES (?, ?, ?, ?)",
+                                     history)
+                conn.commit()
+
+        stats['seconds'] = time.perf_counter() - started
+        if self.progress is not None:
+            self.progress(stats)
+
+
+def _lookup(cursor, names):
+    """
+    Return {name: (MedicationID, price in cents)} for the names in the inventory, taking the lowest ID of duplicates.
+    """
+    found = {}
+    for start in range(0, len(names), NAME_LOOKUP_CHUNK):
+        batch = names[start:start + NAME_LOOKUP_CHUNK]
+        cursor.execute(f"""
+            SELECT MedicationID, MedicationName, Price FROM PharmacyInventory
+            WHERE MedicationName IN ({', '.join('?' for _ in batch)})
+        """, batch)
+        for medication_id, name, price in cursor.fetchall():
+            if name not in found or medication_id < found[name][0]:
+                found[name] = (medication_id, _cents(price))
+    return found
+
+
+def _cents(value):
+    """
+    Return a price (number, numeric string or Decimal) in whole cents, or None if it is not a finite number.
+    """
+    if type(value) is float:
+        return round(value * 100) if math.isfinite(value) else None
+    if type(value) is int:
+        return value * 100
+    if isinstance(value, bool) or not isinstance(value, (str, int, float, Decimal)):
+        return None
+    try:
+        value = Decimal(value).quantize(CENT)
+    except (InvalidOperation, ValueError):
+        return None
+    return int(value.scaleb(2)) if value.is_finite() else None
+
+
+def _price(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def print_progress(stats):
+    """
+    Progress callback for CatalogLoader that prints one line per chunk.
+    """
+    rate = stats['entries'] / stats['seconds'] if stats['seconds'] else 0
+    print(f"{stats['entries']} entries, {stats['price_changes']} price changes, {stats['new']} new, "
+          f"{stats['invalid']} invalid ({rate:.0f} entries/s)")
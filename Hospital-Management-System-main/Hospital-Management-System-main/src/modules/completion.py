@@ -0,0 +1,213 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import modules.database as database
+
+# Prefixes whose matches each Completer keeps.
+CACHE_SIZE = 256
+# Seconds before a database-backed completer reloads its source.
+REFRESH_SECONDS = 60
+# Sorts after every case-folded character, so (prefix, prefix + END) brackets all words starting with prefix.
+END = '\U0010ffff'
+NATIONALITIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "nationalities-common.json")
+
+class CompletionIndex:
+    """
+    Words sorted by their case-folded form, so the words starting with a prefix
+    are one contiguous run found with two bisects: O(log n + matches) per lookup
+    however many words there are.
+    """
+
+    def __init__(self, words):
+        self._words = sorted(set(filter(None, words)), key=str.casefold)
+        self._keys = [word.casefold() for word in self._words]
+
+    def __len__(self):
+        return len(self._words)
+
+    def matches(self, prefix):
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_right(self._keys, prefix + END, lo=start)
+        return self._words[start:end]
+
+
+class StaticSource:
+    """
+    A fixed list of words.
+    """
+
+    max_age = None
+
+    def __init__(self, words):
+        self.words = list(words)
+
+    def load(self):
+        return self.words
+
+
+class NationalitiesSource:
+    """
+    The nationality names in data/nationalities-common.json.
+    """
+
+    max_age = None
+
+    def __init__(self, path=NATIONALITIES_PATH):
+        self.path = path
+
+    def load(self):
+        with open(self.path, 'r') as file:
+            return json.load(file)['Nationalities']
+
+
+class QuerySource:
+    """
+    The first column of a query; reloaded once the completer's copy is max_age seconds old.
+    """
+
+    max_age = REFRESH_SECONDS
+
+    def __init__(self, query, params=()):
+        self.query = query
+        self.params = params
+
+    def load(self):
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.query, self.params)
+            return [row[0] for row in cursor if row[0] is not None]
+
+
+class PharmacyInventorySource(QuerySource):
+    """
+    Medication names from PharmacyInventory.
+    """
+
+    def __init__(self):
+        super().__init__("SELECT DISTINCT MedicationName FROM PharmacyInventory")
+
+
+class UsersSource(QuerySource):
+    """
+    Usernames from Users, optionally only those with one role (e.g. 'doctor').
+    """
+
+    def __init__(self, role=None):
+        if role is None:
+            super().__init__("SELECT Username FROM Users")
+        else:
+            super().__init__("SELECT Username FROM Users WHERE LOWER(Role) = ?", (role.lower(),))
+
+
+class DepartmentsSource(QuerySource):
+    """
+    Department names from Departments.
+    """
+
+    def __init__(self):
+        super().__init__("SELECT DISTINCT DepartmentName FROM Departments")
+
+
+class Completer:
+    """
+    Prefix completion over one source.
+
+    The source is loaded into a CompletionIndex on first use and again once it
+    is older than the source's max_age (None: never). The matches of the last
+    CACHE_SIZE prefixes are kept, so the repeated calls readline makes for one
+    Tab press, one per candidate, cost a list index each.
+    """
+
+    def __init__(self, source, cache_size=CACHE_SIZE):
+        self.source = source
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._index = None
+        self._loaded_at = None
+        self._cache = OrderedDict()
+        self._last = []
+
+    def matches(self, text):
+        """
+        Return the words starting with text, ignoring case, in case-folded order.
+        """
+        key = text.casefold()
+        with self._lock:
+            self._refresh_if_stale()
+            found = self._cache.get(key)
+            if found is not None:
+                self._cache.move_to_end(key)
+                return found
+            found = self._index.matches(key)
+            self._cache[key] = found
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return found
+
+    def complete(self, text, state):
+        """
+        readline completer: the state-th match for text, or None after the last one.
+        """
+        if state == 0:
+            self._last = self.matches(text)
+        return self._last[state] if state < len(self._last) else None
+
+    def refresh(self):
+        """
+        Drop the index and the cached matches; the source is loaded again on next use.
+        """
+        with self._lock:
+            self._index = None
+
+    def _refresh_if_stale(self):
+        max_age = self.source.max_age
+        if (self._index is None
+                or (max_age is not None and time.monotonic() - self._loaded_at >= max_age)):
+            self._index = CompletionIndex(self.source.load())
+            self._loaded_at = time.monotonic()
+            self._cache.clear()
+
+
+# Completers shared by the prompts, by the kind of value completed.
+SOURCES = {
+    'nationality': NationalitiesSource,
+    'medication': PharmacyInventorySource,
+    'doctor': lambda: UsersSource('doctor'),
+    'patient': lambda: UsersSource('patient'),
+    'user': UsersSource,
+    'department': DepartmentsSource,
+}
+
+_completers = {}
+_completers_lock = threading.Lock()
+
+
+def get_completer(kind):
+    """
+    Return the completer shared by everything in this process for one of SOURCES.
+    """
+    with _completers_lock:
+        completer = _completers.get(kind)
+        if completer is None:
+            completer = _completers[kind] = Completer(SOURCES[kind]())
+        return completer
+
+
+def prompt(text, kind):
+    """
+    input(text) with Tab completing values of `kind`; the previous completer is restored afterwards.
+    """
+    try:
+        import readline
+    except ImportError:
+        return input(text)
+    previous = readline.get_completer()
+    readline.set_completer(get_completer(kind).complete)
+    try:
+        return input(text)
+    finally:
+        readline.set_completer(previous)
@@ -1,26 +1,928 @@
-import pyodbc
-
-def create_connection():
-    """
-    Create a connection to the SQL Server database.
-    
-    Returns:
-        pyodbc.Connection: A connection object if successful, otherwise None.
-    """
-    try:
-        connection_string = (
-            "DRIVER={SQL Server};"
-            "SERVER=DESKTOP-MA8DP5U;" 
-            "DATABASE=HospitalManagement;"  
-            "Trusted_Connection=yes;"  
-            )
-
-        connection = pyodbc.connect(connection_string)
-        print("Connection to SQL Server successful.")
-        return connection
-    except pyodbc.Error as e:
-        print(f"Error connecting to SQL Server: {e}")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return None
\ No newline at end of file
+import bisect
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import lru_cache
+from itertools import islice
+
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+CONNECTION_STRING = (
+    "DRIVER={SQL Server};"
+    "SERVER=DESKTOP-MA8DP5U;"
+    "DATABASE=HospitalManagement;"
+    "Trusted_Connection=yes;"
+)
+
+# Backend used when nothing else is configured: "sqlserver" or "sqlite".
+BACKEND = os.environ.get("HMS_DB_BACKEND", "sqlserver")
+SQLITE_PATH = os.environ.get("HMS_SQLITE_PATH", os.path.join("data", "hospital.db"))
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "hospital database.sql")
+
+# Pool defaults. A connection that has sat idle longer than
+# HEALTH_CHECK_INTERVAL seconds is pinged before it is handed out again.
+POOL_SIZE = 5
+CHECKOUT_TIMEOUT = 30
+HEALTH_CHECK_INTERVAL = 60
+
+# Rows sent to the server per executemany() round trip.
+BATCH_SIZE = 1000
+
+# Query instrumentation. HMS_DB_INSTRUMENT turns it on at startup: "all", or
+# comma-separated module names ("finance,pharmacy"). Statements slower than
+# SLOW_QUERY_SECONDS go to the slow-query log, and to HMS_DB_SLOW_LOG (JSON
+# lines) if set.
+INSTRUMENT = os.environ.get("HMS_DB_INSTRUMENT", "")
+SLOW_QUERY_SECONDS = float(os.environ.get("HMS_DB_SLOW_QUERY_SECONDS", "0.2"))
+SLOW_QUERY_LOG = os.environ.get("HMS_DB_SLOW_LOG")
+# Slow statements kept in memory.
+SLOW_QUERY_LOG_SIZE = 100
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Modules that run SQL on behalf of another; instrumenting the key instruments them too.
+MODULE_GROUPS = {
+    'finance': ('ledger', 'importer'),
+    'hospital': ('rooms', 'schedule'),
+    'appointment': ('schedule',),
+    'user': ('auth', 'search'),
+}
+
+
+class SqlServerDialect:
+    """
+    SQL Server through pyodbc. The schema is managed with hospital database.sql.
+    """
+    name = "sqlserver"
+    now = "GETDATE()"
+    today = "CAST(GETDATE() AS DATE)"
+    supports_fast_executemany = True
+
+    def __init__(self, connection_string=CONNECTION_STRING):
+        self.connection_string = connection_string
+
+    def connect(self):
+        if pyodbc is None:
+            raise RuntimeError("pyodbc is not installed; the SQL Server backend is unavailable.")
+        return pyodbc.connect(self.connection_string)
+
+    def limit(self, query, count):
+        """
+        Restrict a SELECT to its first `count` rows.
+        """
+        return re.sub(r"^\s*SELECT\b", f"SELECT TOP {count}", query, count=1, flags=re.IGNORECASE)
+
+    def upsert(self, table, key_columns, columns, increment=()):
+        """
+        Build an insert-or-update statement taking one parameter per column, in `columns` order.
+        Columns named in `increment` are added to the stored value instead of replacing it.
+        If every column is a key column, an existing row is left as it is.
+        """
+        placeholders = ", ".join("?" for _ in columns)
+        column_list = ", ".join(columns)
+        on = " AND ".join(f"target.{c} = source.{c}" for c in key_columns)
+        updates = ", ".join(f"{c} = target.{c} + source.{c}" if c in increment else f"{c} = source.{c}"
+                            for c in columns if c not in key_columns)
+        values = ", ".join(f"source.{c}" for c in columns)
+        return (
+            f"MERGE INTO {table} WITH (HOLDLOCK) AS target "
+            f"USING (VALUES ({placeholders})) AS source ({column_list}) "
+            f"ON {on} "
+            + (f"WHEN MATCHED THEN UPDATE SET {updates} " if updates else "") +
+            f"WHEN NOT MATCHED THEN INSERT ({column_list}) VALUES ({values});"
+        )
+
+    def insert_returning(self, table, columns, returning):
+        """
+        Build a single-row INSERT that returns the new row's `returning` column, e.g. its IDENTITY.
+        """
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) OUTPUT INSERTED.{returning} "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+
+    def add_column(self, table, column, definition):
+        """
+        Build an ALTER TABLE adding one column to an existing table.
+        """
+        return f"ALTER TABLE {table} ADD {column} {definition}"
+
+
+# SQLite has no DECIMAL type; bind Decimals as text and let the column's NUMERIC affinity convert them.
+sqlite3.register_adapter(Decimal, str)
+
+
+class SqliteRow(sqlite3.Row):
+    """
+    sqlite3.Row that also exposes columns as attributes, like pyodbc.Row.
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except IndexError:
+            raise AttributeError(name) from None
+
+
+class SqliteDialect:
+    """
+    Embedded SQLite in WAL mode. The schema is derived from hospital database.sql
+    and created the first time a database file is opened.
+    """
+    name = "sqlite"
+    now = "CURRENT_TIMESTAMP"
+    today = "DATE('now')"
+    supports_fast_executemany = False
+
+    def __init__(self, path=SQLITE_PATH, schema_path=SCHEMA_PATH):
+        self.path = path
+        self.schema_path = schema_path
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=CHECKOUT_TIMEOUT, check_same_thread=False)
+        conn.row_factory = SqliteRow
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    with open(self.schema_path, "r") as file:
+                        tsql = file.read()
+                    # Tables created before a ROWVERSION column existed get it first,
+                    # so the script's indexes and triggers on it can be created.
+                    for table, column in rowversion_columns(tsql):
+                        present = {row[1].lower() for row in conn.execute(f"PRAGMA table_info({table})")}
+                        if present and column.lower() not in present:
+                            conn.execute(self.add_column(table, column, "ROWVERSION"))
+                    conn.executescript(sqlite_schema(tsql))
+                    self._schema_ready = True
+        return conn
+
+    def limit(self, query, count):
+        """
+        Restrict a SELECT to its first `count` rows.
+        """
+        return f"{query.rstrip()} LIMIT {count}"
+
+    def upsert(self, table, key_columns, columns, increment=()):
+        """
+        Build an insert-or-update statement taking one parameter per column, in `columns` order.
+        Columns named in `increment` are added to the stored value instead of replacing it.
+        If every column is a key column, an existing row is left as it is.
+        """
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{c} = {table}.{c} + excluded.{c}" if c in increment else f"{c} = excluded.{c}"
+                            for c in columns if c not in key_columns)
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({', '.join(key_columns)}) " + (f"DO UPDATE SET {updates}" if updates else "DO NOTHING")
+        )
+
+    def insert_returning(self, table, columns, returning):
+        """
+        Build a single-row INSERT that returns the new row's `returning` column, e.g. its IDENTITY.
+        """
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)}) RETURNING {returning}"
+        )
+
+    def add_column(self, table, column, definition):
+        """
+        Build an ALTER TABLE adding one column to an existing table.
+        """
+        definition = re.sub(r"\bROWVERSION\b", "INTEGER NOT NULL DEFAULT 0", definition, flags=re.IGNORECASE)
+        return f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+
+
+def sqlite_schema(tsql):
+    """
+    Translate the T-SQL DDL in hospital database.sql into an idempotent SQLite script.
+    """
+    script = re.sub(r"^\s*(CREATE DATABASE|USE)\b.*$", "", tsql, flags=re.IGNORECASE | re.MULTILINE)
+    script = re.sub(r"\bINT\s+PRIMARY\s+KEY\s+IDENTITY\s*\(\s*1\s*,\s*1\s*\)",
+                    "INTEGER PRIMARY KEY AUTOINCREMENT", script, flags=re.IGNORECASE)
+    script = re.sub(r"\(\s*MAX\s*\)", "", script, flags=re.IGNORECASE)
+    script = re.sub(r"\bGETDATE\(\)", "CURRENT_TIMESTAMP", script, flags=re.IGNORECASE)
+    script = re.sub(r"\bCREATE (TABLE|INDEX)\b(?!\s+IF NOT EXISTS)", r"CREATE \1 IF NOT EXISTS", script, flags=re.IGNORECASE)
+    script = re.sub(r",(\s*)\)", r"\1)", script)
+
+    # SQLite has no ROWVERSION; emulate it with a database-wide counter bumped by triggers.
+    script = re.sub(r"\bROWVERSION\b", "INTEGER NOT NULL DEFAULT 0", script, flags=re.IGNORECASE)
+    for table, column in rowversion_columns(tsql):
+        bump = f"UPDATE {table} SET {column} = (SELECT MAX({column}) FROM {table}) + 1 WHERE rowid = NEW.rowid;"
+        script += (
+            f"\nCREATE TRIGGER IF NOT EXISTS {table}_{column}_insert AFTER INSERT ON {table}\n"
+            f"BEGIN {bump} END;\n"
+            f"CREATE TRIGGER IF NOT EXISTS {table}_{column}_update AFTER UPDATE ON {table}\n"
+            f"WHEN NEW.{column} = OLD.{column}\n"
+            f"BEGIN {bump} END;\n"
+        )
+    return script
+
+
+def rowversion_columns(tsql):
+    """
+    Return (table, column) for every ROWVERSION column in the T-SQL DDL.
+    """
+    return [(table, column)
+            for table, body in re.findall(r"CREATE TABLE\s+(\w+)\s*\((.*?)\);", tsql, flags=re.IGNORECASE | re.DOTALL)
+            for column in re.findall(r"(\w+)\s+ROWVERSION\b", body, flags=re.IGNORECASE)]
+
+
+DIALECTS = {
+    SqlServerDialect.name: SqlServerDialect,
+    SqliteDialect.name: SqliteDialect,
+}
+
+
+def create_connection():
+    """
+    Create a standalone connection to the configured database, outside the pool.
+
+    Returns:
+        A driver connection object if successful, otherwise None.
+    """
+    try:
+        connection = get_dialect().connect()
+        print(f"Connection to {get_dialect().name} successful.")
+        return connection
+    except Exception as e:
+        print(f"Error connecting to the database: {e}")
+        return None
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no pooled connection becomes free within the checkout timeout.
+    """
+
+
+class PooledConnection:
+    """
+    A checked-out connection. Behaves like the underlying driver connection,
+    except that close() hands it back to the pool instead of disconnecting.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise AttributeError(f"Connection has been returned to the pool: {name}")
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    A fixed-size pool of database connections.
+
+    At most `size` connections are live at once. Connections are opened lazily,
+    reused most-recently-used first, health checked after sitting idle and
+    rolled back before they go back into the pool.
+    """
+
+    def __init__(self, factory, size=POOL_SIZE, timeout=CHECKOUT_TIMEOUT,
+                 health_check_interval=HEALTH_CHECK_INTERVAL):
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._live = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self, timeout=None):
+        """
+        Check out a connection, waiting up to `timeout` seconds for a free slot.
+        """
+        if self._closed:
+            raise PoolTimeout("Connection pool is closed.")
+
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"No database connection became free within {timeout} seconds.")
+
+        try:
+            raw = self._checkout_raw()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return PooledConnection(self, raw)
+
+    def _checkout_raw(self):
+        while True:
+            try:
+                raw, idle_since = self._idle.pop()
+            except IndexError:
+                break
+            if time.monotonic() - idle_since < self.health_check_interval or self._is_healthy(raw):
+                return raw
+            self._discard(raw)
+
+        raw = self.factory()
+        with self._lock:
+            self._live += 1
+            self._created += 1
+        return raw
+
+    def release(self, raw):
+        """
+        Return a raw connection to the pool. Uncommitted work is rolled back.
+        """
+        try:
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+        else:
+            if self._closed:
+                self._discard(raw)
+            else:
+                self._idle.append((raw, time.monotonic()))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    @staticmethod
+    def _is_healthy(raw):
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._live -= 1
+            self._discarded += 1
+
+    def stats(self):
+        """
+        Return a snapshot of pool usage counters.
+        """
+        with self._lock:
+            return {
+                'size': self.size,
+                'live_connections': self._live,
+                'idle_connections': len(self._idle),
+                'in_use': self._in_use,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'connections_created': self._created,
+                'connections_discarded': self._discarded,
+                'total_wait_seconds': self._wait_total,
+                'avg_wait_seconds': self._wait_total / self._checkouts if self._checkouts else 0.0,
+                'max_wait_seconds': self._wait_max,
+            }
+
+    def close(self):
+        """
+        Close all idle connections. Checked-out connections are closed as they come back.
+        """
+        self._closed = True
+        while True:
+            try:
+                raw, _ = self._idle.pop()
+            except IndexError:
+                break
+            self._discard(raw)
+
+
+_STRING_LITERAL = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_ROWS = re.compile(r"(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(query):
+    """
+    Reduce a statement to its shape: literals become ?, IN lists and multi-row
+    VALUES collapse to one entry and whitespace is normalised, so statements
+    differing only in their values are counted together.
+    """
+    shape = _STRING_LITERAL.sub("?", query)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    shape = _VALUES_ROWS.sub(r"\1, ...", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class StatementStats:
+    """
+    Counters for one statement fingerprint issued by one module.
+    """
+
+    __slots__ = ("count", "errors", "rows", "total_seconds", "max_seconds", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        # One count per LATENCY_BUCKETS bound, plus one for slower statements.
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'rows': self.rows,
+            'total_seconds': self.total_seconds,
+            'avg_seconds': self.total_seconds / self.count if self.count else 0.0,
+            'max_seconds': self.max_seconds,
+            'buckets': dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"], self.buckets)),
+        }
+
+
+class QueryStats:
+    """
+    Per-statement counters of the instrumented connections: executions, errors,
+    rows and a latency histogram per (module, fingerprint), plus a log of the
+    statements slower than slow_query_seconds. Latency is the time spent in
+    execute()/executemany()/commit(); rows are those fetched, or the rowcount
+    of writes.
+    """
+
+    def __init__(self, slow_query_seconds=SLOW_QUERY_SECONDS, slow_log_path=SLOW_QUERY_LOG,
+                 slow_log_size=SLOW_QUERY_LOG_SIZE):
+        self.slow_query_seconds = slow_query_seconds
+        self.slow_log_path = slow_log_path
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def record(self, module, statement, seconds, rows=0, error=False):
+        key = (module, statement)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = StatementStats()
+            stats.count += 1
+            stats.errors += error
+            stats.rows += rows
+            stats.total_seconds += seconds
+            if seconds > stats.max_seconds:
+                stats.max_seconds = seconds
+            stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        if seconds >= self.slow_query_seconds:
+            self._log_slow(module, statement, seconds, error)
+
+    def _log_slow(self, module, statement, seconds, error):
+        entry = {'at': time.time(), 'module': module, 'statement': statement,
+                 'seconds': seconds, 'error': bool(error)}
+        self.slow_queries.append(entry)
+        if self.slow_log_path:
+            with self._lock, open(self.slow_log_path, "a") as file:
+                file.write(json.dumps(entry) + "\n")
+
+    def snapshot(self):
+        """
+        Return [{module, statement, count, errors, rows, ...}], slowest total time first.
+        """
+        with self._lock:
+            rows = [dict(stats.as_dict(), module=module, statement=statement)
+                    for (module, statement), stats in self._statements.items()]
+        return sorted(rows, key=lambda row: -row['total_seconds'])
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self.slow_queries.clear()
+
+    def to_json(self, indent=None):
+        return json.dumps({'statements': self.snapshot(), 'slow_queries': list(self.slow_queries)}, indent=indent)
+
+    def to_prometheus(self, prefix="hms_db"):
+        """
+        Return the counters in the Prometheus text exposition format.
+        """
+        lines = [
+            f"# HELP {prefix}_statement_seconds Time spent executing SQL statements.",
+            f"# TYPE {prefix}_statement_seconds histogram",
+        ]
+        statements = self.snapshot()
+        for row in statements:
+            labels = _prometheus_labels(module=row['module'], statement=row['statement'])
+            cumulative = 0
+            for bound, count in row['buckets'].items():
+                cumulative += count
+                lines.append(f'{prefix}_statement_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{prefix}_statement_seconds_sum{{{labels}}} {row['total_seconds']}")
+            lines.append(f"{prefix}_statement_seconds_count{{{labels}}} {row['count']}")
+        for metric, key, help_text in (("statement_rows_total", 'rows', "Rows fetched or written by SQL statements."),
+                                       ("statement_errors_total", 'errors', "SQL statements that raised.")):
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} counter")
+            for row in statements:
+                labels = _prometheus_labels(module=row['module'], statement=row['statement'])
+                lines.append(f"{prefix}_{metric}{{{labels}}} {row[key]}")
+        return "\n".join(lines) + "\n"
+
+
+def _prometheus_labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+class InstrumentedCursor:
+    """
+    A driver cursor that reports each statement it runs to a QueryStats.
+
+    A statement is recorded, with the rows fetched from it, when the cursor
+    runs the next one or its connection is closed, so recording costs one
+    locked update per statement.
+    """
+
+    __slots__ = ("_raw", "_stats", "_module", "_statement", "_seconds", "_rows")
+
+    def __init__(self, raw, stats, module):
+        self._raw = raw
+        self._stats = stats
+        self._module = module
+        self._statement = None
+        self._seconds = 0.0
+        self._rows = 0
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    @property
+    def fast_executemany(self):
+        return self._raw.fast_executemany
+
+    @fast_executemany.setter
+    def fast_executemany(self, value):
+        self._raw.fast_executemany = value
+
+    def execute(self, query, *params):
+        self._run(self._raw.execute, query, params)
+        return self
+
+    def executemany(self, query, rows):
+        self._run(self._raw.executemany, query, (rows,))
+        return self
+
+    def _run(self, method, query, params):
+        self.flush()
+        statement = fingerprint(query)
+        started = time.perf_counter()
+        try:
+            method(query, *params)
+        except Exception:
+            self._stats.record(self._module, statement, time.perf_counter() - started, error=True)
+            raise
+        self._seconds = time.perf_counter() - started
+        self._statement = statement
+        # Writes report their rows here; SELECTs as they are fetched.
+        rowcount = self._raw.rowcount
+        self._rows = rowcount if rowcount > 0 else 0
+
+    def flush(self):
+        """
+        Record the last statement run, if it has not been recorded yet.
+        """
+        if self._statement is not None:
+            self._stats.record(self._module, self._statement, self._seconds, self._rows)
+            self._statement = None
+
+    def fetchone(self):
+        row = self._raw.fetchone()
+        if row is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, *size):
+        rows = self._raw.fetchmany(*size)
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._raw.fetchall()
+        self._rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._raw:
+            self._rows += 1
+            yield row
+
+    def close(self):
+        self.flush()
+        self._raw.close()
+
+
+class InstrumentedConnection:
+    """
+    A connection whose cursors and commits report to a QueryStats under
+    `module`. Behaves like the wrapped connection otherwise.
+    """
+
+    def __init__(self, raw, stats, module):
+        self._raw = raw
+        self._stats = stats
+        self._module = module
+        self._cursors = []
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self):
+        cursor = InstrumentedCursor(self._raw.cursor(), self._stats, self._module)
+        self._cursors.append(cursor)
+        return cursor
+
+    def execute(self, query, *params):
+        return self.cursor().execute(query, *params)
+
+    def commit(self):
+        self._record_cursors()
+        started = time.perf_counter()
+        try:
+            self._raw.commit()
+        except Exception:
+            self._stats.record(self._module, "COMMIT", time.perf_counter() - started, error=True)
+            raise
+        self._stats.record(self._module, "COMMIT", time.perf_counter() - started)
+
+    def _record_cursors(self):
+        for cursor in self._cursors:
+            cursor.flush()
+
+    def close(self):
+        self._record_cursors()
+        self._cursors.clear()
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_dialect = None
+_pool = None
+_pool_lock = threading.Lock()
+# (QueryStats, enabled module names or None for all) while instrumentation is on.
+_instrumentation = None
+
+
+def configure_backend(backend, sqlite_path=None, connection_string=None, **pool_options):
+    """
+    Select the database backend ("sqlserver" or "sqlite") and rebuild the shared pool for it.
+    Call once at startup before any module touches the database.
+    """
+    global _dialect
+    if backend not in DIALECTS:
+        raise ValueError(f"Unknown database backend: {backend}")
+    if backend == SqliteDialect.name:
+        dialect = SqliteDialect(sqlite_path or SQLITE_PATH)
+    else:
+        dialect = SqlServerDialect(connection_string or CONNECTION_STRING)
+    with _pool_lock:
+        _dialect = dialect
+    return configure_pool(factory=dialect.connect, **pool_options)
+
+
+def get_dialect():
+    """
+    Return the dialect of the configured backend.
+    """
+    global _dialect
+    if _dialect is None:
+        with _pool_lock:
+            if _dialect is None:
+                _dialect = SqliteDialect() if BACKEND == SqliteDialect.name else SqlServerDialect()
+    return _dialect
+
+
+def configure_pool(size=POOL_SIZE, timeout=CHECKOUT_TIMEOUT, health_check_interval=HEALTH_CHECK_INTERVAL, factory=None):
+    """
+    Replace the shared connection pool. Call once at startup before any module touches the database.
+    """
+    global _pool
+    factory = factory or get_dialect().connect
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(factory, size, timeout, health_check_interval)
+    return _pool
+
+
+def get_pool():
+    """
+    Return the shared connection pool, creating it with the default settings on first use.
+    """
+    global _pool
+    if _pool is None:
+        factory = get_dialect().connect
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(factory)
+    return _pool
+
+
+@contextmanager
+def connection(timeout=None):
+    """
+    Check a connection out of the shared pool for the duration of a `with` block.
+
+    Work that was not committed when the block exits is rolled back.
+    """
+    conn = get_pool().acquire(timeout)
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        module = _calling_module(instrumentation[1])
+        if module is not None:
+            conn = InstrumentedConnection(conn, instrumentation[0], module)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def enable_instrumentation(modules=None, slow_query_seconds=SLOW_QUERY_SECONDS, slow_log_path=SLOW_QUERY_LOG):
+    """
+    Record statement statistics for connections checked out through connection().
+
+    modules: names of the modules to instrument ("finance", "Pharmacy",
+    "modules.hospital", ...), or None for all. A connection is instrumented when
+    the module checking it out is one of them or belongs to one in
+    MODULE_GROUPS, so enabling "finance" also covers the Ledger statements
+    Finance runs. Statements are labelled with the module that ran them.
+    Returns the QueryStats the statements are recorded in; switching modules
+    keeps the counters gathered so far.
+    """
+    global _instrumentation
+    enabled = None
+    if modules is not None:
+        names = {_module_name(name) for name in modules}
+        enabled = frozenset(names.union(*(MODULE_GROUPS.get(name, ()) for name in names)))
+    with _pool_lock:
+        stats = _instrumentation[0] if _instrumentation is not None else QueryStats()
+        stats.slow_query_seconds = slow_query_seconds
+        stats.slow_log_path = slow_log_path
+        _instrumentation = (stats, enabled)
+    return stats
+
+
+def disable_instrumentation():
+    """
+    Stop instrumenting new connections. Returns the QueryStats gathered, or None.
+    """
+    global _instrumentation
+    with _pool_lock:
+        instrumentation, _instrumentation = _instrumentation, None
+    return instrumentation[0] if instrumentation is not None else None
+
+
+def query_stats():
+    """
+    Return the QueryStats of the current instrumentation, or None when it is off.
+    """
+    instrumentation = _instrumentation
+    return instrumentation[0] if instrumentation is not None else None
+
+
+def _module_name(name):
+    return name.lower().rsplit(".", 1)[-1]
+
+
+def _calling_module(enabled):
+    # The module that entered connection(), if it is enabled. Only the nearest
+    # frames are looked at: walking the whole stack would cost more than the
+    # statements being measured.
+    frame = sys._getframe(2)
+    while frame is not None:
+        name = frame.f_globals.get("__name__", "")
+        if name != __name__ and name != "contextlib":
+            module = name.rsplit(".", 1)[-1]
+            return module if enabled is None or module in enabled else None
+        frame = frame.f_back
+    return None
+
+
+def pool_stats():
+    """
+    Return usage counters for the shared connection pool.
+    """
+    return get_pool().stats()
+
+
+def print_pool_stats():
+    stats = pool_stats()
+    print("Connection Pool:")
+    print(f"  Live connections: {stats['live_connections']}/{stats['size']} ({stats['in_use']} in use)")
+    print(f"  Checkouts: {stats['checkouts']}, Timeouts: {stats['timeouts']}")
+    print(f"  Average wait: {stats['avg_wait_seconds'] * 1000:.2f} ms, Max wait: {stats['max_wait_seconds'] * 1000:.2f} ms")
+
+
+def print_query_stats(top=10):
+    stats = query_stats()
+    if stats is None:
+        print("Query instrumentation is off; set HMS_DB_INSTRUMENT or call enable_instrumentation().")
+        return
+    print(f"Top {top} statements by total time:")
+    for row in stats.snapshot()[:top]:
+        print(f"  {row['total_seconds'] * 1000:10.1f} ms {row['count']:8} x {row['avg_seconds'] * 1000:8.3f} ms "
+              f"{row['rows']:10} rows  [{row['module']}] {row['statement'][:100]}")
+    if stats.slow_queries:
+        print(f"Slow statements (over {stats.slow_query_seconds * 1000:.0f} ms): {len(stats.slow_queries)} logged")
+
+
+def executemany(cursor, query, rows, batch_size=BATCH_SIZE):
+    """
+    Run `query` once for every parameter tuple in `rows`, sent in batches of
+    `batch_size`. Uses pyodbc's fast_executemany where the backend supports it.
+    `rows` may be any iterable, including a generator.
+
+    Returns:
+        int: The number of parameter tuples executed.
+    """
+    if get_dialect().supports_fast_executemany:
+        cursor.fast_executemany = True
+    rows = iter(rows)
+    count = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return count
+        cursor.executemany(query, batch)
+        count += len(batch)
+
+
+def add_missing_columns(cursor, table, columns):
+    """
+    Add the (column, definition) pairs an existing table does not have yet,
+    for upgrading databases created before the columns were in the schema.
+
+    Returns:
+        list: The names of the columns added.
+    """
+    cursor.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+    present = {column[0].lower() for column in cursor.description}
+    added = []
+    for column, definition in columns:
+        if column.lower() not in present:
+            cursor.execute(get_dialect().add_column(table, column, definition))
+            added.append(column)
+    return added
+
+
+if INSTRUMENT:
+    enable_instrumentation(None if INSTRUMENT.strip().lower() == "all" else INSTRUMENT.split(","))
@@ -1,66 +1,101 @@
-import csv
-import os
-import pyodbc
+import datetime
+import modules.aggregates as aggregates
 import modules.database as database
+import modules.rollups as rollups
+from modules.importer import CHUNK_SIZE, TransactionImporter, print_progress
+from modules.ledger import Ledger
+
+# Rows fetched per round trip by Finance.load_transactions.
+FETCH_SIZE = 5000
 
 class Finance:
     def __init__(self):
-      
-        self.database = self.connect_to_db()
-        if self.database:
-            self.cursor = self.database.cursor()
-        else:
-            self.cursor = None
 
-    def connect_to_db(self):
-       
-        try:
-            conn = database
-            return conn
-        except Exception as e:
-            print(f"Error connecting to the database: {e}")
-            return None
+        self.ledger = Ledger()
 
-    def save_transaction(self, patient, transaction_type, amount):
-     
-        if self.database is None:
-            print("Database connection is not available.")
-            return
+    def save_transaction(self, patient, transaction_type, amount, item=None):
 
-        balance = self.get_balance(patient) + amount
-        
         try:
-            self.cursor.execute("""
-                INSERT INTO FinancialTransactions (Patient, TransactionType, Amount, Balance)
-                VALUES (?, ?, ?, ?)
-            """, (patient, transaction_type, amount, balance))
-            
-            self.database.commit()
-            print(f"Transaction saved: {transaction_type} of {amount} EGP for {patient}.")
+            self.ledger.post_transaction(patient, transaction_type, amount, item)
+            label = f"{transaction_type} ({item})" if item else transaction_type
+            print(f"Transaction saved: {label} of {amount} EGP for {patient}.")
         except Exception as e:
             print(f"Error saving transaction: {e}")
 
+    def post_transactions(self, transactions):
+        """
+        Save many (patient, transaction_type, amount[, item]) transactions at once.
+        """
+        try:
+            balances = self.ledger.post_transactions(transactions)
+            print(f"{len(balances)} transactions saved.")
+            return balances
+        except Exception as e:
+            print(f"Error saving transactions: {e}")
+            return []
+
+    def import_transactions(self, path='data/financial_data.csv', resume=True, chunk_size=CHUNK_SIZE, progress=print_progress):
+        """
+        Import a ledger CSV (Patient, Transaction Type, Amount, Balance) in bounded chunks.
+        Interrupted imports resume where they stopped; rows imported before are skipped.
+        """
+        try:
+            importer = TransactionImporter(chunk_size=chunk_size, progress=progress)
+            stats = importer.run(path, resume=resume)
+            if stats['resumed']:
+                print(f"Resumed the earlier import of {path}; totals include it.")
+            print(f"Imported {stats['imported']} transactions from {path} "
+                  f"({stats['duplicates']} duplicates, {stats['invalid']} invalid, {stats['headers']} header lines skipped).")
+            for line_number, reason in stats['rejects']:
+                print(f"  line {line_number}: {reason}")
+            return stats
+        except Exception as e:
+            print(f"Error importing transactions: {e}")
+            return None
+
+    def load_transactions(self, patient=None):
+        """
+        Stream transactions as dicts keyed like the CSV columns, oldest first,
+        fetching FETCH_SIZE rows at a time.
+        """
+        query = """
+            SELECT TransactionID, Patient, TransactionType, Item, Amount, Balance, TransactionDate
+            FROM FinancialTransactions
+        """
+        params = ()
+        if patient is not None:
+            query += " WHERE Patient = ?"
+            params = (patient,)
+        query += " ORDER BY TransactionID"
+
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    yield {
+                        'Transaction ID': row.TransactionID,
+                        'Patient': row.Patient,
+                        'Transaction Type': row.TransactionType,
+                        'Item': row.Item,
+                        'Amount': row.Amount,
+                        'Balance': row.Balance,
+                        'Date': row.TransactionDate,
+                    }
+
     def get_balance(self, patient):
-      
-        if self.database is None:
-            print("Database connection is not available.")
-            return 0
 
         try:
-            self.cursor.execute("""
-                SELECT TOP 1 Balance FROM FinancialTransactions
-                WHERE Patient = ?
-                ORDER BY TransactionDate DESC
-            """, (patient,))
-            row = self.cursor.fetchone()
-            
-            return row.Balance if row else 0
+            return self.ledger.get_balance(patient)
         except Exception as e:
             print(f"Error retrieving balance: {e}")
             return 0
 
     def deposit(self, patient, amount):
-      
+
         if amount <= 0:
             print("Deposit amount must be greater than 0.")
             return
@@ -69,96 +104,114 @@ class Finance:
         print(f"Deposited {amount} EGP to {patient}'s account.")
 
     def pay_for_appointment(self, patient):
-    
+
         appointment_cost = -200
         self.save_transaction(patient, 'Appointment Payment', appointment_cost)
         print(f"Paid {abs(appointment_cost)} EGP for appointment from {patient}'s account.")
 
     def pay_for_medication(self, patient, medication, quantity, price):
-      
+
         if quantity <= 0 or price <= 0:
             print("Quantity and price must be greater than 0.")
             return
 
         total_cost = -quantity * price
-        self.save_transaction(patient, f'Medication Payment ({medication})', total_cost)
+        self.save_transaction(patient, 'Medication Payment', total_cost, item=medication)
         print(f"Paid {abs(total_cost)} EGP for {quantity} units of {medication} from {patient}'s account.")
 
     def track_revenue(self, source, amount):
-       
-        if self.database is None:
-            print("Database connection is not available.")
-            return
 
         try:
-            self.cursor.execute("""
-                INSERT INTO Revenue (Source, Amount, Date)
-                VALUES (?, ?, GETDATE())
-            """, (source, amount))
-            
-            self.database.commit()
-            print(f"Revenue tracked: {amount} EGP from {source}.")
+            today = datetime.date.today()
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO Revenue (Source, Amount, Date)
+                    VALUES (?, ?, ?)
+                """, (source, amount, today.isoformat()))
+                aggregates.record(cursor, 'revenue_by_source', source, amount=amount)
+                rollups.record(cursor, 'source', source, today, revenue=amount)
+
+                conn.commit()
+                print(f"Revenue tracked: {amount} EGP from {source}.")
         except Exception as e:
             print(f"Error tracking revenue: {e}")
 
     def track_costs(self, category, amount):
-       
-        if self.database is None:
-            print("Database connection is not available.")
-            return
 
         try:
-            self.cursor.execute("""
-                INSERT INTO Costs (Category, Amount, Date)
-                VALUES (?, ?, GETDATE())
-            """, (category, amount))
-            
-            self.database.commit()
-            print(f"Cost tracked: {amount} EGP for {category}.")
+            today = datetime.date.today()
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO Costs (Category, Amount, Date)
+                    VALUES (?, ?, ?)
+                """, (category, amount, today.isoformat()))
+                aggregates.record(cursor, 'costs_by_category', category, amount=amount)
+                rollups.record(cursor, 'category', category, today, cost=amount)
+
+                conn.commit()
+                print(f"Cost tracked: {amount} EGP for {category}.")
         except Exception as e:
             print(f"Error tracking costs: {e}")
 
-    def track_pending_payments(self):
-     
-        if self.database is None:
-            print("Database connection is not available.")
-            return
+    def track_profitability(self, department, revenue, cost):
+        """
+        Record a department's revenue and cost in Profitability, dated today.
+        """
+        try:
+            today = datetime.date.today()
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO Profitability (Department, Revenue, Cost, Profit, Date)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (department, revenue, cost, revenue - cost, today.isoformat()))
+                rollups.record(cursor, 'department', department, today, revenue=revenue, cost=cost)
+
+                conn.commit()
+                print(f"Profitability tracked for {department}: {revenue} EGP revenue, {cost} EGP cost.")
+        except Exception as e:
+            print(f"Error tracking profitability: {e}")
 
+    def track_pending_payments(self):
+        """
+        Print the patients with appointment or medication payments outstanding, from Receivables.
+        """
         try:
-            self.cursor.execute("""
-                SELECT Patient, SUM(Amount) AS PendingAmount
-                FROM FinancialTransactions
-                WHERE TransactionType = 'Appointment Payment' OR TransactionType LIKE 'Medication Payment%'
-                GROUP BY Patient
-                HAVING SUM(Amount) < 0
-            """)
-            pending_payments = self.cursor.fetchall()
-            
+            pending_payments = self.ledger.get_receivables()
+
             if pending_payments:
                 print("Pending Payments:")
-                for row in pending_payments:
-                    print(f"Patient: {row.Patient}, Pending Amount: {abs(row.PendingAmount)} EGP")
+                for patient, outstanding in pending_payments:
+                    print(f"Patient: {patient}, Pending Amount: {outstanding:.2f} EGP")
             else:
                 print("No pending payments found.")
         except Exception as e:
             print(f"Error tracking pending payments: {e}")
 
-    def analyze_profitability(self):
-    
-        if self.database is None:
-            print("Database connection is not available.")
-            return
-
+    def analyze_profitability(self, period=None, start=None, end=None):
+        """
+        Print revenue, costs and profit from the per-source and per-category totals.
+        With period ('day', 'week', 'month' or 'year'), print them per period
+        from start to end instead, and return the DataFrame.
+        """
+        if period is not None:
+            return self._print_periods("Profitability", period, lambda: rollups.FinancialRollups().profit(period, start, end))
         try:
-            self.cursor.execute("""
-                SELECT SUM(Amount) AS TotalRevenue FROM Revenue
-            """)
-            total_revenue = self.cursor.fetchone().TotalRevenue or 0
-
-            self.cursor.execute("""
-                SELECT SUM(Amount) AS TotalCost FROM Costs
-            """)
-            total_cost = self.cursor.fetchone().TotalCost or 0
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT SUM(Amount) AS TotalRevenue FROM AnalyticsTotals
+                    WHERE Metric = 'revenue_by_source'
+                """)
+                total_revenue = cursor.fetchone().TotalRevenue or 0
+
+                cursor.execute("""
+                    SELECT SUM(Amount) AS TotalCost FROM AnalyticsTotals
+                    WHERE Metric = 'costs_by_category'
+                """)
+                total_cost = cursor.fetchone().TotalCost or 0
 
             profit = total_revenue - total_cost
             print(f"Profitability Analysis:")
@@ -168,8 +221,32 @@ class Finance:
         except Exception as e:
             print(f"Error analyzing profitability: {e}")
 
-    def close_connection(self):
-     
-        if self.database:
-            self.database.close()
-            print("Database connection closed.")
\ No newline at end of file
+    def analyze_department_profitability(self, period='month', start=None, end=None):
+        """
+        Print revenue, cost and profit per department and period from the
+        Profitability rollups, and return the DataFrame.
+        """
+        return self._print_periods("Department profitability", period,
+                                   lambda: rollups.FinancialRollups().report('department', period, start, end))
+
+    def analyze_period_totals(self, dimension, period='month', start=None, end=None):
+        """
+        Print revenue or cost per revenue source ('source') or cost category
+        ('category') and period, and return the DataFrame.
+        """
+        return self._print_periods(f"Totals by {dimension}", period,
+                                   lambda: rollups.FinancialRollups().report(dimension, period, start, end))
+
+    @staticmethod
+    def _print_periods(title, period, compute):
+        try:
+            frame = compute()
+        except Exception as e:
+            print(f"Error analyzing {title.lower()}: {e}")
+            return None
+        if frame.empty:
+            print(f"{title}: no data.")
+        else:
+            print(f"{title} per {period}:")
+            print(frame.to_string())
+        return frame
@@ -0,0 +1,216 @@
+import datetime
+import math
+import statistics
+import modules.database as database
+from modules.ledger import CATEGORIES
+from modules.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Days of MedicationDemand history a forecast reads.
+HISTORY_DAYS = 3 * 365
+# Age in days at which a day's demand counts half as much as today's.
+HALF_LIFE_DAYS = 28
+# Days between placing an order and receiving it.
+LEAD_TIME_DAYS = 7
+# Days between purchase runs; an order covers demand until the next one arrives.
+REVIEW_DAYS = 7
+# Probability of not running out before an order arrives.
+SERVICE_LEVEL = 0.95
+# Rows fetched per round trip while reading the history.
+FETCH_SIZE = 50_000
+
+# Medications with their stock and the units in lots expiring before a date.
+STOCK_QUERY = """
+    SELECT PharmacyInventory.MedicationID, PharmacyInventory.MedicationName, PharmacyInventory.Stock,
+           COALESCE(Expiring.Quantity, 0) AS Expiring
+    FROM PharmacyInventory
+    LEFT JOIN (
+        SELECT MedicationID, SUM(Quantity) AS Quantity
+        FROM MedicationLots
+        WHERE ExpiryDate < ?
+        GROUP BY MedicationID
+    ) AS Expiring ON Expiring.MedicationID = PharmacyInventory.MedicationID
+    ORDER BY PharmacyInventory.MedicationID
+"""
+
+HISTORY_QUERY = "SELECT MedicationID, Day, Units FROM MedicationDemand WHERE Day > ? AND Day <= ?"
+
+SUPPLIER_QUERY = """
+    SELECT MedicationID, SupplierName, AVG(CAST(PerformanceRating AS FLOAT)) AS AvgRating
+    FROM Supplier
+    WHERE MedicationID IS NOT NULL
+    GROUP BY MedicationID, SupplierName
+"""
+
+
+def record_dispense(cursor, medication_id, units, day=None):
+    """
+    Add units dispensed to one medication's daily demand, inside the caller's transaction.
+    """
+    cursor.execute(_upsert(), (medication_id, (day or datetime.date.today()).isoformat(), units))
+
+
+def rebuild_history():
+    """
+    Recompute MedicationDemand from the medication payments in
+    FinancialTransactions, counting -Amount / Price units per payment at the
+    medication's current price. Run it once after upgrading a database, after
+    Ledger.migrate_categories.
+
+    Returns:
+        int: Number of (medication, day) rows written.
+    """
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(MedicationID) AS MedicationID, MedicationName, MAX(Price) AS Price "
+                       "FROM PharmacyInventory GROUP BY MedicationName")
+        medications = {row.MedicationName: (row.MedicationID, row.Price) for row in cursor.fetchall()}
+        cursor.execute("""
+            SELECT Item, TransactionDate, Amount
+            FROM FinancialTransactions
+            WHERE Category = ?
+        """, (CATEGORIES['Medication Payment'],))
+        demand = {}
+        for item, date, amount in cursor:
+            medication_id, price = medications.get(item, (None, 0))
+            if medication_id is None or not price:
+                continue
+            key = (medication_id, str(date)[:10])
+            demand[key] = demand.get(key, 0) + round(-float(amount) / float(price))
+        cursor.execute("DELETE FROM MedicationDemand")
+        written = database.executemany(cursor, "INSERT INTO MedicationDemand (MedicationID, Day, Units) VALUES (?, ?, ?)",
+                                       ((medication_id, day, units) for (medication_id, day), units in demand.items() if units > 0))
+        conn.commit()
+    return written
+
+
+def demand_statistics(medication_index, age_days, units, medications, history_days=HISTORY_DAYS,
+                      half_life_days=HALF_LIFE_DAYS):
+    """
+    Exponentially weighted mean and standard deviation of daily demand per
+    medication, from (medication index, age in days, units) arrays with one
+    entry per day with demand. Days without an entry count as zero demand, so
+    the cost is proportional to the entries, not to medications x days.
+
+    Returns:
+        tuple: (mean, std) arrays of length `medications`.
+    """
+    weights = 0.5 ** (np.arange(history_days) / half_life_days)
+    weighted = weights[age_days] * units
+    total = weights.sum()
+    mean = np.bincount(medication_index, weights=weighted, minlength=medications) / total
+    second_moment = np.bincount(medication_index, weights=weighted * units, minlength=medications) / total
+    return mean, np.sqrt(np.maximum(second_moment - mean * mean, 0))
+
+
+def reorder_points(mean, std, stock, lead_time_days=LEAD_TIME_DAYS, review_days=REVIEW_DAYS,
+                   service_level=SERVICE_LEVEL):
+    """
+    Safety stock, reorder point, order-up-to level and order quantity per
+    medication, for daily demand with the given mean and std and the usable
+    stock on hand (periodic review, normally distributed demand).
+
+    Returns:
+        tuple: (safety_stock, reorder_point, order_up_to, order_quantity) arrays.
+    """
+    z = statistics.NormalDist().inv_cdf(service_level)
+    safety_stock = z * std * math.sqrt(lead_time_days + review_days)
+    reorder_point = mean * lead_time_days + safety_stock
+    order_up_to = mean * (lead_time_days + review_days) + safety_stock
+    order_quantity = np.where(stock <= reorder_point, np.ceil(np.maximum(order_up_to - stock, 0)), 0)
+    return safety_stock, reorder_point, order_up_to, order_quantity.astype(np.int64)
+
+
+class DemandForecast:
+    """
+    Reorder planning for every medication from its daily demand.
+
+    Dispensing adds to MedicationDemand, one row per medication and day.
+    compute() reads the last history_days of it once, and works out the
+    demand rate, safety stock and reorder point of all medications together
+    with NumPy. Units in lots that expire before an order could arrive are
+    not counted as stock.
+    """
+
+    def __init__(self, history_days=HISTORY_DAYS, half_life_days=HALF_LIFE_DAYS, lead_time_days=LEAD_TIME_DAYS,
+                 review_days=REVIEW_DAYS, service_level=SERVICE_LEVEL):
+        self.history_days = history_days
+        self.half_life_days = half_life_days
+        self.lead_time_days = lead_time_days
+        self.review_days = review_days
+        self.service_level = service_level
+
+    def compute(self, as_of=None):
+        """
+        Return a DataFrame indexed by MedicationID with MedicationName, Stock,
+        Expiring, DailyDemand, DemandStd, SafetyStock, ReorderPoint, OrderUpTo,
+        OrderQuantity, Supplier and SupplierRating, demand counted up to as_of
+        (default today).
+        """
+        as_of = as_of or datetime.date.today()
+        start = as_of - datetime.timedelta(days=self.history_days)
+        arrives = as_of + datetime.timedelta(days=self.lead_time_days)
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(STOCK_QUERY, (arrives.isoformat(),))
+            inventory = cursor.fetchall()
+            ids = np.fromiter((row.MedicationID for row in inventory), dtype=np.int64, count=len(inventory))
+            cursor.execute(HISTORY_QUERY, (start.isoformat(), as_of.isoformat()))
+            history_ids, days, units = [], [], []
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                history_ids.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+                days.append(np.array([str(row[1])[:10] for row in rows], dtype='datetime64[D]'))
+                units.append(np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows)))
+            cursor.execute(SUPPLIER_QUERY)
+            suppliers = cursor.fetchall()
+
+        history_ids = np.concatenate(history_ids) if history_ids else np.empty(0, dtype=np.int64)
+        days = np.concatenate(days) if days else np.empty(0, dtype='datetime64[D]')
+        units = np.concatenate(units) if units else np.empty(0)
+        # Demand of medications deleted since is dropped.
+        index = np.minimum(np.searchsorted(ids, history_ids), max(len(ids) - 1, 0))
+        known = ids[index] == history_ids if len(ids) else np.zeros(len(history_ids), dtype=bool)
+        ages = (np.datetime64(as_of, 'D') - days).astype(np.int64)
+        mean, std = demand_statistics(index[known], ages[known], units[known], len(ids),
+                                      self.history_days, self.half_life_days)
+
+        stock = np.fromiter((row.Stock for row in inventory), dtype=np.float64, count=len(inventory))
+        expiring = np.fromiter((row.Expiring for row in inventory), dtype=np.float64, count=len(inventory))
+        usable = np.maximum(stock - expiring, 0)
+        safety_stock, reorder_point, order_up_to, order_quantity = reorder_points(
+            mean, std, usable, self.lead_time_days, self.review_days, self.service_level)
+
+        best = {}
+        for row in suppliers:
+            if row.MedicationID not in best or row.AvgRating > best[row.MedicationID][1]:
+                best[row.MedicationID] = (row.SupplierName, row.AvgRating)
+        return pd.DataFrame({
+            'MedicationName': [row.MedicationName for row in inventory],
+            'Stock': stock.astype(np.int64),
+            'Expiring': expiring.astype(np.int64),
+            'DailyDemand': mean,
+            'DemandStd': std,
+            'SafetyStock': safety_stock,
+            'ReorderPoint': reorder_point,
+            'OrderUpTo': order_up_to,
+            'OrderQuantity': order_quantity,
+            'Supplier': [best.get(medication_id, (None, None))[0] for medication_id in ids.tolist()],
+            'SupplierRating': [best.get(medication_id, (None, None))[1] for medication_id in ids.tolist()],
+        }, index=pd.Index(ids, name='MedicationID'))
+
+    def purchase_list(self, as_of=None):
+        """
+        Return the rows of compute() with something to order, largest orders first.
+        """
+        forecast = self.compute(as_of)
+        return forecast[forecast['OrderQuantity'] > 0].sort_values('OrderQuantity', ascending=False)
+
+
+def _upsert():
+    return database.get_dialect().upsert('MedicationDemand', ['MedicationID', 'Day'],
+                                         ['MedicationID', 'Day', 'Units'], increment=['Units'])
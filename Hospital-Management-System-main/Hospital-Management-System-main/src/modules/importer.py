@@ -0,0 +1,240 @@
+import csv
+import hashlib
+import os
+import time
+from decimal import Decimal, InvalidOperation
+import modules.database as database
+from modules.ledger import RECEIVABLE_CATEGORIES, classify, fetch_balances, update_receivables
+
+# Rows validated, deduplicated and committed together. An interrupted import
+# resumes after the last committed chunk.
+CHUNK_SIZE = 10_000
+# Keys per IN (...) list when looking up rows imported before.
+KEY_LOOKUP_CHUNK = 500
+# Invalid lines kept in the stats as examples.
+MAX_REJECT_SAMPLES = 20
+
+HEADER = ['Patient', 'Transaction Type', 'Amount', 'Balance']
+HEADER_LOWER = [column.lower() for column in HEADER]
+CENT = Decimal('0.01')
+MAX_AMOUNT = Decimal('1e16')
+
+class TransactionImporter:
+    """
+    Streams a ledger CSV (Patient, Transaction Type, Amount, Balance) into
+    FinancialTransactions.
+
+    The file is read line by line and handled in chunks of `chunk_size` rows, so
+    memory stays bounded however large the dump is. Each row is validated;
+    header lines, including repeated ones, are skipped. Each valid row is
+    keyed by a hash of the file's fingerprint (its first 64 KB), its line
+    number and its normalized values. Rows whose key is already in
+    ImportedTransactionKeys are dropped as duplicates: only the same row of
+    the same file delivered again, under any path, matches. Identical rows on
+    different lines are separate transactions and are all imported.
+
+    Types are split into category and item like Ledger does, and each row's
+    Balance is the patient's running balance from PatientBalances, as Ledger
+    writes it; the file's Balance column is validated but not stored. A
+    chunk's transactions, keys, PatientBalances and Receivables increments and
+    checkpoint (byte offset and counters in TransactionImports) are committed
+    in one database transaction. After an interruption, run() continues from
+    the checkpoint if the file is the one it was taken from, judged by its
+    size and its first and last 64 KB; otherwise it starts over. The duplicate
+    check keeps a restart from importing anything twice.
+
+    Fields may not contain line breaks. Errors are raised to the caller.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, progress=None):
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+    def run(self, path, resume=True):
+        """
+        Import the file and return the import's counters.
+        """
+        source = os.path.abspath(path)
+        fingerprint = _fingerprint(path)
+        total_bytes = os.path.getsize(path)
+        identity = _identity(path, fingerprint, total_bytes)
+        checkpoint = self._checkpoint(source) if resume else None
+        if checkpoint is not None and checkpoint.Fingerprint != identity:
+            checkpoint = None
+
+        stats = {
+            'source': source,
+            'total_bytes': total_bytes,
+            'bytes_read': checkpoint.BytesRead if checkpoint else 0,
+            'lines_read': checkpoint.LinesRead if checkpoint else 0,
+            'imported': checkpoint.RowsImported if checkpoint else 0,
+            'duplicates': checkpoint.RowsDuplicate if checkpoint else 0,
+            'invalid': checkpoint.RowsInvalid if checkpoint else 0,
+            'headers': checkpoint.RowsHeader if checkpoint else 0,
+            'resumed': checkpoint is not None,
+            'rejects': [],
+            'seconds': 0.0,
+        }
+        started = time.perf_counter()
+
+        with open(path, 'rb') as file:
+            file.seek(stats['bytes_read'])
+            chunk = []
+            for line in file:
+                stats['lines_read'] += 1
+                stats['bytes_read'] += len(line)
+                row, reason = self._parse(line, fingerprint, stats['lines_read'])
+                if reason == 'header':
+                    stats['headers'] += 1
+                elif reason is not None:
+                    stats['invalid'] += 1
+                    if len(stats['rejects']) < MAX_REJECT_SAMPLES:
+                        stats['rejects'].append((stats['lines_read'], reason))
+                elif row is not None:
+                    chunk.append(row)
+
+                if len(chunk) >= self.chunk_size:
+                    self._commit(source, identity, chunk, stats, started)
+                    chunk = []
+            self._commit(source, identity, chunk, stats, started)
+        return stats
+
+    def _parse(self, line, fingerprint, line_number):
+        """
+        Return (row, None) for a valid line, (None, reason) otherwise. Blank lines give (None, None).
+        """
+        text = line.decode('utf-8', errors='replace').lstrip('\ufeff').rstrip('\r\n')
+        if not text.strip():
+            return None, None
+        if '"' in text:
+            try:
+                fields = next(csv.reader([text]))
+            except csv.Error as e:
+                return None, f"unparseable: {e}"
+        else:
+            # Unquoted lines, nearly all of them, do not need the csv module.
+            fields = text.split(',')
+        fields = [field.strip() for field in fields]
+        if fields[0].lower() == 'patient' and [field.lower() for field in fields] == HEADER_LOWER:
+            return None, 'header'
+        if len(fields) != len(HEADER):
+            return None, f"expected {len(HEADER)} fields, got {len(fields)}"
+
+        patient, transaction_type, amount, balance = fields
+        if not patient or len(patient) > 50:
+            return None, "patient must be 1-50 characters"
+        if not transaction_type or len(transaction_type) > 50:
+            return None, "transaction type must be 1-50 characters"
+        try:
+            amount = Decimal(amount).quantize(CENT)
+            balance = Decimal(balance).quantize(CENT)
+        except (InvalidOperation, ValueError):
+            return None, "amount and balance must be numbers"
+        if not (amount.is_finite() and balance.is_finite()) or abs(amount) >= MAX_AMOUNT or abs(balance) >= MAX_AMOUNT:
+            return None, "amount or balance out of range"
+
+        key = hashlib.blake2b(
+            f"{fingerprint}\x1f{line_number}\x1f{patient}\x1f{transaction_type}\x1f{amount}\x1f{balance}".encode('utf-8'),
+            digest_size=16).hexdigest()
+        return (key, patient, transaction_type, amount), None
+
+    def _commit(self, source, identity, rows, stats, started):
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            existing = set()
+            keys = [row[0] for row in rows]
+            for start in range(0, len(keys), KEY_LOOKUP_CHUNK):
+                batch = keys[start:start + KEY_LOOKUP_CHUNK]
+                cursor.execute(f"SELECT RowKey FROM ImportedTransactionKeys WHERE RowKey IN ({', '.join('?' for _ in batch)})",
+                               batch)
+                existing.update(row.RowKey for row in cursor.fetchall())
+            rows = [row for row in rows if row[0] not in existing]
+            stats['duplicates'] += len(existing)
+
+            deltas, owed = {}, {}
+            for _, patient, _, amount in rows:
+                deltas[patient] = deltas.get(patient, 0) + amount
+            database.executemany(
+                cursor,
+                database.get_dialect().upsert('PatientBalances', ['Patient'], ['Patient', 'Balance'], increment=['Balance']),
+                deltas.items())
+            closing = fetch_balances(cursor, list(deltas))
+
+            # Walk forward from the balance each patient had before this chunk. SQLite returns floats.
+            running = {patient: Decimal(str(closing.get(patient, 0))).quantize(CENT) - delta
+                       for patient, delta in deltas.items()}
+            transactions = []
+            for _, patient, transaction_type, amount in rows:
+                category, transaction_type, item = classify(transaction_type)
+                if category in RECEIVABLE_CATEGORIES:
+                    owed[patient] = owed.get(patient, 0) - amount
+                running[patient] += amount
+                transactions.append((patient, category, transaction_type, item, amount, running[patient]))
+
+            database.executemany(cursor, "INSERT INTO ImportedTransactionKeys (RowKey) VALUES (?)",
+                                 ((row[0],) for row in rows))
+            database.executemany(cursor, """
+                INSERT INTO FinancialTransactions (Patient, Category, TransactionType, Item, Amount, Balance)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, transactions)
+            update_receivables(cursor, owed)
+            stats['imported'] += len(rows)
+
+            cursor.execute(database.get_dialect().upsert(
+                'TransactionImports', ['Source'],
+                ['Source', 'Fingerprint', 'BytesRead', 'LinesRead', 'RowsImported', 'RowsDuplicate', 'RowsInvalid',
+                 'RowsHeader']),
+                (source, identity, stats['bytes_read'], stats['lines_read'], stats['imported'],
+                 stats['duplicates'], stats['invalid'], stats['headers']))
+            conn.commit()
+
+        stats['seconds'] = time.perf_counter() - started
+        if self.progress is not None:
+            self.progress(stats)
+
+    @staticmethod
+    def _checkpoint(source):
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT Fingerprint, BytesRead, LinesRead, RowsImported, RowsDuplicate, RowsInvalid, RowsHeader
+                FROM TransactionImports WHERE Source = ?
+            """, (source,))
+            return cursor.fetchone()
+
+
+def migrate():
+    """
+    Add TransactionImports.RowsHeader to a database created before it.
+    Checkpoints taken before count no header lines.
+    """
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.add_missing_columns(cursor, 'TransactionImports', [('RowsHeader', 'BIGINT NOT NULL DEFAULT 0')])
+        conn.commit()
+
+
+def _fingerprint(path):
+    with open(path, 'rb') as file:
+        return hashlib.blake2b(file.read(64 * 1024), digest_size=16).hexdigest()
+
+
+def _identity(path, fingerprint, size):
+    """
+    Tell a checkpoint's file from another one that starts the same way: the
+    first 64 KB (the fingerprint rows are keyed by), the size and the last 64 KB.
+    """
+    with open(path, 'rb') as file:
+        file.seek(max(size - 64 * 1024, 0))
+        tail = file.read()
+    return hashlib.blake2b(f"{fingerprint}\x1f{size}\x1f".encode('utf-8') + tail, digest_size=16).hexdigest()
+
+
+def print_progress(stats):
+    """
+    Progress callback for TransactionImporter that prints one line per chunk.
+    """
+    percent = 100 * stats['bytes_read'] / stats['total_bytes'] if stats['total_bytes'] else 100
+    rate = stats['imported'] / stats['seconds'] if stats['seconds'] else 0
+    print(f"{percent:5.1f}%  {stats['lines_read']} lines, {stats['imported']} imported, "
+          f"{stats['duplicates']} duplicates, {stats['invalid']} invalid ({rate:.0f} rows/s)")
@@ -0,0 +1,35 @@
+import importlib
+import sys
+import threading
+
+class LazyModule:
+    """
+    Stands in for a module that is imported on first attribute access, so
+    `pd = lazy_import('pandas')` costs nothing until pd.read_sql() is called.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attribute):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+            module = self._module
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    """
+    Return a LazyModule for `name`, or the module itself if it is already imported.
+    """
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
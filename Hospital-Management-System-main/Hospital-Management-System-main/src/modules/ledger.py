@@ -0,0 +1,239 @@
+import functools
+import re
+import modules.database as database
+
+# Patients per IN (...) list when reading balances back in bulk.
+BALANCE_LOOKUP_CHUNK = 500
+
+# FinancialTransactions.Category codes by transaction type; any other type is OTHER_CATEGORY.
+CATEGORIES = {
+    'Deposit': 1,
+    'Appointment Payment': 2,
+    'Medication Payment': 3,
+}
+OTHER_CATEGORY = 0
+# Categories the patient owes until paid off; their totals are kept per patient in Receivables.
+RECEIVABLE_CATEGORIES = frozenset({CATEGORIES['Appointment Payment'], CATEGORIES['Medication Payment']})
+# Types written before the Item column, with the item in brackets: 'Medication Payment (Aspirin)'.
+ITEM_TYPE = re.compile(r"(.+?) \((.+)\)")
+# Smallest outstanding amount kept in Receivables; anything closer to zero is paid off.
+SETTLED = 0.005
+
+
+@functools.lru_cache(maxsize=4096)
+def classify(transaction_type, item=None):
+    """
+    Return (category, transaction_type, item) for a transaction, splitting the
+    item off types written the old way, such as 'Medication Payment (Aspirin)'.
+    """
+    category = CATEGORIES.get(transaction_type)
+    if category is None and item is None:
+        match = ITEM_TYPE.fullmatch(transaction_type)
+        if match and match.group(1) in CATEGORIES:
+            transaction_type, item = match.groups()
+            category = CATEGORIES[transaction_type]
+    return (OTHER_CATEGORY if category is None else category), transaction_type, item
+
+
+def update_receivables(cursor, owed):
+    """
+    Add {patient: amount owed} to Receivables inside the caller's transaction,
+    dropping the patients whose outstanding amount reaches zero.
+    """
+    owed = [(patient, amount) for patient, amount in owed.items() if amount]
+    if not owed:
+        return
+    database.executemany(
+        cursor,
+        database.get_dialect().upsert('Receivables', ['Patient'], ['Patient', 'Outstanding'], increment=['Outstanding']),
+        owed)
+    database.executemany(cursor, "DELETE FROM Receivables WHERE Patient = ? AND ABS(Outstanding) < ?",
+                         ((patient, SETTLED) for patient, _ in owed))
+
+
+def fetch_balances(cursor, patients):
+    """
+    Return {patient: balance} from PatientBalances for the given patients.
+    """
+    balances = {}
+    for start in range(0, len(patients), BALANCE_LOOKUP_CHUNK):
+        chunk = patients[start:start + BALANCE_LOOKUP_CHUNK]
+        cursor.execute(f"""
+            SELECT Patient, Balance FROM PatientBalances
+            WHERE Patient IN ({', '.join('?' for _ in chunk)})
+        """, chunk)
+        for row in cursor.fetchall():
+            balances[row.Patient] = row.Balance
+    return balances
+
+
+class Ledger:
+    """
+    Posts patient transactions to FinancialTransactions and keeps each patient's
+    running balance in PatientBalances.
+
+    The balance row is incremented in the same transaction as the insert, so
+    posting never has to search the transaction history for the previous
+    balance, and concurrent postings for one patient are serialized on that
+    row instead of both reading the same old balance. Appointment and
+    medication payments also add to the patient's row in Receivables, which
+    holds only the patients with something outstanding.
+
+    Errors are raised to the caller.
+    """
+
+    def post_transaction(self, patient, transaction_type, amount, item=None):
+        """
+        Record one transaction and return the patient's new balance.
+        """
+        return self.post_transactions([(patient, transaction_type, amount, item)])[0]
+
+    def post_transactions(self, transactions):
+        """
+        Record many (patient, transaction_type, amount[, item]) transactions in one
+        database transaction. Each row's Balance is the running balance after it, in
+        list order. The type is stored with its category code (see classify).
+
+        Returns:
+            list: The balance after each transaction.
+        """
+        transactions = list(transactions)
+        if not transactions:
+            return []
+
+        deltas, owed = {}, {}
+        for patient, _, amount, *_ in transactions:
+            deltas[patient] = deltas.get(patient, 0) + amount
+
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            database.executemany(
+                cursor,
+                database.get_dialect().upsert('PatientBalances', ['Patient'], ['Patient', 'Balance'], increment=['Balance']),
+                deltas.items())
+            closing = fetch_balances(cursor, list(deltas))
+
+            # Walk forward from the balance each patient had before this batch.
+            running = {patient: closing.get(patient, 0) - delta for patient, delta in deltas.items()}
+            rows, balances = [], []
+            for patient, transaction_type, amount, *item in transactions:
+                category, transaction_type, item = classify(transaction_type, item[0] if item else None)
+                if category in RECEIVABLE_CATEGORIES:
+                    owed[patient] = owed.get(patient, 0) - amount
+                running[patient] += amount
+                balances.append(running[patient])
+                rows.append((patient, category, transaction_type, item, amount, running[patient]))
+
+            database.executemany(cursor, """
+                INSERT INTO FinancialTransactions (Patient, Category, TransactionType, Item, Amount, Balance)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            update_receivables(cursor, owed)
+            conn.commit()
+        return balances
+
+    def get_balance(self, patient):
+        """
+        Return the patient's current balance, 0 if they have no transactions.
+        """
+        with database.connection() as conn:
+            return fetch_balances(conn.cursor(), [patient]).get(patient, 0)
+
+    def get_history(self, patient, limit=50):
+        """
+        Return the patient's most recent transactions, newest first.
+        """
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(database.get_dialect().limit("""
+                SELECT TransactionID, TransactionType, Item, Amount, Balance, TransactionDate
+                FROM FinancialTransactions
+                WHERE Patient = ?
+                ORDER BY TransactionDate DESC, TransactionID DESC
+            """, limit), (patient,))
+            return cursor.fetchall()
+
+    def rebuild_balances(self):
+        """
+        Recompute PatientBalances from the latest transaction of every patient.
+        Run once after upgrading a database that already has transactions.
+        """
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM PatientBalances")
+            cursor.execute("""
+                INSERT INTO PatientBalances (Patient, Balance)
+                SELECT t.Patient, t.Balance
+                FROM FinancialTransactions t
+                WHERE t.TransactionID = (
+                    SELECT MAX(TransactionID) FROM FinancialTransactions WHERE Patient = t.Patient
+                )
+            """)
+            conn.commit()
+
+    def get_receivables(self):
+        """
+        Return (Patient, Outstanding) rows of the patients who owe money, largest amounts first.
+        """
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT Patient, Outstanding FROM Receivables
+                WHERE Outstanding > 0
+                ORDER BY Outstanding DESC, Patient
+            """)
+            return cursor.fetchall()
+
+    def migrate_categories(self):
+        """
+        Bring a database from before the Category and Item columns up to date:
+        add the columns to FinancialTransactions if they are missing, split the
+        item off old types such as 'Medication Payment (Aspirin)', set each
+        row's category, and rebuild Receivables. Safe to run more than once.
+
+        Returns:
+            int: Number of transactions updated.
+        """
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            database.add_missing_columns(cursor, 'FinancialTransactions', [
+                ('Category', 'TINYINT NOT NULL DEFAULT 0'),
+                ('Item', 'NVARCHAR(100) NULL'),
+            ])
+            conn.commit()
+
+            # Rows are updated per distinct type, so the work follows the number of types, not of rows.
+            cursor.execute(f"SELECT DISTINCT TransactionType FROM FinancialTransactions WHERE Category = {OTHER_CATEGORY}")
+            updates = []
+            for (transaction_type,) in cursor.fetchall():
+                category, new_type, item = classify(transaction_type)
+                if category != OTHER_CATEGORY:
+                    updates.append((category, new_type, item, transaction_type))
+            updated = 0
+            for update in updates:
+                cursor.execute(f"""
+                    UPDATE FinancialTransactions SET Category = ?, TransactionType = ?, Item = ?
+                    WHERE TransactionType = ? AND Category = {OTHER_CATEGORY}
+                """, update)
+                updated += cursor.rowcount
+            conn.commit()
+        self.rebuild_receivables()
+        return updated
+
+    def rebuild_receivables(self):
+        """
+        Recompute Receivables from the appointment and medication payments in FinancialTransactions.
+        """
+        categories = ', '.join(str(category) for category in sorted(RECEIVABLE_CATEGORIES))
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM Receivables")
+            cursor.execute(f"""
+                INSERT INTO Receivables (Patient, Outstanding)
+                SELECT Patient, -SUM(Amount)
+                FROM FinancialTransactions
+                WHERE Category IN ({categories})
+                GROUP BY Patient
+                HAVING ABS(SUM(Amount)) >= ?
+            """, (SETTLED,))
+            conn.commit()
@@ -0,0 +1,341 @@
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: lock one byte of the lock file instead.
+    fcntl = None
+    import msvcrt
+
+# Compact once dead records make up this share of the log...
+COMPACT_RATIO = 0.5
+# ...and the log is at least this big.
+COMPACT_MIN_BYTES = 1 << 20
+
+FORMAT = "hms-log"
+VERSION = 1
+
+class LogStore:
+    """
+    Append-only store of per-patient item lists, e.g. prescriptions or records.
+
+    Each line of the file is "<crc32> <json>\\n". The first line is a header
+    with a generation id; every other line appends one item for a patient or
+    deletes a patient's items. Appending is a single O_APPEND write, so it
+    costs the same whatever the size of the file, and several processes can
+    append to one file. Every read and write holds an exclusive lock on
+    `<path>.lock`, so a compaction in one process never drops an append from
+    another or swaps the file under its reads.
+
+    An in-memory index maps each patient to the byte offsets of their items, so
+    get() reads only that patient's lines. The index is saved next to the log
+    (`<path>.idx`) on close() and compact(), and on open only the part of the
+    log written after the saved index is scanned. Writes from other processes
+    are picked up the same way before each read.
+
+    Crash safety: a write torn by a crash leaves a line with a bad checksum or
+    no newline; it is skipped when scanning and dropped by the next compaction.
+    The log is compacted on open, append() and delete() once dead lines make
+    up compact_ratio of a file of at least compact_min_bytes. compact() writes
+    a new file with only the live items, grouped by patient, to a temporary
+    file and swaps it in with os.replace, so a crash leaves either the old or
+    the new log. A legacy file holding one JSON object is converted on open.
+
+    Errors are raised to the caller.
+    """
+
+    def __init__(self, path, fsync=True, compact_ratio=COMPACT_RATIO, compact_min_bytes=COMPACT_MIN_BYTES):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.lock_path = f"{path}.lock"
+        self.fsync = fsync
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        with self._locked():
+            self._open()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Hold the thread lock and, outermost call only, the lock file shared with other processes.
+        """
+        with self._lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+                    if fcntl is None:
+                        os.lseek(fd, 0, os.SEEK_SET)
+                        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(fd)
+
+    def _open(self):
+        self._offsets = {}
+        self._generation = None
+        self._scanned = 0
+        self._dead_bytes = 0
+        self._torn = False
+        self._inode = None
+
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            self._rewrite({})
+            return
+        with open(self.path, 'rb') as file:
+            first = file.read(1)
+        if first == b'{':
+            with open(self.path, 'r') as file:
+                self._rewrite(json.load(file))
+            return
+        self._load_index()
+        self._catch_up()
+        self._maybe_compact()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r') as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            return
+        if saved.get('size', 0) > os.path.getsize(self.path):
+            return
+        with open(self.path, 'rb') as file:
+            header = self._parse(file.readline())
+        if header is None or header.get('generation') != saved.get('generation'):
+            return
+        self._generation = saved['generation']
+        self._offsets = saved['offsets']
+        self._scanned = saved['size']
+        self._dead_bytes = saved['dead_bytes']
+
+    def _catch_up(self):
+        """
+        Index lines written since the last scan, by this or another process.
+        """
+        stat = os.stat(self.path)
+        if self._inode is not None and stat.st_ino != self._inode:
+            # Another process compacted the log; start over from its index.
+            self._open()
+            return
+        self._inode = stat.st_ino
+        if stat.st_size <= self._scanned:
+            return
+
+        with open(self.path, 'rb') as file:
+            file.seek(self._scanned)
+            offset = self._scanned
+            for line in file:
+                if not line.endswith(b'\n'):
+                    # A torn write; the next append starts on a fresh line.
+                    self._torn = True
+                    self._dead_bytes += len(line)
+                    offset += len(line)
+                    break
+                self._apply(offset, line)
+                offset += len(line)
+            self._scanned = offset
+
+    def _apply(self, offset, line):
+        entry = self._parse(line)
+        if entry is None:
+            self._dead_bytes += len(line)
+        elif 'generation' in entry:
+            self._generation = entry['generation']
+        elif entry.get('deleted'):
+            self._dead_bytes += len(line)
+            self._offsets.pop(entry['patient'], None)
+        else:
+            self._offsets.setdefault(entry['patient'], []).append(offset)
+
+    @staticmethod
+    def _encode(entry):
+        payload = json.dumps(entry).encode('utf-8')
+        return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+    @staticmethod
+    def _parse(line):
+        checksum, _, payload = line.rstrip(b'\n').partition(b' ')
+        try:
+            if int(checksum, 16) != zlib.crc32(payload):
+                return None
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    def _write(self, data):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            os.write(fd, data)
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def append(self, patient, item):
+        """
+        Append one item to the patient's list.
+        """
+        with self._locked():
+            self._catch_up()
+            data = self._encode({'patient': patient, 'item': item})
+            if self._torn:
+                data = b'\n' + data
+                self._dead_bytes += 1
+                self._torn = False
+            self._write(data)
+            self._catch_up()
+            self._maybe_compact()
+
+    def get(self, patient):
+        """
+        Return the patient's items in the order they were appended.
+        """
+        with self._locked():
+            self._catch_up()
+            offsets = self._offsets.get(patient)
+            if not offsets:
+                return []
+            items = []
+            with open(self.path, 'rb') as file:
+                for offset in offsets:
+                    file.seek(offset)
+                    items.append(self._parse(file.readline())['item'])
+            return items
+
+    def delete(self, patient):
+        """
+        Delete all of the patient's items.
+        """
+        with self._locked():
+            self._catch_up()
+            if patient not in self._offsets:
+                return
+            self._dead_bytes += sum(len(line) for line in self._lines(self._offsets[patient]))
+            self._write(self._encode({'patient': patient, 'deleted': True}))
+            self._catch_up()
+            self._maybe_compact()
+
+    def patients(self):
+        with self._locked():
+            self._catch_up()
+            return list(self._offsets)
+
+    def to_dict(self):
+        """
+        Return every patient's items, as the old JSON file held them.
+        """
+        with self._locked():
+            return {patient: self.get(patient) for patient in self.patients()}
+
+    def replace_all(self, items_by_patient):
+        """
+        Replace the whole store, e.g. with an edited copy of to_dict().
+        """
+        with self._locked():
+            self._rewrite(items_by_patient)
+
+    def compact(self):
+        """
+        Rewrite the log with only live items, grouped by patient.
+        """
+        with self._locked():
+            self._catch_up()
+            self._rewrite(self.to_dict())
+
+    def close(self):
+        """
+        Save the offset index so the next open does not rescan the log.
+        """
+        with self._locked():
+            self._catch_up()
+            self._save_index()
+
+    def _maybe_compact(self):
+        size = self._scanned
+        if size >= self.compact_min_bytes and self._dead_bytes >= size * self.compact_ratio:
+            self.compact()
+
+    def _lines(self, offsets):
+        with open(self.path, 'rb') as file:
+            for offset in offsets:
+                file.seek(offset)
+                yield file.readline()
+
+    def _rewrite(self, items_by_patient):
+        generation = uuid.uuid4().hex
+        offsets = {}
+        temporary = _temporary(self.path)
+        with open(temporary, 'wb') as file:
+            file.write(self._encode({'format': FORMAT, 'version': VERSION, 'generation': generation}))
+            for patient, items in items_by_patient.items():
+                for item in items:
+                    offsets.setdefault(patient, []).append(file.tell())
+                    file.write(self._encode({'patient': patient, 'item': item}))
+            file.flush()
+            os.fsync(file.fileno())
+            size = file.tell()
+        os.replace(temporary, self.path)
+
+        self._generation = generation
+        self._offsets = offsets
+        self._scanned = size
+        self._dead_bytes = 0
+        self._torn = False
+        self._inode = os.stat(self.path).st_ino
+        self._save_index()
+
+    def _save_index(self):
+        temporary = _temporary(self.index_path)
+        with open(temporary, 'w') as file:
+            json.dump({'generation': self._generation, 'size': self._scanned,
+                       'dead_bytes': self._dead_bytes, 'offsets': self._offsets}, file)
+        os.replace(temporary, self.index_path)
+
+
+def _temporary(path):
+    """
+    Create a uniquely named empty file next to `path`, to be renamed over it.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    # mkstemp creates the file private to the owner; keep the permissions the file had.
+    os.chmod(temporary, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+    return temporary
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(path):
+    """
+    Return the LogStore for `path`, shared by everything in this process.
+    """
+    key = os.path.abspath(path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = LogStore(path)
+        return _stores[key]
@@ -1,152 +1,413 @@
+import datetime
 import json
-import pyodbc
+import threading
+import time
 from modules.finance import Finance
+from modules.catalog import CHUNK_SIZE, CatalogLoader, print_progress
+import modules.aggregates as aggregates
+import modules.forecast as forecast
 import modules.database as database
 
+# Prescriptions per medication name, read from the AnalyticsTotals kept by
+# dispense_medication rather than summed over PrescriptionTrends.
+PRESCRIPTION_TOTALS_QUERY = """
+    SELECT PharmacyInventory.MedicationName, CAST(SUM(AnalyticsTotals.Amount) AS BIGINT) AS TotalPrescriptions
+    FROM PharmacyInventory
+    JOIN AnalyticsTotals ON AnalyticsTotals.Metric = 'prescriptions_by_medication'
+        AND AnalyticsTotals.GroupKey = CAST(PharmacyInventory.MedicationID AS NVARCHAR(100))
+    WHERE AnalyticsTotals.Entries > 0
+    GROUP BY PharmacyInventory.MedicationName
+"""
+
+# Lots of one medication expiring on or after a date, first to expire first
+# (a range of IX_MedicationLots_MedicationID_ExpiryDate).
+LOTS_QUERY = """
+    SELECT LotID, ExpiryDate, Quantity
+    FROM MedicationLots
+    WHERE MedicationID = ? AND ExpiryDate >= ?
+    ORDER BY ExpiryDate, LotID
+"""
+
+# Units of one medication held in lots, expired or not.
+LOTTED_QUERY = "SELECT SUM(Quantity) AS Lotted FROM MedicationLots WHERE MedicationID = ?"
+
+# Lots expiring before a date, soonest first (IX_MedicationLots_ExpiryDate).
+EXPIRING_LOTS_QUERY = """
+    SELECT MedicationLots.LotID, MedicationLots.MedicationID, PharmacyInventory.MedicationName,
+           MedicationLots.LotNumber, MedicationLots.ExpiryDate, MedicationLots.Quantity
+    FROM MedicationLots
+    JOIN PharmacyInventory ON PharmacyInventory.MedicationID = MedicationLots.MedicationID
+    WHERE MedicationLots.ExpiryDate < ?
+    ORDER BY MedicationLots.ExpiryDate, MedicationLots.LotID
+"""
+
+
+def as_date(value):
+    """
+    Return a DATE column value or a 'YYYY-MM-DD' string as a datetime.date.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
 class Pharmacy:
-    def __init__(self):
-      
-        self.conn = self.connect_to_db()
-        self.inventory = self.load_inventory()
-        self.finance = Finance()
+    """
+    Pharmacy operations over an in-memory cache of PharmacyInventory.
 
-    def connect_to_db(self):
-        try: 
-            conn = database
-            return conn
-        except Exception as e:
-            print(f"Error connecting to the database: {e}")
-            return None
+    Writes update the database and then apply the same change to the cache, so a
+    dispense costs one conditional UPDATE rather than a reload of every SKU.
+    Changes made by other processes are picked up by reconcile_inventory(), which
+    reads only the rows whose ChangeVersion moved. Pass `reconcile_interval`
+    (seconds) to reconcile automatically before a read once the cache is that old.
+    Stock adjustments to the cache take a lock, so one Pharmacy can serve several
+    threads.
 
-    def load_inventory(self):
-       
-        if not self.conn:
-            return {}
+    Stock received with an expiry date is also recorded as a lot in
+    MedicationLots; PharmacyInventory.Stock stays the total on hand. Dispensing
+    takes stock received without a lot (before lots were tracked) first, then
+    unexpired lots first-expired-first-out. The lots of a medication and the
+    lots expiring before a date are both index range reads.
+    """
+
+    def __init__(self, reconcile_interval=None):
 
-        cursor = self.conn.cursor()
+        self.reconcile_interval = reconcile_interval
+        self.inventory = {}
+        self.inventory_version = 0
+        self.cache_stats = {'hits': 0, 'misses': 0, 'full_loads': 0, 'reconciles': 0, 'rows_reconciled': 0}
+        self._synced_at = None
+        self._cache_lock = threading.Lock()
+        self.load_inventory()
+        self.finance = Finance()
+
+    def load_inventory(self):
+        """
+        Reload the whole inventory cache from the database.
+        """
         try:
-            cursor.execute("SELECT MedicationName, Stock, Price FROM PharmacyInventory")
-            inventory = {}
-            for row in cursor:
-                inventory[row.MedicationName] = {
-                    'stock': row.Stock,
-                    'price': row.Price
-                }
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT MedicationName, Stock, Price, CAST(ChangeVersion AS BIGINT) AS Version
+                    FROM PharmacyInventory
+                """)
+                inventory = {}
+                version = 0
+                for row in cursor:
+                    inventory[row.MedicationName] = {
+                        'stock': row.Stock,
+                        'price': row.Price
+                    }
+                    version = max(version, row.Version)
+            self.inventory = inventory
+            self.inventory_version = version
+            self._synced_at = time.monotonic()
+            self.cache_stats['full_loads'] += 1
             return inventory
         except Exception as e:
             print(f"Error loading inventory: {e}")
             return {}
-        finally:
-            cursor.close()
 
-    def update_inventory(self, medication, stock):
-      
-        if not self.conn:
-            return
+    def reconcile_inventory(self):
+        """
+        Apply rows changed in the database since the cache was last synchronized.
+        Returns the number of rows applied. Deleted medications need a full load_inventory().
+        """
+        try:
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT MedicationName, Stock, Price, CAST(ChangeVersion AS BIGINT) AS Version
+                    FROM PharmacyInventory
+                    WHERE ChangeVersion > ?
+                """, (self.inventory_version,))
+                rows = cursor.fetchall()
+            for row in rows:
+                self.inventory[row.MedicationName] = {'stock': row.Stock, 'price': row.Price}
+                self.inventory_version = max(self.inventory_version, row.Version)
+            self._synced_at = time.monotonic()
+            self.cache_stats['reconciles'] += 1
+            self.cache_stats['rows_reconciled'] += len(rows)
+            return len(rows)
+        except Exception as e:
+            print(f"Error reconciling inventory: {e}")
+            return 0
 
-        cursor = self.conn.cursor()
+    def load_price_catalog(self, path='data/medications_New_prices_up_to_03-08-2024.json', dry_run=False,
+                           chunk_size=CHUNK_SIZE, progress=print_progress):
+        """
+        Apply a medication price catalog: changed prices and new medications only,
+        with price history. With dry_run=True, report what would change instead.
+        """
         try:
-            cursor.execute("SELECT * FROM PharmacyInventory WHERE MedicationName = ?", (medication,))
+            stats = CatalogLoader(chunk_size=chunk_size, progress=progress).run(path, dry_run=dry_run)
+        except Exception as e:
+            print(f"Error loading price catalog: {e}")
+            return None
+        print(f"{'Would apply' if dry_run else 'Applied'} {stats['price_changes']} price changes and "
+              f"{stats['new']} new medications from {path} ({stats['unchanged']} unchanged, {stats['invalid']} invalid).")
+        for name, old, price in stats['changes']:
+            print(f"  {name}: {old} -> {price}")
+        for entry_number, reason in stats['rejects']:
+            print(f"  entry {entry_number}: {reason}")
+        if not dry_run:
+            self.reconcile_inventory()
+        return stats
+
+    def inventory_cache_metrics(self):
+        """
+        Return cache hit/miss counters and how long ago the cache was last synchronized.
+        """
+        lookups = self.cache_stats['hits'] + self.cache_stats['misses']
+        return dict(
+            self.cache_stats,
+            hit_rate=self.cache_stats['hits'] / lookups if lookups else 0.0,
+            staleness_seconds=time.monotonic() - self._synced_at if self._synced_at is not None else None,
+            version=self.inventory_version,
+            medications=len(self.inventory),
+        )
+
+    def _lookup(self, medication):
+        """
+        Return the cached entry for a medication, reading just that row on a miss.
+        """
+        if (self.reconcile_interval is not None and self._synced_at is not None
+                and time.monotonic() - self._synced_at >= self.reconcile_interval):
+            self.reconcile_inventory()
+
+        if medication in self.inventory:
+            self.cache_stats['hits'] += 1
+            return self.inventory[medication]
+
+        self.cache_stats['misses'] += 1
+        return self._refresh_medication(medication)
+
+    def _refresh_medication(self, medication):
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT Stock, Price FROM PharmacyInventory WHERE MedicationName = ?", (medication,))
             row = cursor.fetchone()
+        if row is None:
+            self.inventory.pop(medication, None)
+            return None
+        self.inventory[medication] = {'stock': row.Stock, 'price': row.Price}
+        return self.inventory[medication]
 
-            if row:
+    def update_inventory(self, medication, stock, expiry_date=None, lot_number=None):
+        """
+        Add `stock` units of a medication (negative to remove). With an expiry
+        date (a date or 'YYYY-MM-DD'), the units are recorded as one lot.
+        Removed units come out of unlotted stock first, then out of the lots in
+        expiry order, expired ones included; removing more than is on hand is
+        refused.
+        """
+        try:
+            with database.connection() as conn:
+                cursor = conn.cursor()
                 cursor.execute("""
                     UPDATE PharmacyInventory
                     SET Stock = Stock + ?
                     WHERE MedicationName = ?
                 """, (stock, medication))
-            else:
-                cursor.execute("""
-                    INSERT INTO PharmacyInventory (MedicationName, Stock, Price)
-                    VALUES (?, ?, ?)
-                """, (medication, stock, 0))  
 
-            self.conn.commit()
-            self.inventory = self.load_inventory()
+                inserted = cursor.rowcount == 0
+                if inserted and stock < 0:
+                    raise ValueError(f"no {medication} on hand")
+                if stock < 0:
+                    # Keep the lots in step, so expired units removed here are
+                    # not written off a second time by remove_expired_lots.
+                    cursor.execute(database.get_dialect().limit("""
+                        SELECT MedicationID, Stock FROM PharmacyInventory WHERE MedicationName = ? ORDER BY MedicationID
+                    """, 1), (medication,))
+                    row = cursor.fetchone()
+                    on_hand = row.Stock - stock
+                    if row.Stock < 0 or not self._take_from_lots(cursor, row.MedicationID, on_hand, -stock,
+                                                                 usable_from=datetime.date.min):
+                        raise ValueError(f"only {on_hand} units of {medication} on hand")
+                if inserted:
+                    cursor.execute("""
+                        INSERT INTO PharmacyInventory (MedicationName, Stock, Price)
+                        VALUES (?, ?, ?)
+                    """, (medication, stock, 0))
+
+                if expiry_date is not None and stock > 0:
+                    cursor.execute("""
+                        INSERT INTO MedicationLots (MedicationID, LotNumber, ExpiryDate, Quantity)
+                        VALUES (?, ?, ?, ?)
+                    """, (self._medication_id(cursor, medication), lot_number, as_date(expiry_date).isoformat(), stock))
+
+                conn.commit()
+
+            with self._cache_lock:
+                cached = self.inventory.get(medication)
+                if inserted:
+                    self.inventory[medication] = {'stock': stock, 'price': 0}
+                elif cached is not None:
+                    cached['stock'] += stock
+            if not inserted and cached is None:
+                self._refresh_medication(medication)
             print(f"Inventory updated for {medication}.")
         except Exception as e:
             print(f"Error updating inventory: {e}")
-        finally:
-            cursor.close()
 
-    def check_expired_medications(self):
-     
-        if not self.conn:
-            return
+    @staticmethod
+    def _medication_id(cursor, medication):
+        cursor.execute("SELECT MIN(MedicationID) AS MedicationID FROM PharmacyInventory WHERE MedicationName = ?",
+                       (medication,))
+        return cursor.fetchone().MedicationID
 
-        cursor = self.conn.cursor()
+    @staticmethod
+    def _take_from_lots(cursor, medication_id, stock, quantity, usable_from=None):
+        """
+        Remove `quantity` units from the lots of a medication that had `stock`
+        units on hand, taking unlotted stock first and then the lots expiring
+        on or after `usable_from` (default: today) in expiry order. Only the
+        lots needed are read. Returns False, changing nothing, if unlotted
+        stock and those lots together hold fewer than `quantity` units.
+        """
+        cursor.execute(LOTTED_QUERY, (medication_id,))
+        remaining = quantity - max(stock - (cursor.fetchone().Lotted or 0), 0)
+        if remaining <= 0:
+            return True
+        cursor.execute(LOTS_QUERY, (medication_id, (usable_from or datetime.date.today()).isoformat()))
+        lots, covered = [], 0
+        while covered < remaining:
+            lot = cursor.fetchone()
+            if lot is None:
+                return False
+            lots.append(lot)
+            covered += lot.Quantity
+        for lot in lots:
+            if lot.Quantity <= remaining:
+                cursor.execute("DELETE FROM MedicationLots WHERE LotID = ?", (lot.LotID,))
+            else:
+                cursor.execute("UPDATE MedicationLots SET Quantity = Quantity - ? WHERE LotID = ?", (remaining, lot.LotID))
+            remaining -= lot.Quantity
+        return True
+
+    def expiring_lots(self, days=0):
+        """
+        Return the lots that expire within `days` days, soonest first; with
+        days=0, the lots already expired. A lot is usable through its expiry date.
+        """
+        cutoff = datetime.date.today() + datetime.timedelta(days=days)
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(EXPIRING_LOTS_QUERY, (cutoff.isoformat(),))
+            return cursor.fetchall()
+
+    def check_expired_medications(self, days=0):
+        """
+        Print the lots already expired, or with `days`, those expiring within that many days.
+        """
         try:
-            cursor.execute("""
-                SELECT MedicationName, ExpiryDate 
-                FROM PharmacyInventory 
-                WHERE ExpiryDate < GETDATE()
-            """)
-            expired_medications = cursor.fetchall()
-            
-            if expired_medications:
-                print("Expired Medications:")
-                for row in expired_medications:
-                    print(f"{row.MedicationName} expired on {row.ExpiryDate}.")
+            lots = self.expiring_lots(days)
+            if lots:
+                print("Expired Medications:" if days == 0 else f"Medications expiring within {days} days:")
+                today = datetime.date.today()
+                for row in lots:
+                    lot = f" (lot {row.LotNumber})" if row.LotNumber else ""
+                    expiry_date = as_date(row.ExpiryDate)
+                    verb = "expired" if expiry_date < today else "expires"
+                    print(f"{row.MedicationName}{lot}: {row.Quantity} units {verb} on {expiry_date}.")
             else:
-                print("No expired medications found.")
+                print("No expired medications found." if days == 0 else f"No medications expire within {days} days.")
         except Exception as e:
             print(f"Error checking expired medications: {e}")
-        finally:
-            cursor.close()
+
+    def remove_expired_lots(self):
+        """
+        Write off every expired lot: delete it and take its units out of stock.
+        Returns the number of lots removed.
+        """
+        try:
+            today = datetime.date.today().isoformat()
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(EXPIRING_LOTS_QUERY, (today,))
+                lots = cursor.fetchall()
+                for row in lots:
+                    cursor.execute("DELETE FROM MedicationLots WHERE LotID = ?", (row.LotID,))
+                    cursor.execute("""
+                        UPDATE PharmacyInventory
+                        SET Stock = CASE WHEN Stock > ? THEN Stock - ? ELSE 0 END
+                        WHERE MedicationID = ?
+                    """, (row.Quantity, row.Quantity, row.MedicationID))
+                conn.commit()
+
+            for medication in {row.MedicationName for row in lots}:
+                self._refresh_medication(medication)
+            print(f"Removed {len(lots)} expired lots.")
+            return len(lots)
+        except Exception as e:
+            print(f"Error removing expired lots: {e}")
+            return 0
 
     def view_inventory(self):
-     
+
         print("Pharmacy Inventory:")
         for medication, details in self.inventory.items():
             print(f"{medication}: {details['stock']} units, Price: ${details['price']}")
 
     def dispense_medication(self, patient, medication, quantity):
-       
-        if not self.conn:
-            return
 
-        if medication in self.inventory and self.inventory[medication]['stock'] >= quantity:
-            cursor = self.conn.cursor()
-            try:
+        try:
+            item = self._lookup(medication)
+            if item is None or item['stock'] < quantity:
+                print(f"Insufficient stock for {medication}.")
+                return
+
+            with database.connection() as conn:
+                cursor = conn.cursor()
                 cursor.execute("""
                     UPDATE PharmacyInventory
                     SET Stock = Stock - ?
-                    WHERE MedicationName = ?
-                """, (quantity, medication))
-
-                self.conn.commit()
-                self.inventory = self.load_inventory()
-
-                self.finance.pay_for_medication(patient, medication, quantity, self.inventory[medication]['price'])
-                print(f"Dispensed {quantity} units of {medication} to {patient}.")
-            except Exception as e:
-                print(f"Error dispensing medication: {e}")
-            finally:
-                cursor.close()
-        else:
-            print(f"Insufficient stock for {medication}.")
-
-    def close_connection(self):
-      
-        if self.conn:
-            self.conn.close()
-            self.conn = None
-            print("Database connection closed.")
+                    WHERE MedicationName = ? AND Stock >= ?
+                """, (quantity, medication, quantity))
+                dispensed = cursor.rowcount > 0
+                if dispensed:
+                    # The UPDATE holds the row, so the lots cannot change under us.
+                    cursor.execute(database.get_dialect().limit("""
+                        SELECT MedicationID, Stock FROM PharmacyInventory WHERE MedicationName = ? ORDER BY MedicationID
+                    """, 1), (medication,))
+                    row = cursor.fetchone()
+                    medication_id = row.MedicationID
+                    dispensed = self._take_from_lots(cursor, medication_id, row.Stock + quantity, quantity)
+                if dispensed:
+                    # One filled prescription, counted in PrescriptionTrends and its totals.
+                    cursor.execute("INSERT INTO PrescriptionTrends (MedicationID, PrescriptionCount) VALUES (?, 1)",
+                                   (medication_id,))
+                    aggregates.record(cursor, 'prescriptions_by_medication', medication_id, amount=1)
+                    forecast.record_dispense(cursor, medication_id, quantity)
+                    conn.commit()
 
-    def analyze_prescription_trends(self):
-      
-        if not self.conn:
-            return
+            if not dispensed:
+                # The cached stock was stale (another desk dispensed it first), or
+                # the rest is in expired lots; the stock update was rolled back.
+                self._refresh_medication(medication)
+                print(f"Insufficient stock for {medication}.")
+                return
+
+            with self._cache_lock:
+                item['stock'] -= quantity
+            self.finance.pay_for_medication(patient, medication, quantity, item['price'])
+            print(f"Dispensed {quantity} units of {medication} to {patient}.")
+        except Exception as e:
+            print(f"Error dispensing medication: {e}")
 
-        cursor = self.conn.cursor()
+    def analyze_prescription_trends(self):
+        """
+        Print prescriptions per medication from the per-medication totals.
+        """
         try:
-            cursor.execute("""
-                SELECT MedicationName, SUM(PrescriptionCount) AS TotalPrescriptions
-                FROM PrescriptionTrends
-                GROUP BY MedicationName
-            """)
-            prescription_trends = cursor.fetchall()
-            
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(PRESCRIPTION_TOTALS_QUERY)
+                prescription_trends = cursor.fetchall()
+
             if prescription_trends:
                 print("Prescription Trends:")
                 for row in prescription_trends:
@@ -155,23 +416,19 @@ class Pharmacy:
                 print("No prescription trends found.")
         except Exception as e:
             print(f"Error analyzing prescription trends: {e}")
-        finally:
-            cursor.close()
 
     def check_compliance(self):
-    
-        if not self.conn:
-            return
 
-        cursor = self.conn.cursor()
         try:
-            cursor.execute("""
-                SELECT Patient, MedicationName, ComplianceStatus
-                FROM COMPLIANCE
-                WHERE ComplianceStatus = 'non-compliant'
-            """)
-            non_compliant_patients = cursor.fetchall()
-            
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT Patient, MedicationName, ComplianceStatus
+                    FROM COMPLIANCE
+                    WHERE ComplianceStatus = 'non-compliant'
+                """)
+                non_compliant_patients = cursor.fetchall()
+
             if non_compliant_patients:
                 print("Non-Compliant Patients:")
                 for row in non_compliant_patients:
@@ -180,23 +437,19 @@ class Pharmacy:
                 print("All patients are compliant.")
         except Exception as e:
             print(f"Error checking compliance: {e}")
-        finally:
-            cursor.close()
 
     def analyze_supplier_performance(self):
-    
-        if not self.conn:
-            return
 
-        cursor = self.conn.cursor()
         try:
-            cursor.execute("""
-                SELECT SupplierName, AVG(PerformanceRating) AS AvgRating
-                FROM Supplier
-                GROUP BY SupplierName
-            """)
-            supplier_performance = cursor.fetchall()
-            
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT SupplierName, AVG(PerformanceRating) AS AvgRating
+                    FROM Supplier
+                    GROUP BY SupplierName
+                """)
+                supplier_performance = cursor.fetchall()
+
             if supplier_performance:
                 print("Supplier Performance:")
                 for row in supplier_performance:
@@ -205,5 +458,3 @@ class Pharmacy:
                 print("No supplier performance data found.")
         except Exception as e:
             print(f"Error analyzing supplier performance: {e}")
-        finally:
-            cursor.close()
\ No newline at end of file
@@ -0,0 +1,303 @@
+import json
+import os
+import sys
+import time
+import modules.analytics as analytics
+import modules.database as database
+from modules.lazy import lazy_import
+from modules.pharmacy import PRESCRIPTION_TOTALS_QUERY
+
+# Only render_reports needs these; importing them at startup costs about 35 ms.
+futures = lazy_import('concurrent.futures')
+html = lazy_import('html')
+multiprocessing = lazy_import('multiprocessing')
+pd = lazy_import('pandas')
+sns = lazy_import('seaborn')
+px = lazy_import('plotly.express')
+
+# Where render_reports writes when no directory is given.
+REPORTS_DIR = 'reports'
+MANIFEST_NAME = 'manifest.json'
+# Size of the PNG charts, in inches at DPI dots per inch.
+FIGURE_SIZE = (10, 6)
+DPI = 100
+
+# ChronicDisease is kept on Users, not Patient or Treatment, hence the join on Username.
+PATIENT_QUERY = """
+    SELECT Patient.Age, Patient.Gender, Patient.GeographicLocation, Users.ChronicDisease, Treatment.Readmission
+    FROM Patient
+    LEFT JOIN Users ON Users.Username = Patient.Username
+    LEFT JOIN Treatment ON Patient.PatientID = Treatment.PatientID
+"""
+DEPARTMENT_QUERY = """
+    SELECT Departments.DepartmentName, SUM(AnalyticsTotals.Entries) AS PatientCount
+    FROM AnalyticsTotals
+    JOIN Departments ON AnalyticsTotals.GroupKey = Departments.DepartmentName
+    WHERE AnalyticsTotals.Metric = 'appointments_by_department' AND AnalyticsTotals.Entries > 0
+    GROUP BY Departments.DepartmentName
+"""
+STAFF_QUERY = """
+    SELECT GroupKey AS Role, Entries AS StaffCount
+    FROM AnalyticsTotals
+    WHERE Metric = 'staff_by_role' AND Entries > 0
+"""
+REVENUE_QUERY = """
+    SELECT GroupKey AS Source, Amount AS TotalAmount
+    FROM AnalyticsTotals
+    WHERE Metric = 'revenue_by_source' AND Entries > 0
+"""
+TRANSACTION_TOTALS_QUERY = """
+    SELECT TransactionType AS [Transaction Type], SUM(Amount) AS Amount
+    FROM FinancialTransactions
+    GROUP BY TransactionType
+"""
+USERS_QUERY = "SELECT Username, Age, Role FROM Users"
+
+
+def _sections(*sections):
+    # Laid out as print(f"\n{title}:") followed by print(value) would lay them out.
+    return "".join(f"\n{title}:\n{value}\n" for title, value in sections)
+
+
+def _patient_report(df):
+    return _sections(("Patient Demographics", df[["Age", "Gender", "GeographicLocation", "ChronicDisease"]].describe()),
+                     ("Readmission Rates", df["Readmission"].value_counts(normalize=True) * 100))
+
+
+def _patient_stream_report(summary):
+    return _sections(("Patient Demographics", summary.describe()),
+                     ("Readmission Rates", summary.value_counts("Readmission", normalize=True) * 100))
+
+
+def _readmission_chart(df, ax):
+    sns.countplot(x="Gender", hue="Readmission", data=df, ax=ax)
+    ax.set_title("Readmission Rates by Gender")
+
+
+def _readmission_stream_chart(summary, ax):
+    sns.barplot(x="Gender", y="count", hue="Readmission",
+                data=summary.pair_counts("Gender", "Readmission"), errorbar=None, ax=ax)
+    ax.set_title("Readmission Rates by Gender")
+
+
+def _table_report(title):
+    return lambda df: _sections((title, df))
+
+
+def _bar_chart(x, y, title):
+    def chart(df, ax):
+        sns.barplot(x=x, y=y, data=df, ax=ax)
+        ax.set_title(title)
+    return chart
+
+
+# The Admin analyses. "report" turns the query result into the printed text and
+# "chart" draws it on a matplotlib Axes; analyses with a "summary" can also be
+# computed in chunks, with "stream_report" and "stream_chart" taking the
+# StreamingSummary instead of the DataFrame.
+ANALYSES = {
+    1: {
+        "name": "Patient Analysis",
+        "query": PATIENT_QUERY,
+        "report": _patient_report,
+        "chart": _readmission_chart,
+        "summary": {
+            "columns": ["Age", "Gender", "GeographicLocation", "ChronicDisease"],
+            "counted": ["Readmission"],
+            "pairs": [("Gender", "Readmission")],
+        },
+        "stream_report": _patient_stream_report,
+        "stream_chart": _readmission_stream_chart,
+    },
+    2: {
+        "name": "Department Analysis",
+        "query": DEPARTMENT_QUERY,
+        "report": _table_report("Department Workload"),
+        "chart": _bar_chart("DepartmentName", "PatientCount", "Patient Distribution by Department"),
+    },
+    3: {
+        "name": "Staff Analysis",
+        "query": STAFF_QUERY,
+        "report": _table_report("Staff Workload"),
+        "chart": _bar_chart("Role", "StaffCount", "Staff Distribution by Role"),
+    },
+    4: {
+        "name": "Pharmacy Analysis",
+        "query": PRESCRIPTION_TOTALS_QUERY,
+        "report": _table_report("Medication Usage"),
+        "chart": _bar_chart("MedicationName", "TotalPrescriptions", "Medication Usage"),
+    },
+    5: {
+        "name": "Financial Analysis",
+        "query": REVENUE_QUERY,
+        "report": _table_report("Revenue by Source"),
+        "chart": _bar_chart("Source", "TotalAmount", "Revenue by Source"),
+    },
+}
+
+
+def financial_figure(df):
+    """
+    Plotly bar chart of amounts per transaction type (Admin.view_financial_insights).
+    """
+    fig = px.bar(df, x='Transaction Type', y='Amount', title='Financial Transactions', color='Transaction Type', barmode='group')
+    fig.update_layout(xaxis_title='Transaction Type', yaxis_title='Total Amount', title_x=0.5)
+    return fig
+
+
+def users_figure(df):
+    """
+    Plotly bar chart of user ages by role (Admin.view_users_as_dataframe).
+    """
+    fig = px.bar(df, x='Username', y='Age', color='Role', title='User Details by Age and Role', barmode='group')
+    fig.update_layout(xaxis_title='Username', yaxis_title='Age', title_x=0.5)
+    return fig
+
+
+def _report_entries(streaming=False):
+    """
+    Return the entries render_reports writes, as (stem, title, query, kind, render):
+    kind "analysis" or "stream" with render an ANALYSES entry, or "html" with
+    render(df) returning a plotly figure.
+    """
+    entries = []
+    for number, analysis in ANALYSES.items():
+        stem = f"{number:02d}-{analysis['name'].lower().replace(' ', '-')}"
+        if streaming and "summary" in analysis:
+            entries.append((stem, analysis["name"], analysis["query"], "stream", analysis))
+        else:
+            entries.append((stem, analysis["name"], analysis["query"], "analysis", analysis))
+    entries.append(("financial-transactions", "Financial Transactions", TRANSACTION_TOTALS_QUERY, "html", financial_figure))
+    entries.append(("users-by-age-and-role", "User Details by Age and Role", USERS_QUERY, "html", users_figure))
+    return entries
+
+
+def _init_worker(backend, sqlite_path, connection_string):
+    database.configure_backend(backend, sqlite_path=sqlite_path, connection_string=connection_string)
+
+
+def _render_entry(stem, output_dir, streaming, chunk_size):
+    """
+    Fetch one entry's data and write its files. Returns its manifest entry.
+    """
+    from matplotlib.figure import Figure
+
+    _, title, query, kind, render = next(entry for entry in _report_entries(streaming) if entry[0] == stem)
+    entry = {'name': stem, 'title': title, 'files': []}
+    started = time.perf_counter()
+    try:
+        with database.connection() as conn:
+            if kind == "stream":
+                summary = analytics.StreamingSummary(**render["summary"])
+                data = summary.consume(pd.read_sql(query, conn, chunksize=chunk_size))
+                entry['rows'] = summary.rows
+            else:
+                data = pd.read_sql(query, conn)
+                entry['rows'] = len(data)
+    except Exception as e:
+        entry['error'] = f"Error fetching data: {e}"
+        return entry
+    entry['fetch_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    try:
+        if kind == "html":
+            path = os.path.join(output_dir, f"{stem}.html")
+            render(data).write_html(path, include_plotlyjs='cdn')
+            entry['files'].append(os.path.basename(path))
+        else:
+            report = render["stream_report" if kind == "stream" else "report"](data)
+            path = os.path.join(output_dir, f"{stem}.txt")
+            with open(path, 'w') as file:
+                file.write(report)
+            entry['files'].append(os.path.basename(path))
+            # A bare Figure renders with Agg and never touches pyplot or a GUI.
+            fig = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+            render["stream_chart" if kind == "stream" else "chart"](data, fig.subplots())
+            fig.tight_layout()
+            path = os.path.join(output_dir, f"{stem}.png")
+            fig.savefig(path)
+            entry['files'].append(os.path.basename(path))
+    except Exception as e:
+        entry['error'] = f"Error rendering {title}: {e}"
+    entry['render_seconds'] = time.perf_counter() - started
+    return entry
+
+
+def render_reports(output_dir=REPORTS_DIR, workers=None, streaming=False, chunk_size=analytics.CHUNK_SIZE):
+    """
+    Write every Admin analysis (text and PNG chart) and the plotly charts
+    (static HTML) to output_dir, with a manifest.json and an index.html.
+
+    Nothing is shown on screen, so this runs on a headless server. Each entry
+    runs its own query, and the entries render in parallel in `workers`
+    processes (None: one per CPU; 0: in this process). With streaming=True,
+    analyses that support it are computed in chunks of chunk_size rows.
+    Returns the manifest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stems = [entry[0] for entry in _report_entries(streaming)]
+    started = time.perf_counter()
+    if workers == 0:
+        results = [_render_entry(stem, output_dir, streaming, chunk_size) for stem in stems]
+    else:
+        dialect = database.get_dialect()
+        # spawn: a forked worker would inherit the parent's pooled connections.
+        with futures.ProcessPoolExecutor(max_workers=workers or min(len(stems), os.cpu_count() or 1),
+                                         mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=_init_worker,
+                                         initargs=(dialect.name, getattr(dialect, 'path', None),
+                                                   getattr(dialect, 'connection_string', None))) as pool:
+            pending = [pool.submit(_render_entry, stem, output_dir, streaming, chunk_size) for stem in stems]
+            results = [future.result() for future in pending]
+
+    manifest = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seconds': time.perf_counter() - started,
+        'reports': results,
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    with open(os.path.join(output_dir, 'index.html'), 'w') as file:
+        file.write(_index_html(manifest, output_dir))
+    return manifest
+
+
+def _index_html(manifest, output_dir):
+    parts = [f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Hospital reports</title></head><body>\n"
+             f"<h1>Hospital reports</h1>\n<p>Generated {html.escape(manifest['generated_at'])}</p>\n"]
+    for entry in manifest['reports']:
+        parts.append(f"<h2>{html.escape(entry['title'])}</h2>\n")
+        if 'error' in entry:
+            parts.append(f"<p><strong>{html.escape(entry['error'])}</strong></p>\n")
+        for name in entry['files']:
+            if name.endswith('.txt'):
+                with open(os.path.join(output_dir, name)) as file:
+                    parts.append(f"<pre>{html.escape(file.read())}</pre>\n")
+            elif name.endswith('.png'):
+                parts.append(f"<img src=\"{html.escape(name)}\" alt=\"{html.escape(entry['title'])}\">\n")
+            else:
+                parts.append(f"<p><a href=\"{html.escape(name)}\">{html.escape(name)}</a></p>\n")
+    parts.append("</body></html>\n")
+    return "".join(parts)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render the Admin reports to files, without a display.")
+    parser.add_argument("--output", default=os.path.join(REPORTS_DIR, time.strftime('%Y-%m-%d')))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (0: render in this process)")
+    parser.add_argument("--streaming", action="store_true", help="compute the analyses that support it in chunks")
+    args = parser.parse_args()
+
+    manifest = render_reports(args.output, workers=args.workers, streaming=args.streaming)
+    failed = [entry for entry in manifest['reports'] if 'error' in entry]
+    for entry in failed:
+        print(entry['error'], file=sys.stderr)
+    print(f"Wrote {len(manifest['reports'])} reports to {args.output} in {manifest['seconds']:.1f} s.")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
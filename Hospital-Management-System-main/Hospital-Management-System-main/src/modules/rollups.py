@@ -0,0 +1,298 @@
+import datetime
+from decimal import Decimal
+import modules.database as database
+from modules.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# dimension: (source table, grouped column, revenue column, cost column). Every source row has a Date.
+DIMENSIONS = {
+    'source': ('Revenue', 'Source', 'Amount', None),
+    'category': ('Costs', 'Category', None, 'Amount'),
+    'department': ('Profitability', 'Department', 'Revenue', 'Cost'),
+}
+PERIODS = ('day', 'week', 'month', 'year')
+# Rows fetched per round trip while reading buckets.
+FETCH_SIZE = 50_000
+
+BUCKETS_QUERY = """
+    SELECT Day, GroupKey, Entries, Revenue, Cost FROM FinancialRollups
+    WHERE Dimension = ? AND Day >= ? AND Day < ?
+"""
+
+PERIOD_TOTALS_QUERY = """
+    SELECT PeriodStart, GroupKey, Entries, Revenue, Cost FROM PeriodTotals
+    WHERE Period = ? AND Dimension = ? AND PeriodStart >= ? AND PeriodStart < ?
+"""
+
+
+def record(cursor, dimension, key, day, revenue=0, cost=0):
+    """
+    Add one source row to its day's bucket inside the caller's transaction.
+    Days before today are closed and raise ValueError; use rebuild() to change them.
+    """
+    _check(dimension)
+    if day < datetime.date.today():
+        raise ValueError(f"{day} is closed; rebuild() the rollups to change past days.")
+    cursor.execute(_upsert(), (day.isoformat(), dimension, str(key), 1, revenue, cost))
+
+
+def rebuild():
+    """
+    Recompute FinancialRollups from Revenue, Costs and Profitability, and drop
+    the cached closed periods, which the next report computes again. Rows
+    without a Date are left out. Run it after upgrading a database or loading
+    rows directly, while nothing else writes.
+
+    Returns:
+        dict: Number of day buckets per dimension.
+    """
+    buckets = {}
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        for table in ('ClosedPeriods', 'PeriodTotals', 'FinancialRollups'):
+            cursor.execute(f"DELETE FROM {table}")
+        for dimension, (table, column, revenue, cost) in DIMENSIONS.items():
+            cursor.execute(f"""
+                INSERT INTO FinancialRollups (Day, Dimension, GroupKey, Entries, Revenue, Cost)
+                SELECT Date, ?, CAST({column} AS NVARCHAR(100)), COUNT(*), {_sum(revenue)}, {_sum(cost)}
+                FROM {table}
+                WHERE Date IS NOT NULL AND {column} IS NOT NULL
+                GROUP BY Date, {column}
+            """, (dimension,))
+            buckets[dimension] = cursor.rowcount
+        conn.commit()
+    return buckets
+
+
+def migrate():
+    """
+    Add Profitability.Date to a database created before it, then rebuild().
+    Profitability rows written before have no date and are not rolled up.
+    """
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        database.add_missing_columns(cursor, 'Profitability', [('Date', 'DATE NULL')])
+        conn.commit()
+    return rebuild()
+
+
+def period_starts(days, period):
+    """
+    Return the first day of the period each day falls in, as a datetime64[D]
+    array. Weeks start on Monday.
+    """
+    _check(period=period)
+    days = np.asarray(days, dtype='datetime64[D]')
+    if period == 'day':
+        return days
+    if period == 'week':
+        # datetime64 day 0, 1970-01-01, was a Thursday, three days after a Monday.
+        return days - (days.astype(np.int64) + 3) % 7
+    return days.astype(_unit(period)).astype('datetime64[D]')
+
+
+def next_period(starts, period):
+    """
+    Return the first day after each period, given period starts.
+    """
+    _check(period=period)
+    starts = np.asarray(starts, dtype='datetime64[D]')
+    if period == 'day':
+        return starts + 1
+    if period == 'week':
+        return starts + 7
+    return (starts.astype(_unit(period)) + 1).astype('datetime64[D]')
+
+
+def period_range(first, stop, period):
+    """
+    Return the starts of the periods from the one starting at `first` up to, not including, `stop`.
+    """
+    first, stop = np.datetime64(first, 'D'), np.datetime64(stop, 'D')
+    if period == 'day':
+        return np.arange(first, stop)
+    if period == 'week':
+        return np.arange(first, stop, 7)
+    unit = _unit(period)
+    return np.arange(first.astype(unit), stop.astype(unit)).astype('datetime64[D]')
+
+
+def sum_buckets(starts, keys, entries, revenue, cost):
+    """
+    Sum the rows sharing a (period start, key), from parallel arrays.
+
+    Returns:
+        tuple: (starts, keys, entries, revenue, cost) arrays, one entry per
+        group, ordered by start and key.
+    """
+    if not len(starts):
+        return starts, keys, entries, revenue, cost
+    key_values, key_index = np.unique(keys, return_inverse=True)
+    groups, index = np.unique(starts.astype(np.int64) * len(key_values) + key_index, return_inverse=True)
+    sums = [np.bincount(index, weights=column, minlength=len(groups)) for column in (entries, revenue, cost)]
+    return ((groups // len(key_values)).astype('datetime64[D]'), key_values[groups % len(key_values)], *sums)
+
+
+class FinancialRollups:
+    """
+    Revenue, cost and profit per day, week, month or year, by revenue source,
+    cost category or department.
+
+    Every Revenue, Costs and Profitability row is added to its day's bucket
+    in FinancialRollups as it is written (see record), so a report sums
+    buckets instead of scanning the source tables. A period that ended before
+    today is closed: nothing can be added to it any more, so its totals are
+    computed once, stored in PeriodTotals, listed in ClosedPeriods and read
+    back from there afterwards. Only the open periods are summed from the
+    buckets on every call. Periods are worked out and summed with NumPy, with
+    amounts in whole cents.
+
+    Errors are raised to the caller.
+    """
+
+    def report(self, dimension, period='month', start=None, end=None, as_of=None):
+        """
+        Return a DataFrame of Entries, Revenue, Cost and Profit indexed by
+        PeriodStart and the dimension's column (Source, Category or
+        Department), for the whole periods overlapping start..end. start
+        defaults to the first day with data, end to as_of, and as_of to today.
+        Periods are closed relative to as_of, which cannot be after today.
+        """
+        _check(dimension, period)
+        as_of = min(as_of or datetime.date.today(), datetime.date.today())
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            if start is None:
+                cursor.execute("SELECT MIN(Day) AS FirstDay FROM FinancialRollups WHERE Dimension = ?", (dimension,))
+                start = cursor.fetchone()[0]
+                if start is None:
+                    return _frame(dimension, *_empty())
+            first = period_starts([_day(start)], period)[0]
+            stop = next_period(period_starts([_day(end or as_of)], period), period)[0]
+            open_from = period_starts([as_of], period)[0]
+
+            parts = []
+            if first < min(stop, open_from):
+                parts.append(self._closed(conn, cursor, dimension, period, first, min(stop, open_from)))
+            if max(first, open_from) < stop:
+                days, *columns = _fetch(cursor, BUCKETS_QUERY, (dimension, _iso(max(first, open_from)), _iso(stop)))
+                parts.append(sum_buckets(period_starts(days, period), *columns))
+        if not parts:
+            return _frame(dimension, *_empty())
+        return _frame(dimension, *(np.concatenate(column) for column in zip(*parts)))
+
+    def profit(self, period='month', start=None, end=None, as_of=None):
+        """
+        Return a DataFrame of Revenue (all sources), Cost (all categories) and
+        Profit indexed by PeriodStart, for the same periods as report().
+        """
+        revenue = self.report('source', period, start, end, as_of)['Revenue'].groupby(level='PeriodStart').sum()
+        cost = self.report('category', period, start, end, as_of)['Cost'].groupby(level='PeriodStart').sum()
+        frame = pd.concat({'Revenue': revenue, 'Cost': cost}, axis=1).fillna(0).sort_index()
+        frame['Profit'] = (frame['Revenue'] - frame['Cost']).round(2)
+        return frame
+
+    @staticmethod
+    def _closed(conn, cursor, dimension, period, first, stop):
+        """
+        Totals of the closed periods from first up to stop, computing and storing the ones not cached yet.
+        """
+        cursor.execute("""
+            SELECT PeriodStart FROM ClosedPeriods
+            WHERE Period = ? AND Dimension = ? AND PeriodStart >= ? AND PeriodStart < ?
+        """, (period, dimension, _iso(first), _iso(stop)))
+        cached = np.array([str(row[0])[:10] for row in cursor.fetchall()], dtype='datetime64[D]')
+        missing = np.setdiff1d(period_range(first, stop, period), cached)
+        if len(missing):
+            days, *columns = _fetch(cursor, BUCKETS_QUERY,
+                                    (dimension, _iso(missing[0]), _iso(next_period(missing[-1:], period)[0])))
+            starts, keys, entries, revenue, cost = sum_buckets(period_starts(days, period), *columns)
+            wanted = np.isin(starts, missing)
+            dialect = database.get_dialect()
+            # Upserts, not inserts: two reports closing the same period store the same totals.
+            database.executemany(
+                cursor,
+                dialect.upsert('PeriodTotals', ['Period', 'Dimension', 'PeriodStart', 'GroupKey'],
+                               ['Period', 'Dimension', 'PeriodStart', 'GroupKey', 'Entries', 'Revenue', 'Cost']),
+                ((period, dimension, _iso(start), key, int(count), _amount(income), _amount(spent))
+                 for start, key, count, income, spent in zip(starts[wanted].tolist(), keys[wanted].tolist(),
+                                                             entries[wanted], revenue[wanted], cost[wanted])))
+            database.executemany(
+                cursor,
+                dialect.upsert('ClosedPeriods', ['Period', 'Dimension', 'PeriodStart'],
+                               ['Period', 'Dimension', 'PeriodStart']),
+                ((period, dimension, _iso(start)) for start in missing.tolist()))
+            conn.commit()
+        return _fetch(cursor, PERIOD_TOTALS_QUERY, (period, dimension, _iso(first), _iso(stop)))
+
+
+def _fetch(cursor, query, params):
+    """
+    Read (day, key, entries, revenue, cost) rows into arrays, amounts in cents.
+    """
+    cursor.execute(query, params)
+    columns = ([], [], [], [], [])
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        columns[0].append(np.array([str(row[0])[:10] for row in rows], dtype='datetime64[D]'))
+        columns[1].append(np.array([row[1] for row in rows], dtype=str))
+        columns[2].append(np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows)))
+        columns[3].append(np.fromiter((round(float(row[3]) * 100) for row in rows), dtype=np.float64, count=len(rows)))
+        columns[4].append(np.fromiter((round(float(row[4]) * 100) for row in rows), dtype=np.float64, count=len(rows)))
+    if not columns[0]:
+        return _empty()
+    return tuple(np.concatenate(column) for column in columns)
+
+
+def _empty():
+    return (np.empty(0, dtype='datetime64[D]'), np.empty(0, dtype=str), np.empty(0), np.empty(0), np.empty(0))
+
+
+def _frame(dimension, starts, keys, entries, revenue, cost):
+    column = DIMENSIONS[dimension][1]
+    frame = pd.DataFrame({
+        'PeriodStart': starts,
+        column: keys,
+        'Entries': entries.astype(np.int64),
+        'Revenue': revenue / 100,
+        'Cost': cost / 100,
+        'Profit': (revenue - cost) / 100,
+    })
+    return frame.set_index(['PeriodStart', column]).sort_index()
+
+
+def _check(dimension=None, period=None):
+    if dimension is not None and dimension not in DIMENSIONS:
+        raise ValueError(f"Unknown dimension {dimension!r}; expected one of {', '.join(DIMENSIONS)}.")
+    if period is not None and period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}; expected one of {', '.join(PERIODS)}.")
+
+
+def _unit(period):
+    return 'datetime64[M]' if period == 'month' else 'datetime64[Y]'
+
+
+def _day(value):
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def _iso(day):
+    return str(np.datetime64(day, 'D'))
+
+
+def _amount(cents):
+    return Decimal(int(round(cents))).scaleb(-2)
+
+
+def _sum(column):
+    return f"COALESCE(SUM({column}), 0)" if column else "0"
+
+
+def _upsert():
+    return database.get_dialect().upsert('FinancialRollups', ['Dimension', 'Day', 'GroupKey'],
+                                         ['Day', 'Dimension', 'GroupKey', 'Entries', 'Revenue', 'Cost'],
+                                         increment=['Entries', 'Revenue', 'Cost'])
@@ -0,0 +1,126 @@
+import threading
+from collections import deque
+import modules.database as database
+
+class RoomAllocator:
+    """
+    Hands out rooms from in-memory free lists, one per RoomType.
+
+    Taking a room off the free list is O(1) under a lock, so two desks in this
+    process never get the same room. The choice is persisted with a single
+    conditional UPDATE (... WHERE IsAvailable = 1); if another process took the
+    room first, the update matches nothing and the next free room is tried.
+
+    Room numbers are kept as strings, matching the RoomNumber column.
+    Errors from the database are raised to the caller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._free = {}
+        self._room_types = {}
+        self.reload()
+
+    def reload(self):
+        """
+        Rebuild the free lists from the Rooms table.
+        """
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT RoomNumber, RoomType, IsAvailable FROM Rooms")
+            rows = cursor.fetchall()
+
+        free, room_types = {}, {}
+        for row in rows:
+            room_number = str(row.RoomNumber)
+            room_types[room_number] = row.RoomType
+            if row.IsAvailable:
+                free.setdefault(row.RoomType, deque()).append(room_number)
+        with self._lock:
+            self._free, self._room_types = free, room_types
+
+    def add_room(self, room_number, room_type, is_available=True):
+        """
+        Track a room that was just inserted into the Rooms table.
+        """
+        room_number = str(room_number)
+        with self._lock:
+            self._room_types[room_number] = room_type
+            if is_available:
+                self._free.setdefault(room_type, deque()).append(room_number)
+
+    def available(self, room_type):
+        """
+        Return how many rooms of this type are on the free list.
+        """
+        with self._lock:
+            return len(self._free.get(room_type, ()))
+
+    def allocate(self, room_type):
+        """
+        Allocate one room of the given type and return its number, or None if none is free.
+        """
+        rooms = self.allocate_many(room_type, 1)
+        return rooms[0] if rooms else None
+
+    def allocate_many(self, room_type, count):
+        """
+        Allocate up to `count` rooms of one type in a single transaction, e.g. for
+        mass-casualty intake. Returns the allocated room numbers, which may be fewer
+        than requested.
+        """
+        allocated = []
+        while len(allocated) < count:
+            candidates = self._take(room_type, count - len(allocated))
+            if not candidates:
+                break
+            allocated.extend(self._persist(candidates, available=False))
+        return allocated
+
+    def release(self, room_number):
+        """
+        Mark an occupied room available again. Returns False if the room is unknown
+        or was not occupied.
+        """
+        room_number = str(room_number)
+        room_type = self._room_types.get(room_number)
+        if room_type is None:
+            return False
+        if not self._persist([room_number], available=True):
+            return False
+        with self._lock:
+            self._free.setdefault(room_type, deque()).append(room_number)
+        return True
+
+    def _take(self, room_type, count):
+        with self._lock:
+            free = self._free.get(room_type)
+            if not free:
+                return []
+            return [free.popleft() for _ in range(min(count, len(free)))]
+
+    def _persist(self, room_numbers, available):
+        """
+        Flip IsAvailable for each room whose flag still has the opposite value.
+        Returns the rooms that changed; the others were changed by someone else.
+        """
+        changed = []
+        try:
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                for room_number in room_numbers:
+                    cursor.execute("""
+                        UPDATE Rooms SET IsAvailable = ?
+                        WHERE RoomNumber = ? AND IsAvailable = ?
+                    """, (int(available), room_number, int(not available)))
+                    if cursor.rowcount > 0:
+                        changed.append(room_number)
+                conn.commit()
+        except Exception:
+            if not available:
+                # Nothing was committed; put the candidates back.
+                with self._lock:
+                    free = self._free.setdefault(self._room_types[room_numbers[0]], deque())
+                    free.extendleft(reversed(room_numbers))
+            raise
+        return changed
@@ -0,0 +1,284 @@
+import bisect
+import threading
+from datetime import date, datetime
+import modules.aggregates as aggregates
+import modules.database as database
+
+# The Appointments table stores only a start time, so every booking is taken
+# to occupy one slot of this many minutes.
+SLOT_MINUTES = 30
+# Opening hours searched by BookingIndex.nearest_free_slot().
+DAY_START = "08:00"
+DAY_END = "18:00"
+# Days of appointments loaded from the database at a time.
+WINDOW_DAYS = 7
+
+APPOINTMENT_COLUMNS = ['Doctor', 'Patient', 'Date', 'Time', 'Room', 'Department', 'IsEmergency']
+
+class BookingConflict(Exception):
+    """
+    Raised when the doctor or the room is already booked for an overlapping slot.
+    `conflicts` lists (kind, name, appointment_id) for each clash.
+    """
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__("; ".join(f"{kind} {name} is already booked (appointment {appointment_id})"
+                                   for kind, name, appointment_id in conflicts))
+
+
+class BookingIndex:
+    """
+    Per-doctor and per-room index of booked slots, used to refuse double bookings.
+
+    For each (doctor or room, day) the index keeps the booked start times in a
+    sorted list, so checking a slot is a bisect plus a look at its neighbours.
+    Appointments are loaded a window of WINDOW_DAYS days at a time, the first
+    time a day in that window is checked. The index then keeps up by reading the
+    appointments inserted since its last read (AppointmentID > last seen), so
+    bookings made by other processes are seen too.
+
+    book() checks the index, inserts, and only then reads the new appointments.
+    If one with a lower ID now overlaps (another process booked the same slot
+    first), it deletes its own row and raises BookingConflict, so of two racing
+    bookings the earlier insert wins.
+
+    Errors from the database are raised to the caller.
+    """
+
+    def __init__(self, slot_minutes=SLOT_MINUTES, window_days=WINDOW_DAYS):
+        self.slot_minutes = slot_minutes
+        self.window_days = window_days
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything loaded; it is read again from the database as needed.
+        """
+        with self._lock:
+            self._starts = {}
+            self._entries = {}
+            self._windows = set()
+            self._last_id = None
+            self._reservations = 0
+
+    def conflicts(self, date, time, doctor=None, room=None):
+        """
+        Return (kind, name, appointment_id) for every booking the slot would clash with.
+        """
+        day, minute = _day(date), _minute(time)
+        with self._lock:
+            self._prepare(day)
+            return self._confirm(self._find(doctor, room, day, minute))
+
+    def is_free(self, date, time, doctor=None, room=None):
+        return not self.conflicts(date, time, doctor=doctor, room=room)
+
+    def book(self, doctor, patient, date, time, room, department, is_emergency=False):
+        """
+        Insert an appointment unless the doctor or room is already booked for an
+        overlapping slot. Returns the new AppointmentID or raises BookingConflict.
+        """
+        day, minute = _day(date), _minute(time)
+        with self._lock:
+            # Bookings from other processes are caught up after the insert, not before.
+            self._prepare(day, catch_up=False)
+            found = self._confirm(self._find(doctor, room, day, minute))
+            if found:
+                raise BookingConflict(found)
+            # Hold the slot under a negative placeholder ID while the insert runs,
+            # so other threads can book other slots in the meantime.
+            self._reservations -= 1
+            reservation = self._reservations
+            self._add(reservation, doctor, room, day, minute)
+
+        try:
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(database.get_dialect().insert_returning('Appointments', APPOINTMENT_COLUMNS, 'AppointmentID'),
+                               (doctor, patient, date, time, room, department, is_emergency))
+                appointment_id = cursor.fetchone()[0]
+                aggregates.record(cursor, 'appointments_by_department', department)
+                conn.commit()
+        finally:
+            self.forget(reservation)
+
+        with self._lock:
+            self._catch_up()
+            self._add(appointment_id, doctor, room, day, minute)
+            earlier = [c for c in self._find(doctor, room, day, minute) if 0 < c[2] < appointment_id]
+        if earlier:
+            # Another process booked the same slot between our check and insert.
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM Appointments WHERE AppointmentID = ?", (appointment_id,))
+                if cursor.rowcount > 0:
+                    aggregates.record(cursor, 'appointments_by_department', department, entries=-1)
+                conn.commit()
+            self.forget(appointment_id)
+            raise BookingConflict(earlier)
+        return appointment_id
+
+    def forget(self, appointment_id):
+        """
+        Drop a cancelled appointment from the index.
+        """
+        with self._lock:
+            entry = self._entries.pop(appointment_id, None)
+            if entry is None:
+                return
+            doctor, room, day, minute = entry
+            for key in (('Doctor', doctor, day), ('Room', room, day)):
+                starts = self._starts.get(key)
+                if starts is not None:
+                    starts.remove((minute, appointment_id))
+
+    def nearest_free_slot(self, date, time, doctor=None, room=None, max_days=14):
+        """
+        Find the free slot closest to the requested one for the doctor and/or room.
+        Slots start every slot_minutes from DAY_START. The requested day is searched
+        first, nearest time first, then each following day from its first slot.
+
+        Returns:
+            tuple: (date, time) as 'YYYY-MM-DD' and 'HH:MM' strings, or None if
+            nothing is free within max_days.
+        """
+        first_day, wanted = _day(date), _minute(time)
+        opening, closing = _minute(DAY_START), _minute(DAY_END)
+        slots = list(range(opening, closing - self.slot_minutes + 1, self.slot_minutes))
+        with self._lock:
+            for offset in range(max_days):
+                day = first_day + offset
+                self._prepare(day)
+                candidates = sorted(slots, key=lambda m: (abs(m - wanted), m < wanted)) if offset == 0 else slots
+                for minute in candidates:
+                    if not self._confirm(self._find(doctor, room, day, minute)):
+                        return (_date(day), f"{minute // 60:02d}:{minute % 60:02d}")
+        return None
+
+    def _prepare(self, day, catch_up=True):
+        if self._last_id is None:
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT MAX(AppointmentID) FROM Appointments")
+                self._last_id = cursor.fetchone()[0] or 0
+        elif catch_up:
+            self._catch_up()
+
+        window = day // self.window_days
+        if window in self._windows:
+            return
+        first = window * self.window_days
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT AppointmentID, Doctor, Room, Date, Time
+                FROM Appointments
+                WHERE Date >= ? AND Date <= ?
+            """, (_date(first), _date(first + self.window_days - 1)))
+            for row in cursor:
+                self._add(row.AppointmentID, row.Doctor, row.Room, _day(row.Date), _minute(row.Time))
+        self._windows.add(window)
+
+    def _catch_up(self):
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT AppointmentID, Doctor, Room, Date, Time
+                FROM Appointments
+                WHERE AppointmentID > ?
+            """, (self._last_id,))
+            for row in cursor:
+                self._last_id = max(self._last_id, row.AppointmentID)
+                day = _day(row.Date)
+                if day // self.window_days in self._windows:
+                    self._add(row.AppointmentID, row.Doctor, row.Room, day, _minute(row.Time))
+
+    def _add(self, appointment_id, doctor, room, day, minute):
+        if appointment_id in self._entries:
+            return
+        doctor, room = _name(doctor), _name(room)
+        self._entries[appointment_id] = (doctor, room, day, minute)
+        for key in (('Doctor', doctor, day), ('Room', room, day)):
+            bisect.insort(self._starts.setdefault(key, []), (minute, appointment_id))
+
+    def _find(self, doctor, room, day, minute):
+        found = []
+        for kind, name in (('Doctor', _name(doctor)), ('Room', _name(room))):
+            if name is None:
+                continue
+            starts = self._starts.get((kind, name, day), ())
+            position = bisect.bisect_left(starts, (minute - self.slot_minutes + 1,))
+            while position < len(starts) and starts[position][0] < minute + self.slot_minutes:
+                found.append((kind, name, starts[position][1]))
+                position += 1
+        return found
+
+    def _confirm(self, found):
+        """
+        Drop clashes with appointments that another process has since deleted.
+        """
+        ids = sorted({appointment_id for _, _, appointment_id in found if appointment_id > 0})
+        if not ids:
+            return found
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT AppointmentID FROM Appointments WHERE AppointmentID IN ({', '.join('?' for _ in ids)})",
+                           ids)
+            existing = {row.AppointmentID for row in cursor}
+        for appointment_id in ids:
+            if appointment_id not in existing:
+                self.forget(appointment_id)
+        return [clash for clash in found if clash[2] < 0 or clash[2] in existing]
+
+def _name(value):
+    # Doctor and Room are NVARCHAR columns; callers may pass e.g. an int room number.
+    return None if value is None else str(value)
+
+
+def _day(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+def _minute(value):
+    if hasattr(value, 'hour'):
+        return value.hour * 60 + value.minute
+    hours, minutes = str(value).split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def _date(day):
+    return date.fromordinal(day).isoformat()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Return the booking index shared by everything in this process.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = BookingIndex()
+        return _index
+
+
+def forget_appointment(appointment_id):
+    if _index is not None:
+        _index.forget(appointment_id)
+
+
+def reset_index():
+    """
+    Drop what the shared index has loaded, e.g. after a bulk rewrite of Appointments.
+    """
+    if _index is not None:
+        _index.reset()
@@ -0,0 +1,306 @@
+import heapq
+import threading
+from array import array
+from collections import namedtuple
+import modules.database as database
+from modules.lazy import lazy_import
+
+# Only needed to intersect posting lists, i.e. once something is searched.
+np = lazy_import('numpy')
+
+# Hits per page in Admin.search.
+PAGE_SIZE = 20
+
+SearchHit = namedtuple('SearchHit', ['entity', 'key', 'score', 'fields'])
+
+# What Admin.search covers. `columns` are returned with each hit, `searched` are
+# matched against the query (the first one counts as the entity's name), and
+# `version` is a column that only grows, used to pick up new and changed rows.
+# Rows of `append_only` tables are never changed or deleted, so refresh() does
+# not look for deleted ones.
+ENTITIES = {
+    'staff': {
+        'table': 'Staff', 'key': 'StaffID',
+        'columns': ['Username', 'Role', 'Specialization'],
+        'searched': ['Username', 'Role', 'Specialization'],
+        'version': 'ChangeVersion',
+    },
+    'patient': {
+        'table': 'Patient', 'key': 'PatientID',
+        'columns': ['Username', 'Age', 'Gender', 'GeographicLocation'],
+        'searched': ['Username', 'Gender', 'GeographicLocation'],
+        'version': 'ChangeVersion',
+    },
+    'medication': {
+        'table': 'PharmacyInventory', 'key': 'MedicationID',
+        'columns': ['MedicationName', 'Stock', 'Price'],
+        'searched': ['MedicationName', 'Stock', 'Price'],
+        'version': 'ChangeVersion',
+    },
+    'department': {
+        'table': 'Departments', 'key': 'DepartmentID',
+        'columns': ['DepartmentName', 'Description'],
+        'searched': ['DepartmentName', 'Description'],
+        'version': 'ChangeVersion',
+    },
+    'transaction': {
+        'table': 'FinancialTransactions', 'key': 'TransactionID',
+        'columns': ['TransactionType', 'Item', 'Amount', 'Balance', 'TransactionDate'],
+        'searched': ['TransactionType', 'Item', 'Amount', 'Balance'],
+        'version': 'TransactionID',
+        'append_only': True,
+    },
+}
+
+class SearchIndex:
+    """
+    In-memory trigram index over the entities in ENTITIES.
+
+    Every searched value is split into lowercase three-character grams, and each
+    gram maps to an ascending array of document ids. A query intersects the
+    arrays of its own grams, then confirms the substring match on the few
+    candidates left, so its cost follows the number of matches rather than the
+    number of indexed rows. Queries shorter than three characters scan all rows.
+
+    Rows are indexed incrementally with upsert()/remove(); refresh() pulls rows
+    added or changed since the last call for entities with a `version` column,
+    and drops deleted rows once an entity's row count no longer matches the
+    index. Changed rows get a new document id and the old one is left as a
+    tombstone until compact() runs.
+    """
+
+    def __init__(self, entities=ENTITIES):
+        self.entities = entities
+        # Positions of the searched columns within each entity's `columns`.
+        self._searched = {entity: [spec['columns'].index(c) for c in spec['searched']]
+                          for entity, spec in entities.items()}
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._docs = []
+        self._doc_ids = {}
+        self._versions = {}
+        # Indexed rows per entity, compared with the table to notice deletes.
+        self._counts = dict.fromkeys(entities, 0)
+        self._tombstones = 0
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def rebuild(self):
+        """
+        Index every row of every entity from scratch.
+        """
+        with self._lock:
+            self._postings, self._docs, self._doc_ids, self._versions = {}, [], {}, {}
+            self._counts = dict.fromkeys(self.entities, 0)
+            self._tombstones = 0
+            for entity in self.entities:
+                self._load(entity, since=None)
+
+    def refresh(self):
+        """
+        Index rows added or changed since the last rebuild() or refresh(), and
+        drop the ones deleted since. Returns the number of rows indexed.
+        """
+        with self._lock:
+            count = 0
+            for entity, spec in self.entities.items():
+                if spec['version']:
+                    count += self._load(entity, since=self._versions.get(entity, 0))
+                    if not spec.get('append_only'):
+                        self._prune(entity)
+            return count
+
+    def _load(self, entity, since):
+        spec = self.entities[entity]
+        columns = list(dict.fromkeys([spec['key']] + spec['columns']))
+        query = f"SELECT {', '.join(columns)}"
+        params = ()
+        if spec['version']:
+            query += f", CAST({spec['version']} AS BIGINT) AS IndexVersion"
+        query += f" FROM {spec['table']}"
+        if spec['version'] and since is not None:
+            query += f" WHERE {spec['version']} > ?"
+            params = (since,)
+
+        count = 0
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            for row in cursor:
+                self.upsert(entity, row[0], tuple(row[columns.index(c)] for c in spec['columns']))
+                if spec['version']:
+                    self._versions[entity] = max(self._versions.get(entity, 0), row.IndexVersion)
+                count += 1
+        return count
+
+    def _prune(self, entity):
+        """
+        Remove the entity's indexed rows that are no longer in its table. Only
+        reads the keys when the table's row count differs from the index's.
+        """
+        spec = self.entities[entity]
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM {spec['table']}")
+            if cursor.fetchone()[0] == self._counts[entity]:
+                return
+            cursor.execute(f"SELECT {spec['key']} FROM {spec['table']}")
+            present = {row[0] for row in cursor}
+        for indexed_entity, key in list(self._doc_ids):
+            if indexed_entity == entity and key not in present:
+                self.remove(entity, key)
+
+    def upsert(self, entity, key, fields):
+        """
+        Index one row. `fields` holds the values of the entity's `columns`, in order.
+        """
+        searched = self._searched[entity]
+        with self._lock:
+            self.remove(entity, key)
+            doc_id = len(self._docs)
+            self._docs.append((entity, key, tuple(fields)))
+            self._doc_ids[(entity, key)] = doc_id
+            self._counts[entity] += 1
+            for gram in self._grams(str(fields[i]).lower() for i in searched if fields[i] is not None):
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = array('i')
+                postings.append(doc_id)
+
+    def remove(self, entity, key):
+        """
+        Drop a row from the index, if it is indexed.
+        """
+        with self._lock:
+            doc_id = self._doc_ids.pop((entity, key), None)
+            if doc_id is None:
+                return
+            self._docs[doc_id] = None
+            self._counts[entity] -= 1
+            self._tombstones += 1
+            if self._tombstones > 1000 and self._tombstones > len(self._doc_ids):
+                self.compact()
+
+    def compact(self):
+        """
+        Renumber the live documents and drop tombstones from the posting arrays.
+        """
+        with self._lock:
+            live = [doc for doc in self._docs if doc is not None]
+            self._postings, self._docs, self._doc_ids = {}, [], {}
+            self._counts = dict.fromkeys(self.entities, 0)
+            self._tombstones = 0
+            for entity, key, fields in live:
+                self.upsert(entity, key, fields)
+
+    def search(self, query, entities=None, limit=PAGE_SIZE, offset=0):
+        """
+        Return (hits, total): one page of SearchHits ranked best first, and the total
+        number of matches. A hit scores higher when a value equals the query, then when
+        it starts with it, then when a word in it does; matches on the name rank first.
+        """
+        needle = query.strip().lower()
+        if not needle:
+            return [], 0
+
+        with self._lock:
+            matches = []
+            for doc_id in self._candidates(needle):
+                doc = self._docs[doc_id]
+                if doc is None or (entities is not None and doc[0] not in entities):
+                    continue
+                score = self._score(needle, self._searched[doc[0]], doc[2])
+                if score:
+                    matches.append((score, -doc_id))
+
+            hits = []
+            for score, doc_id in heapq.nlargest(offset + limit, matches)[offset:]:
+                entity, key, fields = self._docs[-doc_id]
+                hits.append(SearchHit(entity, key, score, dict(zip(self.entities[entity]['columns'], fields))))
+        return hits, len(matches)
+
+    def _candidates(self, needle):
+        if len(needle) < 3:
+            return range(len(self._docs))
+
+        postings = []
+        for gram in self._grams([needle]):
+            found = self._postings.get(gram)
+            if found is None:
+                return []
+            postings.append(found)
+        postings.sort(key=len)
+
+        candidates = np.array(postings[0], dtype=np.int32)
+        for other in postings[1:]:
+            if not len(candidates):
+                break
+            other = np.frombuffer(other, dtype=np.int32)
+            positions = np.minimum(np.searchsorted(other, candidates), len(other) - 1)
+            candidates = candidates[other[positions] == candidates]
+        return candidates.tolist()
+
+    @staticmethod
+    def _grams(values):
+        grams = set()
+        for value in values:
+            grams.update(value[i:i + 3] for i in range(len(value) - 2))
+        return grams
+
+    @staticmethod
+    def _score(needle, searched, fields):
+        best = 0
+        for position in searched:
+            value = fields[position]
+            if value is None:
+                continue
+            text = str(value).lower()
+            if needle not in text:
+                continue
+            if text == needle:
+                score = 4
+            elif text.startswith(needle):
+                score = 3
+            elif f" {needle}" in text:
+                score = 2
+            else:
+                score = 1
+            if position == searched[0]:
+                score += 0.5
+            best = max(best, score)
+        return best
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Return the shared search index, building it on first use and refreshing it afterwards.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = SearchIndex()
+            index.rebuild()
+            _index = index
+        else:
+            _index.refresh()
+    return _index
+
+
+def migrate():
+    """
+    Add the ChangeVersion columns, and their indexes, that refresh() reads to
+    Staff, Patient and Departments in a database created before them. SQLite
+    databases get them automatically.
+    """
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        for entity in ('staff', 'patient', 'department'):
+            table = ENTITIES[entity]['table']
+            if database.add_missing_columns(cursor, table, [('ChangeVersion', 'ROWVERSION')]):
+                cursor.execute(f"CREATE INDEX IX_{table}_ChangeVersion ON {table} (ChangeVersion)")
+        conn.commit()
@@ -1,36 +1,65 @@
-     
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pyodbc
-import json
-import os
-import readline
-import plotly.express as px
 from modules.appointment import Appointment
 from modules.finance import Finance
 from modules.pharmacy import Pharmacy
 from modules.hospital import Hospital
 import modules.database as Database
+import modules.search as Search
+import modules.completion as completion
+from modules.lazy import lazy_import
+from modules.logstore import open_store
+import modules.schedule as schedule
+import modules.analytics as analytics
+import modules.aggregates as aggregates
+import modules.forecast as forecast
+import modules.reports as reports
+import modules.auth as auth
 import csv
 
-# Load nationalities for autocompletion
+# The analytics stack takes about a second to import; only the Admin reports need it.
+pd = lazy_import('pandas')
+plt = lazy_import('matplotlib.pyplot')
+
+# Nationalities for autocompletion, loaded on first use
 def load_nationalities():
-    with open('data/nationalities-common.json', 'r') as file:
-        data = json.load(file)
-    return data['Nationalities']
+    return completion.get_completer('nationality').matches('')
 
 # Autocompletion setup
 def complete(text, state):
-    options = [i for i in nationalities if i.lower().startswith(text.lower())]
-    if state < len(options):
-        return options[state]
-    else:
-        return None
-
-nationalities = load_nationalities()
-readline.set_completer(complete)
-readline.parse_and_bind('tab: complete')
+    return completion.get_completer('nationality').complete(text, state)
+
+def enable_completion():
+    """
+    Tab-complete nationalities in input(). Call once before the interactive loop.
+    Returns False where readline is unavailable (e.g. Windows without pyreadline).
+    """
+    try:
+        import readline
+    except ImportError:
+        return False
+    readline.set_completer(complete)
+    readline.parse_and_bind('tab: complete')
+    return True
+
+PRESCRIPTIONS_PATH = 'data/prescriptions.txt'
+PATIENT_RECORDS_PATH = 'data/patient_records.txt'
+
+USER_COLUMNS = ['Username', 'Password', 'Role', 'PhoneNumber', 'Age', 'Gender', 'Salary', 'Profession', 'Department', 'ChronicDisease', 'Nationality']
+
+# How Admin.search prints each kind of hit.
+SEARCH_LABELS = {
+    'staff': "Staff member",
+    'patient': "Patient",
+    'medication': "Pharmacy item",
+    'department': "Department",
+    'transaction': "Financial Transaction",
+}
+SEARCH_FIELD_LABELS = {
+    'GeographicLocation': "Geographic Location",
+    'MedicationName': "Medication Name",
+    'DepartmentName': "Department Name",
+    'TransactionType': "Transaction Type",
+    'TransactionDate': "Transaction Date",
+}
 
 #  User class
 class User:
@@ -50,86 +79,58 @@ class User:
     @staticmethod
     def load_users():
         """
-        Load all users from the SQL Server database.
+        Load all users from the database.
+        To find one user, use auth.get_service().lookup(username) instead.
         """
-        connection = Database()
-        if connection:
-            cursor = connection.cursor()
-            cursor.execute("SELECT * FROM Users")
-            rows = cursor.fetchall()
-            users = {}
-            for row in rows:
-                users[row.Username] = {
-                    'password': row.Password,
-                    'role': row.Role,
-                    'phone_number': row.PhoneNumber,
-                    'age': row.Age,
-                    'gender': row.Gender,
-                    'salary': row.Salary,
-                    'profession': row.Profession,
-                    'department': row.Department,
-                    'chronic_disease': row.ChronicDisease,
-                    'nationality': row.Nationality
-                }
-            connection.close()
-            return users
-        return {}
+        try:
+            with Database.connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute("SELECT * FROM Users")
+                rows = cursor.fetchall()
+        except Exception as e:
+            print(f"Error loading users: {e}")
+            return {}
+        return {row.Username: auth.profile_from_row(row) for row in rows}
 
     @staticmethod
     def save_users(users):
         """
-        Save users to the SQL Server database.
+        Save users to the database.
         """
-        connection = Database()
-        if connection:
-            cursor = connection.cursor()
-            for username, details in users.items():
-                cursor.execute("""
-                    MERGE INTO Users AS target
-                    USING (VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)) AS source (Username, Password, Role, PhoneNumber, Age, Gender, Salary, Profession, Department, ChronicDisease, Nationality)
-                    ON target.Username = source.Username
-                    WHEN MATCHED THEN
-                        UPDATE SET Password = source.Password, Role = source.Role, PhoneNumber = source.PhoneNumber, Age = source.Age, Gender = source.Gender,
-                        Salary = source.Salary, Profession = source.Profession, Department = source.Department, ChronicDisease = source.ChronicDisease, Nationality = source.Nationality
-                    WHEN NOT MATCHED THEN
-                        INSERT (Username, Password, Role, PhoneNumber, Age, Gender, Salary, Profession, Department, ChronicDisease, Nationality)
-                        VALUES (source.Username, source.Password, source.Role, source.PhoneNumber, source.Age, source.Gender, source.Salary, source.Profession, source.Department, source.ChronicDisease, source.Nationality);
-                """, (username, details['password'], details['role'], details['phone_number'], details['age'], details['gender'],
-                      details.get('salary'), details.get('profession'), details.get('department'), details.get('chronic_disease'), details.get('nationality')))
-            connection.commit()
-            connection.close()
+        try:
+            with Database.connection() as connection:
+                cursor = connection.cursor()
+                upsert = Database.get_dialect().upsert('Users', ['Username'], USER_COLUMNS)
+                for username, details in users.items():
+                    cursor.execute(upsert, (username, details['password'], details['role'], details['phone_number'], details['age'], details['gender'],
+                                            details.get('salary'), details.get('profession'), details.get('department'), details.get('chronic_disease'), details.get('nationality')))
+                connection.commit()
+            auth.get_service().invalidate(users)
+        except Exception as e:
+            print(f"Error saving users: {e}")
 
     def login(self, username, password):
         """
         Authenticate a user by checking their username and password in the database.
         """
-        connection = Database()
-        if connection:
-            cursor = connection.cursor()
-            try:
-                cursor.execute("SELECT * FROM Users WHERE Username = ? AND Password = ?", (username, password))
-                row = cursor.fetchone()
-                if row:
-                    print(f"Login successful. Welcome {username}!")
-                    return True
-                else:
-                    print("Login failed. Invalid username or password.")
-                    return False
-            except Exception as e:
-                print(f"Error during login: {e}")
+        try:
+            if auth.get_service().authenticate(username, password):
+                print(f"Login successful. Welcome {username}!")
+                return True
+            else:
+                print("Login failed. Invalid username or password.")
                 return False
-            finally:
-                connection.close()
-        return False
+        except Exception as e:
+            print(f"Error during login: {e}")
+            return False
 
     def signup(self, username, password, role, phone_number=None, age=None, gender=None, salary=None, profession=None, department=None, chronic_disease=None, nationality=None):
         """
         Register a new user in the database.
         """
-        connection = Database()
-        if connection:
-            cursor = connection.cursor()
-            try:
+        try:
+            with Database.connection() as connection:
+                cursor = connection.cursor()
                 cursor.execute("SELECT * FROM Users WHERE Username = ?", (username,))
                 if cursor.fetchone():
                     print("Username already exists.")
@@ -148,12 +149,9 @@ class User:
                 connection.commit()
                 print("Signup successful.")
                 return True
-            except Exception as e:
-                print(f"Error during signup: {e}")
-                return False
-            finally:
-                connection.close()
-        return False
+        except Exception as e:
+            print(f"Error during signup: {e}")
+            return False
 
     def update_certifications(self, certification):
         self.certifications.append(certification)
@@ -165,140 +163,120 @@ class User:
   
 # Admin class
 class Admin(User):
-    def connect_to_db(self):
-        try:
-            conn = Database()
-            print("Connected to the database successfully!")
-            return conn
-        except Exception as e:
-            print(f"Error connecting to the database: {e}")
-            return None
-
-    def fetch_data(self, query, conn):
+    def fetch_data(self, query, conn, chunksize=None):
+        """
+        Run the query into a DataFrame, or into an iterator of DataFrames of
+        `chunksize` rows that must be consumed while conn is open.
+        """
         try:
-            df = pd.read_sql(query, conn)
+            df = pd.read_sql(query, conn, chunksize=chunksize)
             return df
         except Exception as e:
             print(f"Error fetching data: {e}")
             return None
 
-    def perform_analysis(self, choice):
-        analysis_functions = {
-            1: {
-                "name": "Patient Analysis",
-                "query": """
-                    SELECT Age, Gender, GeographicLocation, ChronicDisease, Readmission 
-                    FROM Patient
-                    LEFT JOIN Treatment ON Patient.PatientID = Treatment.PatientID
-                """,
-                "process": lambda df: (
-                    print("\nPatient Demographics:"),
-                    print(df[["Age", "Gender", "GeographicLocation", "ChronicDisease"]].describe()),
-                    print("\nReadmission Rates:"),
-                    print(df["Readmission"].value_counts(normalize=True) * 100),
-                    sns.countplot(x="Gender", hue="Readmission", data=df),
-                    plt.title("Readmission Rates by Gender"),
-                    plt.show()
-                )
-            },
-            2: {
-                "name": "Department Analysis",
-                "query": """
-                    SELECT DepartmentName, COUNT(AppointmentID) AS PatientCount 
-                    FROM Appointments
-                    JOIN Departments ON Appointments.Department = Departments.DepartmentName
-                    GROUP BY DepartmentName
-                """,
-                "process": lambda df: (
-                    print("\nDepartment Workload:"),
-                    print(df),
-                    sns.barplot(x="DepartmentName", y="PatientCount", data=df),
-                    plt.title("Patient Distribution by Department"),
-                    plt.show()
-                )
-            },
-            3: {
-                "name": "Staff Analysis",
-                "query": """
-                    SELECT Role, COUNT(StaffID) AS StaffCount 
-                    FROM Staff
-                    GROUP BY Role
-                """,
-                "process": lambda df: (
-                    print("\nStaff Workload:"),
-                    print(df),
-                    sns.barplot(x="Role", y="StaffCount", data=df),
-                    plt.title("Staff Distribution by Role"),
-                    plt.show()
-                )
-            },
-            4: {
-                "name": "Pharmacy Analysis",
-                "query": """
-                    SELECT MedicationName, SUM(PrescriptionCount) AS TotalPrescriptions 
-                    FROM PrescriptionTrends
-                    JOIN PharmacyInventory ON PrescriptionTrends.MedicationID = PharmacyInventory.MedicationID
-                    GROUP BY MedicationName
-                """,
-                "process": lambda df: (
-                    print("\nMedication Usage:"),
-                    print(df),
-                    sns.barplot(x="MedicationName", y="TotalPrescriptions", data=df),
-                    plt.title("Medication Usage"),
-                    plt.show()
-                )
-            },
-            5: {
-                "name": "Financial Analysis",
-                "query": """
-                    SELECT Source, SUM(Amount) AS TotalAmount 
-                    FROM Revenue
-                    GROUP BY Source
-                """,
-                "process": lambda df: (
-                    print("\nRevenue by Source:"),
-                    print(df),
-                    sns.barplot(x="Source", y="TotalAmount", data=df),
-                    plt.title("Revenue by Source"),
-                    plt.show()
-                )
-            }
-        }
+    def perform_analysis(self, choice, streaming=False, chunk_size=analytics.CHUNK_SIZE):
+        """
+        Print and plot one of the analyses. With streaming=True, analyses that
+        read unaggregated rows fetch them chunk_size rows at a time and report
+        from a StreamingSummary, so memory stays bounded however large the
+        tables are; the printed figures are the same.
+        """
+        if choice not in reports.ANALYSES:
+            print("Invalid choice. Please try again.")
+            return
 
-        conn = self.connect_to_db()
-        if conn is None:
+        analysis = reports.ANALYSES[choice]
+        print(f"\n--- {analysis['name']} ---")
+        if streaming and "summary" in analysis:
+            try:
+                with Database.connection() as conn:
+                    chunks = self.fetch_data(analysis["query"], conn, chunksize=chunk_size)
+                    if chunks is None:
+                        return
+                    summary = analytics.StreamingSummary(**analysis["summary"]).consume(chunks)
+            except Exception as e:
+                print(f"Error fetching data: {e}")
+                return
+            print(analysis["stream_report"](summary), end="")
+            analysis["stream_chart"](summary, plt.gca())
+            plt.show()
             return
 
-        if choice in analysis_functions:
-            analysis = analysis_functions[choice]
-            print(f"\n--- {analysis['name']} ---")
-            df = self.fetch_data(analysis["query"], conn)
-            if df is not None:
-                analysis["process"](df)
-        else:
-            print("Invalid choice. Please try again.")
+        try:
+            with Database.connection() as conn:
+                df = self.fetch_data(analysis["query"], conn)
+        except Exception as e:
+            print(f"Error connecting to the database: {e}")
+            return
+        if df is not None:
+            print(analysis["report"](df), end="")
+            analysis["chart"](df, plt.gca())
+            plt.show()
 
-        conn.close()
+    def render_reports(self, output_dir=reports.REPORTS_DIR, workers=None, streaming=False):
+        """
+        Write all analyses and charts to files without a display; see reports.render_reports.
+        """
+        try:
+            manifest = reports.render_reports(output_dir, workers=workers, streaming=streaming)
+        except Exception as e:
+            print(f"Error rendering reports: {e}")
+            return None
+        for entry in manifest['reports']:
+            if 'error' in entry:
+                print(entry['error'])
+        print(f"Wrote {len(manifest['reports'])} reports to {output_dir} in {manifest['seconds']:.1f} s.")
+        return manifest
+
+    def rebuild_analytics(self):
+        """
+        Recompute the dashboard totals from the source tables, e.g. after an
+        upgrade or after rows were loaded outside the application.
+        """
+        try:
+            groups = aggregates.rebuild()
+            for metric, count in groups.items():
+                print(f"{metric}: {count} groups")
+            print("Analytics totals rebuilt.")
+            return groups
+        except Exception as e:
+            print(f"Error rebuilding analytics totals: {e}")
+            return None
+
+    def check_analytics(self):
+        """
+        Compare the dashboard totals with the source tables and print any differences.
+        """
+        try:
+            mismatches = aggregates.check()
+        except Exception as e:
+            print(f"Error checking analytics totals: {e}")
+            return None
+        if not mismatches:
+            print("Analytics totals match the source tables.")
+        for metric, key, stored, actual in mismatches:
+            print(f"{metric} [{key}]: stored {stored[0]} rows / {stored[1]}, actual {actual[0]} rows / {actual[1]}")
+        if mismatches:
+            print(f"{len(mismatches)} groups differ; run rebuild_analytics() to fix them.")
+        return mismatches
 
     # Other methods in the Admin class
     def add_user(self, username, password, role, phone_number=None, age=None, gender=None, salary=None, profession=None, department=None, chronic_disease=None):
         return self.signup(username, password, role, phone_number, age, gender, salary, profession, department, chronic_disease)
 
     def remove_user(self, username):
-        connection = Database()
-        if connection:
-            cursor = connection.cursor()
-            try:
+        try:
+            with Database.connection() as connection:
+                cursor = connection.cursor()
                 cursor.execute("DELETE FROM Users WHERE Username = ?", (username,))
                 connection.commit()
-                print(f"User {username} removed successfully.")
-                return True
-            except Exception as e:
-                print(f"Error removing user: {e}")
-                return False
-            finally:
-                connection.close()
-        return False
+            auth.get_service().invalidate([username])
+            print(f"User {username} removed successfully.")
+            return True
+        except Exception as e:
+            print(f"Error removing user: {e}")
+            return False
 
     def update_pharmacy_inventory(self, medication, stock):
         pharmacy = Pharmacy()
@@ -309,15 +287,41 @@ class Admin(User):
         pharmacy = Pharmacy()
         pharmacy.view_inventory()
 
+    def view_purchase_list(self, output_file=None, limit=20):
+        """
+        Print the medications to reorder, from forecast.DemandForecast, and
+        optionally write the whole list to a CSV file.
+        """
+        try:
+            purchases = forecast.DemandForecast().purchase_list()
+        except Exception as e:
+            print(f"Error forecasting demand: {e}")
+            return None
+        if purchases.empty:
+            print("Nothing needs reordering.")
+        else:
+            print(f"Suggested purchases ({len(purchases)} medications):")
+            for row in purchases.head(limit).itertuples():
+                supplier = f" from {row.Supplier} (rating {row.SupplierRating:.1f})" if pd.notna(row.Supplier) else ""
+                print(f"{row.MedicationName}: order {row.OrderQuantity} units{supplier}; stock {row.Stock}, "
+                      f"reorder point {row.ReorderPoint:.0f}, {row.DailyDemand:.1f} units/day")
+        if output_file:
+            purchases.to_csv(output_file)
+            print(f"Purchase list written to {output_file}.")
+        return purchases
+
     def view_financial_insights(self):
         finance = Finance()
-        transactions = finance.load_transactions()
-        
-        if not transactions:
+        try:
+            df = pd.DataFrame(finance.load_transactions())
+        except Exception as e:
+            print(f"Error loading financial transactions: {e}")
+            return
+
+        if df.empty:
             print("No financial transactions available.")
             return
 
-        df = pd.DataFrame(transactions)
         print(df)
 
         if 'Transaction Type' not in df.columns or 'Amount' not in df.columns:
@@ -325,9 +329,7 @@ class Admin(User):
             return
 
         try:
-            fig = px.bar(df, x='Transaction Type', y='Amount', title='Financial Transactions', color='Transaction Type', barmode='group')
-            fig.update_layout(xaxis_title='Transaction Type', yaxis_title='Total Amount', title_x=0.5)
-            fig.show()
+            reports.financial_figure(df).show()
         except Exception as e:
             print(f"An error occurred while generating financial insights: {e}")
 
@@ -341,51 +343,42 @@ class Admin(User):
         hospital.add_room(room_number, room_type)
 
     def view_all_users(self):
-        connection = Database()
-        if connection:
-            cursor = connection.cursor()
-            try:
+        try:
+            with Database.connection() as connection:
+                cursor = connection.cursor()
                 cursor.execute("SELECT * FROM Users")
                 rows = cursor.fetchall()
-                for row in rows:
-                    print(f"Username: {row.Username}")
-                    print(f"  Role: {row.Role}")
-                    print(f"  Phone Number: {row.PhoneNumber}")
-                    print(f"  Age: {row.Age}")
-                    print(f"  Gender: {row.Gender}")
-                    print(f"  Salary: {row.Salary}")
-                    print(f"  Profession: {row.Profession}")
-                    print(f"  Department: {row.Department}")
-                    print(f"  Chronic Disease: {row.ChronicDisease}")
-                    print(f"  Nationality: {row.Nationality}")
-                    print()
-            except Exception as e:
-                print(f"Error viewing users: {e}")
-            finally:
-                connection.close()
+            for row in rows:
+                print(f"Username: {row.Username}")
+                print(f"  Role: {row.Role}")
+                print(f"  Phone Number: {row.PhoneNumber}")
+                print(f"  Age: {row.Age}")
+                print(f"  Gender: {row.Gender}")
+                print(f"  Salary: {row.Salary}")
+                print(f"  Profession: {row.Profession}")
+                print(f"  Department: {row.Department}")
+                print(f"  Chronic Disease: {row.ChronicDisease}")
+                print(f"  Nationality: {row.Nationality}")
+                print()
+        except Exception as e:
+            print(f"Error viewing users: {e}")
 
     def view_users_as_dataframe(self):
-        connection = Database()
-        if connection:
-            cursor = connection.cursor()
-            try:
+        try:
+            with Database.connection() as connection:
+                cursor = connection.cursor()
                 cursor.execute("SELECT * FROM Users")
                 rows = cursor.fetchall()
-                users_df = pd.DataFrame.from_records(rows, columns=[column[0] for column in cursor.description])
-                users_df.index.name = 'Username'
-                users_df.reset_index(inplace=True)
-                
-                print(users_df.to_string(index=False))
+                columns = [column[0] for column in cursor.description]
+            users_df = pd.DataFrame.from_records(rows, columns=columns)
 
-                fig = px.bar(users_df, x='Username', y='age', color='role', title='User Details by Age and Role', barmode='group')
-                fig.update_layout(xaxis_title='Username', yaxis_title='Age', title_x=0.5)
-                fig.show()
+            print(users_df.to_string(index=False))
 
-                return users_df
-            except Exception as e:
-                print(f"Error viewing users: {e}")
-            finally:
-                connection.close()
+            reports.users_figure(users_df).show()
+
+            return users_df
+        except Exception as e:
+            print(f"Error viewing users: {e}")
         return pd.DataFrame()
 
     def analyze_workforce_distribution(self):
@@ -412,77 +405,25 @@ class Admin(User):
 
     def search(self):
         query = input("Enter your search query: ")
-        conn = Database()  
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT Username, Role, Specialization, PhoneNumber 
-            FROM Staff 
-            WHERE Username LIKE ? OR Role LIKE ? OR Specialization LIKE ?
-        """, (f"%{query}%", f"%{query}%", f"%{query}%"))
-        staff = cursor.fetchall()
-        for staff_member in staff:
-            print("Staff member found:")
-            print("Username:", staff_member[0])
-            print("Role:", staff_member[1])
-            print("Specialization:", staff_member[2])
-            print("Contact:", staff_member[3])
-            print("------")
-
-        cursor.execute("""
-            SELECT Username, Age, Gender, GeographicLocation 
-            FROM Patient 
-            WHERE Username LIKE ? OR Gender LIKE ? OR GeographicLocation LIKE ?
-        """, (f"%{query}%", f"%{query}%", f"%{query}%"))
-        patients = cursor.fetchall()
-        for patient in patients:
-            print("Patient found:")
-            print("Username:", patient[0])
-            print("Age:", patient[1])
-            print("Gender:", patient[2])
-            print("Geographic Location:", patient[3])
-            print("------")
-
-        cursor.execute("""
-            SELECT MedicationName, Stock, Price 
-            FROM PharmacyInventory 
-            WHERE MedicationName LIKE ? OR Stock LIKE ? OR Price LIKE ?
-        """, (f"%{query}%", f"%{query}%", f"%{query}%"))
-        pharmacy = cursor.fetchall()
-        for item in pharmacy:
-            print("Pharmacy item found:")
-            print("Medication Name:", item[0])
-            print("Stock:", item[1])
-            print("Price:", item[2])
-            print("------")
-
-        cursor.execute("""
-            SELECT DepartmentName, Description 
-            FROM Departments 
-            WHERE DepartmentName LIKE ? OR Description LIKE ?
-        """, (f"%{query}%", f"%{query}%", f"%{query}%"))
-        departments = cursor.fetchall()
-        for department in departments:
-            print("Department found:")
-            print("Department Name:", department[0])
-            print("Description:", department[1])
-            print("------")
-
-        cursor.execute("""
-            SELECT TransactionType, Amount, Balance, TransactionDate 
-            FROM FinancialTransactions 
-            WHERE TransactionType LIKE ? OR Amount LIKE ? OR Balance LIKE ?
-        """, (f"%{query}%", f"%{query}%", f"%{query}%"))
-        transactions = cursor.fetchall()
-        for transaction in transactions:
-            print("Financial Transaction found:")
-            print("Transaction Type:", transaction[0])
-            print("Amount:", transaction[1])
-            print("Balance:", transaction[2])
-            print("Transaction Date:", transaction[3])
-            print("------")
-
-        conn.close()
+        try:
+            index = Search.get_index()
+        except Exception as e:
+            print(f"Error building search index: {e}")
+            return
+
+        offset = 0
+        while True:
+            hits, total = index.search(query, limit=Search.PAGE_SIZE, offset=offset)
+            for hit in hits:
+                print(f"{SEARCH_LABELS[hit.entity]} found:")
+                for column, value in hit.fields.items():
+                    print(f"{SEARCH_FIELD_LABELS.get(column, column)}:", value)
+                print("------")
+            offset += len(hits)
+            if offset >= total:
+                break
+            if input(f"Showing {offset} of {total} results. Show more? (y/n): ").strip().lower() != 'y':
+                break
 
 
 
@@ -494,64 +435,63 @@ class Doctor(User):
         super().__init__(username, password, 'doctor')
 
     def view_appointments(self):
-        appointments = Appointment.load_appointments()
-        for appointment_id, details in appointments.items():
-            if details['doctor'] == self.username:
+        next_key = None
+        while True:
+            appointments, next_key = Appointment.find_appointments(doctor=self.username, after=next_key)
+            for appointment_id, details in appointments.items():
                 print(f"Appointment {appointment_id}: {details}")
+            if next_key is None:
+                break
 
     def write_prescriptions(self, patient, prescription):
-        prescriptions = self.load_prescriptions()
-        if patient not in prescriptions:
-            prescriptions[patient] = []
-        prescriptions[patient].append(prescription)
-        self.save_prescriptions(prescriptions)
-        print(f"Prescription for {patient} added.")
+        try:
+            open_store(PRESCRIPTIONS_PATH).append(patient, prescription)
+            print(f"Prescription for {patient} added.")
+        except (OSError, ValueError) as e:
+            print(f"Error saving prescriptions: {e}")
 
     def load_prescriptions(self):
         try:
-            if os.path.exists('data/prescriptions.txt') and os.path.getsize('data/prescriptions.txt') > 0:
-                with open('data/prescriptions.txt', 'r') as file:
-                    return json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+            return open_store(PRESCRIPTIONS_PATH).to_dict()
+        except (OSError, ValueError) as e:
             print(f"Error loading prescriptions: {e}")
         return {}
 
     def save_prescriptions(self, prescriptions):
         try:
-            with open('data/prescriptions.txt', 'w') as file:
-                json.dump(prescriptions, file)
-        except IOError as e:
+            open_store(PRESCRIPTIONS_PATH).replace_all(prescriptions)
+        except (OSError, ValueError) as e:
             print(f"Error saving prescriptions: {e}")
 
     def view_patient_records(self, patient):
-        records = self.load_patient_records()
-        if patient in records:
-            print(f"Patient Records for {patient}: {records[patient]}")
+        try:
+            records = open_store(PATIENT_RECORDS_PATH).get(patient)
+        except (OSError, ValueError) as e:
+            print(f"Error loading patient records: {e}")
+            return
+        if records:
+            print(f"Patient Records for {patient}: {records}")
         else:
             print(f"No records found for patient {patient}.")
 
     def add_patient_record(self, patient, record):
-        records = self.load_patient_records()
-        if patient not in records:
-            records[patient] = []
-        records[patient].append(record)
-        self.save_patient_records(records)
-        print(f"Record added for patient {patient}.")
+        try:
+            open_store(PATIENT_RECORDS_PATH).append(patient, record)
+            print(f"Record added for patient {patient}.")
+        except (OSError, ValueError) as e:
+            print(f"Error saving patient records: {e}")
 
     def load_patient_records(self):
         try:
-            if os.path.exists('data/patient_records.txt') and os.path.getsize('data/patient_records.txt') > 0:
-                with open('data/patient_records.txt', 'r') as file:
-                    return json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+            return open_store(PATIENT_RECORDS_PATH).to_dict()
+        except (OSError, ValueError) as e:
             print(f"Error loading patient records: {e}")
         return {}
 
     def save_patient_records(self, records):
         try:
-            with open('data/patient_records.txt', 'w') as file:
-                json.dump(records, file)
-        except IOError as e:
+            open_store(PATIENT_RECORDS_PATH).replace_all(records)
+        except (OSError, ValueError) as e:
             print(f"Error saving patient records: {e}")
 
     def record_treatment_data(self, patient, condition, length_of_stay, readmission):
@@ -589,15 +529,21 @@ class Patient(User):
         self.finance = Finance()
 
     def view_appointments(self):
-        appointments = Appointment.load_appointments()
-        for appointment_id, details in appointments.items():
-            if details['patient'] == self.username:
+        next_key = None
+        while True:
+            appointments, next_key = Appointment.find_appointments(patient=self.username, after=next_key)
+            for appointment_id, details in appointments.items():
                 print(f"Appointment {appointment_id}: {details}")
+            if next_key is None:
+                break
 
     def request_appointments(self, doctor, date, time, room, department):
         appointment = Appointment(doctor, self.username, date, time, room, department)
-        appointment.book_appointment()
-        self.finance.pay_for_appointment(self.username)
+        appointment_id = appointment.book_appointment()
+        # A refused booking (slot taken or an error) is not charged.
+        if appointment_id is not None:
+            self.finance.pay_for_appointment(self.username)
+        return appointment_id
 
     def provide_feedback(self, feedback):
         feedback_data = self.load_feedback()
@@ -615,24 +561,29 @@ class Receptionist(User):
 
     def book_appointments(self, doctor, patient, date, time, room, department):
         appointment = Appointment(doctor, patient, date, time, room, department)
-        appointment.book_appointment()
+        return appointment.book_appointment()
 
     def cancel_appointments(self, appointment_id):
-        conn = pyodbc.connect('DRIVER={SQL Server};SERVER=DESKTOP-MA8DP5U;DATABASE=HospitalManagement;UID=your_username;PWD=your_password')
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            DELETE FROM Appointments
-            WHERE AppointmentID = ?
-        """, appointment_id)
-        conn.commit()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT Department FROM Appointments WHERE AppointmentID = ?", (appointment_id,))
+            row = cursor.fetchone()
+            cursor.execute("""
+                DELETE FROM Appointments
+                WHERE AppointmentID = ?
+            """, (appointment_id,))
+            if row is not None and cursor.rowcount > 0:
+                aggregates.record(cursor, 'appointments_by_department', row.Department, entries=-1)
+            conn.commit()
+        schedule.forget_appointment(appointment_id)
         print(f"Appointment {appointment_id} cancelled.")
-        
-        conn.close()
 
     def allocate_room(self, hospital, room_type):
         hospital.allocate_room(room_type)
 
+    def allocate_rooms(self, hospital, room_type, count):
+        hospital.allocate_rooms(room_type, count)
+
     def release_room(self, hospital, room_number):
         hospital.release_room(room_number)
 
@@ -659,17 +610,14 @@ class Nurse(User):
         return records
 
     def load_patient_records(self):
-        conn = pyodbc.connect('DRIVER={SQL Server};SERVER=your_server_name;DATABASE=HospitalManagement;UID=your_username;PWD=your_password')
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM PatientRecords")
         records = []
-        for row in cursor:
-            records.append({
-                'RecordID': row.RecordID,
-                'Patient': row.Patient,
-                'Record': row.Record
-            })
-        
-        conn.close()
+        with Database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM PatientRecords")
+            for row in cursor:
+                records.append({
+                    'RecordID': row.RecordID,
+                    'Patient': row.Patient,
+                    'Record': row.Record
+                })
         return records
\ No newline at end of file
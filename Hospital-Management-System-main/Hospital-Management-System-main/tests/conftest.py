@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import modules.database as database
+import modules.schedule as schedule
+import modules.search as search
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    Point modules.database at a fresh SQLite database for one test, with the
+    process-wide booking and search indexes starting empty.
+    """
+    monkeypatch.setattr(schedule, "_index", None)
+    monkeypatch.setattr(search, "_index", None)
+    path = str(tmp_path / "hospital.db")
+    pool = database.configure_backend("sqlite", sqlite_path=path, size=2)
+    yield path
+    pool.close()
+
+
+def execute(query, params=()):
+    """
+    Run one statement on the test database and commit it.
+    """
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        conn.commit()
+
+
+def fetchall(query, params=()):
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return [tuple(row) for row in cursor.fetchall()]
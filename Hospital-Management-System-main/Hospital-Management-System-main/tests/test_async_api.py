@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+
+from modules.async_api import BoundedExecutor, ServiceBusy
+
+
+def test_executor_serves_successive_event_loops_under_contention():
+    executor = BoundedExecutor(max_workers=1, max_pending=1)
+
+    async def burst():
+        return await asyncio.gather(*(executor.run(pow, i, 2) for i in range(5)))
+
+    try:
+        assert asyncio.run(burst()) == [0, 1, 4, 9, 16]
+        assert asyncio.run(burst()) == [0, 1, 4, 9, 16]
+        assert executor.stats()['completed'] == 10
+    finally:
+        executor.shutdown()
+
+
+def test_cancelled_call_keeps_its_slot_until_the_worker_finishes():
+    executor = BoundedExecutor(max_workers=1, max_pending=1, admission_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+
+    async def scenario():
+        caller = asyncio.ensure_future(executor.run(blocking))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+
+        # The worker is still busy, so there is still no capacity.
+        with pytest.raises(ServiceBusy):
+            await executor.run(pow, 2, 2)
+        assert executor.stats()['pending'] == 1
+
+        release.set()
+        return await executor.run(pow, 2, 2)
+
+    try:
+        assert asyncio.run(scenario()) == 4
+        assert executor.stats()['pending'] == 0
+    finally:
+        release.set()
+        executor.shutdown()
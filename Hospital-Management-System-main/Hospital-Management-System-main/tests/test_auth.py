@@ -0,0 +1,38 @@
+from modules.auth import AuthService
+from modules.user import USER_COLUMNS
+
+from conftest import execute
+
+
+def add_user(username, password, role):
+    values = dict.fromkeys(USER_COLUMNS)
+    values.update(Username=username, Password=password, Role=role)
+    execute(f"INSERT INTO Users ({', '.join(USER_COLUMNS)}) VALUES ({', '.join('?' for _ in USER_COLUMNS)})",
+            [values[column] for column in USER_COLUMNS])
+
+
+def test_password_changed_elsewhere_takes_effect_at_the_next_login(db):
+    add_user("drhouse", "old", "Doctor")
+    service = AuthService()
+    assert service.authenticate("drhouse", "old")["role"] == "Doctor"
+
+    execute("UPDATE Users SET Password = 'new' WHERE Username = 'drhouse'")
+    assert service.authenticate("drhouse", "old") is None
+    assert service.authenticate("drhouse", "new") is not None
+
+
+def test_deleted_user_cannot_log_in_with_a_cached_profile(db):
+    add_user("drhouse", "secret", "Doctor")
+    service = AuthService()
+    assert service.role("drhouse") == "doctor"
+
+    execute("DELETE FROM Users WHERE Username = 'drhouse'")
+    assert service.authenticate("drhouse", "secret") is None
+    assert len(service) == 0
+
+
+def test_cached_profiles_hold_no_password(db):
+    add_user("nurse1", "secret", "Nurse")
+    service = AuthService(cache_size=1)
+    assert "password" not in service.lookup("nurse1")
+    assert "password" not in service.authenticate("nurse1", "secret")
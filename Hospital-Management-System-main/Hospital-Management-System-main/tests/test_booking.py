@@ -0,0 +1,36 @@
+import modules.schedule as schedule
+from modules.ledger import Ledger
+from modules.user import Patient, Receptionist
+
+from conftest import fetchall
+
+
+def test_refused_appointment_request_is_not_charged(db):
+    patient = Patient("jdoe", "secret")
+    first = patient.request_appointments("drhouse", "2030-01-07", "10:00", "101", "Diagnostics")
+    assert first is not None
+
+    # Same doctor and slot: the booking is refused and nothing is charged.
+    assert patient.request_appointments("drhouse", "2030-01-07", "10:00", "102", "Diagnostics") is None
+
+    assert fetchall("SELECT COUNT(*) FROM Appointments") == [(1,)]
+    assert fetchall("SELECT COUNT(*) FROM FinancialTransactions WHERE Patient = 'jdoe'") == [(1,)]
+    assert Ledger().get_balance("jdoe") == -200
+
+
+def test_receptionist_booking_returns_the_result(db):
+    receptionist = Receptionist("desk", "secret")
+    assert receptionist.book_appointments("drhouse", "jdoe", "2030-01-07", "10:00", "101", "Diagnostics") is not None
+    assert receptionist.book_appointments("drhouse", "asmith", "2030-01-07", "10:00", "102", "Diagnostics") is None
+    assert fetchall("SELECT COUNT(*) FROM FinancialTransactions") == [(0,)]
+
+
+def test_int_room_conflicts_with_a_stored_booking(db):
+    receptionist = Receptionist("desk", "secret")
+    assert receptionist.book_appointments("drhouse", "jdoe", "2030-01-07", "10:00", 101, "Diagnostics") is not None
+    assert receptionist.book_appointments("drwilson", "asmith", "2030-01-07", "10:00", 101, "Oncology") is None
+
+    # A fresh index loads the booking from Appointments, where Room is text.
+    schedule.reset_index()
+    assert receptionist.book_appointments("drcuddy", "bjones", "2030-01-07", "10:15", 101, "Oncology") is None
+    assert fetchall("SELECT COUNT(*) FROM Appointments") == [(1,)]
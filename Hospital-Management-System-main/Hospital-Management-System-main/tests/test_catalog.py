@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from modules.catalog import CatalogError, CatalogLoader, iter_catalog
+
+from conftest import execute, fetchall
+
+
+def write(path, catalog):
+    with open(path, "w") as file:
+        file.write(catalog if isinstance(catalog, str) else json.dumps(catalog))
+    return str(path)
+
+
+def inventory():
+    return fetchall("SELECT MedicationName, Stock, Price FROM PharmacyInventory ORDER BY MedicationName")
+
+
+def test_iter_catalog_reads_objects_and_arrays_in_small_reads(tmp_path):
+    entries = {"Aspirin": {"price": 10.0, "stock": 100}, "Ibuprofen é": {"price": "15.50"}}
+    assert list(iter_catalog(write(tmp_path / "object.json", entries), read_size=7)) == list(entries.items())
+
+    array = [{"name": "Aspirin", "price": 10.0}]
+    assert list(iter_catalog(write(tmp_path / "array.json", array), read_size=3)) == [("Aspirin", array[0])]
+
+    with pytest.raises(CatalogError):
+        list(iter_catalog(write(tmp_path / "scalar.json", "42")))
+
+
+def test_only_the_differences_are_written(db, tmp_path):
+    execute("INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES ('Aspirin', 7, 10.00)")
+    execute("INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES ('Ibuprofen', 3, 15.00)")
+    path = write(tmp_path / "catalog.json", {
+        "Aspirin": {"price": 10.0, "stock": 100},
+        "Ibuprofen": {"price": 16.25, "stock": 50},
+        "Metformin": {"price": 12, "stock": 60},
+        "Broken": {"price": "n/a"},
+    })
+
+    stats = CatalogLoader(chunk_size=2).run(path)
+
+    assert (stats['unchanged'], stats['price_changes'], stats['new'], stats['invalid']) == (1, 1, 1, 1)
+    # Stock of known medications is the pharmacy's count, not the catalog's.
+    assert inventory() == [("Aspirin", 7, 10), ("Ibuprofen", 3, 16.25), ("Metformin", 60, 12)]
+    assert fetchall("SELECT OldPrice, NewPrice FROM PriceHistory ORDER BY NewPrice") == [(None, 12), (15, 16.25)]
+
+    again = CatalogLoader().run(path)
+    assert (again['unchanged'], again['price_changes'], again['new']) == (3, 0, 0)
+
+
+def test_dry_run_reports_the_delta_without_writing(db, tmp_path):
+    execute("INSERT INTO PharmacyInventory (MedicationName, Stock, Price) VALUES ('Aspirin', 7, 10.00)")
+    path = write(tmp_path / "catalog.json", [
+        {"name": "Aspirin", "price": 11},
+        {"name": "Metformin", "price": 12},
+        {"name": "Metformin", "price": 12},
+    ])
+
+    stats = CatalogLoader(chunk_size=1).run(path, dry_run=True)
+
+    assert (stats['price_changes'], stats['new'], stats['unchanged']) == (1, 1, 1)
+    assert inventory() == [("Aspirin", 7, 10)]
+    assert fetchall("SELECT COUNT(*) FROM PriceHistory") == [(0,)]
@@ -0,0 +1,12 @@
+from modules.completion import CompletionIndex, NationalitiesSource
+
+
+def test_nationalities_load_from_any_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert "Egyptian" in NationalitiesSource().load()
+
+
+def test_prefix_matches_ignore_case():
+    index = CompletionIndex(["Egyptian", "egyptologist", "English", "", "Eritrean"])
+    assert index.matches("EG") == ["Egyptian", "egyptologist"]
+    assert index.matches("x") == []
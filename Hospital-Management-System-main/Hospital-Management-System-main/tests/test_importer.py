@@ -0,0 +1,98 @@
+import os
+import shutil
+
+from modules.importer import TransactionImporter
+from modules.ledger import Ledger
+
+from conftest import fetchall
+
+LEDGER = """Patient,Transaction Type,Amount,Balance
+alice,Deposit,100,100
+alice,Appointment Payment,-100,0
+alice,Deposit,100,100
+bob,Medication Payment (Aspirin),-30,-30
+"""
+
+
+def write(path, text):
+    with open(path, "w", newline="") as file:
+        file.write(text)
+    return str(path)
+
+
+def balances():
+    return fetchall("SELECT Patient, Balance FROM FinancialTransactions ORDER BY TransactionID")
+
+
+def test_repeated_transactions_are_all_imported(db, tmp_path):
+    stats = TransactionImporter().run(write(tmp_path / "ledger.csv", LEDGER))
+
+    assert (stats['imported'], stats['duplicates'], stats['headers']) == (4, 0, 1)
+    assert balances() == [("alice", 100), ("alice", 0), ("alice", 100), ("bob", -30)]
+    assert Ledger().get_balance("alice") == 100
+
+
+def test_stored_balance_follows_the_ledger_not_the_file(db, tmp_path):
+    Ledger().post_transaction("alice", "Deposit", 50)
+    TransactionImporter().run(write(tmp_path / "ledger.csv", LEDGER))
+
+    assert balances()[1:] == [("alice", 150), ("alice", 50), ("alice", 150), ("bob", -30)]
+    assert Ledger().get_balance("alice") == 150
+
+
+def test_same_file_delivered_again_is_skipped(db, tmp_path):
+    path = write(tmp_path / "ledger.csv", LEDGER)
+    TransactionImporter().run(path)
+    again = TransactionImporter().run(path, resume=False)
+    copy = TransactionImporter().run(shutil.copy(path, tmp_path / "redelivered.csv"))
+
+    assert (again['imported'], again['duplicates']) == (0, 4)
+    assert (copy['imported'], copy['duplicates']) == (0, 4)
+    assert Ledger().get_balance("alice") == 100
+
+
+def test_resume_continues_after_the_last_committed_chunk(db, tmp_path):
+    path = write(tmp_path / "ledger.csv", LEDGER)
+
+    def interrupt(stats):
+        if stats['imported'] == 2:
+            raise KeyboardInterrupt
+
+    try:
+        TransactionImporter(chunk_size=2, progress=interrupt).run(path)
+    except KeyboardInterrupt:
+        pass
+    assert len(balances()) == 2
+
+    stats = TransactionImporter(chunk_size=2).run(path)
+    assert stats['resumed']
+    assert (stats['imported'], stats['duplicates'], stats['headers']) == (4, 0, 1)
+    assert balances() == [("alice", 100), ("alice", 0), ("alice", 100), ("bob", -30)]
+    assert fetchall("SELECT Patient, Outstanding FROM Receivables ORDER BY Patient") == [("alice", 100), ("bob", 30)]
+
+
+def test_checkpoint_of_another_file_with_the_same_start_is_not_resumed(db, tmp_path):
+    rows = "Patient,Transaction Type,Amount,Balance\n" + "alice,Deposit,1,1\n" * 5000
+    path = write(tmp_path / "ledger.csv", rows + "bob,Deposit,7,7\n")
+
+    def interrupt(stats):
+        if stats['imported'] == 1000:
+            raise KeyboardInterrupt
+
+    try:
+        TransactionImporter(chunk_size=1000, progress=interrupt).run(path)
+    except KeyboardInterrupt:
+        pass
+
+    write(path, rows + "bob,Deposit,8,8\n")
+    stats = TransactionImporter(chunk_size=1000).run(path)
+    assert not stats['resumed']
+    assert (stats['imported'], stats['duplicates'], stats['headers']) == (4001, 1000, 1)
+    assert Ledger().get_balance("bob") == 8
+
+
+def test_invalid_lines_are_counted_not_imported(db, tmp_path):
+    stats = TransactionImporter().run(write(tmp_path / "ledger.csv", LEDGER + "carol,Deposit,abc,0\ncarol,Deposit\n"))
+    assert stats['invalid'] == 2
+    assert [line for line, _ in stats['rejects']] == [6, 7]
+    assert os.path.getsize(stats['source']) == stats['bytes_read']
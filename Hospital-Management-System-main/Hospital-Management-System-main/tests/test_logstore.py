@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+
+from modules.logstore import LogStore
+
+
+def test_append_get_and_reopen(tmp_path):
+    path = str(tmp_path / "records.txt")
+    store = LogStore(path, fsync=False)
+    store.append("alice", "aspirin")
+    store.append("bob", {"note": "x-ray"})
+    store.append("alice", "ibuprofen")
+    store.close()
+
+    reopened = LogStore(path, fsync=False)
+    assert reopened.get("alice") == ["aspirin", "ibuprofen"]
+    assert reopened.get("bob") == [{"note": "x-ray"}]
+    assert reopened.get("carol") == []
+
+
+def test_appends_from_another_store_are_picked_up(tmp_path):
+    path = str(tmp_path / "records.txt")
+    first, second = LogStore(path, fsync=False), LogStore(path, fsync=False)
+    first.append("alice", "aspirin")
+    second.append("alice", "ibuprofen")
+    assert first.get("alice") == ["aspirin", "ibuprofen"]
+
+
+def test_legacy_json_file_is_converted(tmp_path):
+    path = str(tmp_path / "records.txt")
+    with open(path, "w") as file:
+        json.dump({"alice": ["aspirin"]}, file)
+    assert LogStore(path, fsync=False).to_dict() == {"alice": ["aspirin"]}
+
+
+def test_torn_write_is_skipped(tmp_path):
+    path = str(tmp_path / "records.txt")
+    store = LogStore(path, fsync=False)
+    store.append("alice", "aspirin")
+    with open(path, "ab") as file:
+        file.write(b"0000 {\"patient\": \"al")
+
+    store = LogStore(path, fsync=False)
+    store.append("alice", "ibuprofen")
+    assert store.get("alice") == ["aspirin", "ibuprofen"]
+
+
+def test_append_compacts_once_dead_lines_dominate(tmp_path):
+    path = str(tmp_path / "records.txt")
+    store = LogStore(path, fsync=False, compact_ratio=0.5, compact_min_bytes=100)
+    store.append("alice", "aspirin")
+    with open(path, "ab") as file:
+        file.write(b"garbage line with a bad checksum\n" * 10)
+
+    store.append("alice", "ibuprofen")
+    with open(path, "rb") as file:
+        assert b"garbage" not in file.read()
+    assert store.get("alice") == ["aspirin", "ibuprofen"]
+
+
+def test_delete_compacts(tmp_path):
+    path = str(tmp_path / "records.txt")
+    store = LogStore(path, fsync=False, compact_ratio=0.5, compact_min_bytes=0)
+    for i in range(5):
+        store.append("alice", f"item {i}")
+    store.append("bob", "aspirin")
+    size = os.path.getsize(path)
+
+    store.delete("alice")
+    assert os.path.getsize(path) < size
+    assert store.to_dict() == {"bob": ["aspirin"]}
+    assert LogStore(path, fsync=False).to_dict() == {"bob": ["aspirin"]}
+
+
+def test_compaction_does_not_lose_appends_from_another_store(tmp_path):
+    path = str(tmp_path / "records.txt")
+    # compact_ratio=0 compacts on every append of the first store.
+    compacting = LogStore(path, fsync=False, compact_ratio=0, compact_min_bytes=0)
+    other = LogStore(path, fsync=False, compact_ratio=1, compact_min_bytes=1 << 30)
+
+    def append(store, patient):
+        for i in range(100):
+            store.append(patient, i)
+
+    threads = [threading.Thread(target=append, args=(compacting, "alice")),
+               threading.Thread(target=append, args=(other, "bob"))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reopened = LogStore(path, fsync=False)
+    assert reopened.get("alice") == list(range(100))
+    assert reopened.get("bob") == list(range(100))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
@@ -0,0 +1,86 @@
+import datetime
+
+from modules.pharmacy import Pharmacy
+
+from conftest import execute, fetchall
+
+
+def days(n):
+    return datetime.date.today() + datetime.timedelta(days=n)
+
+
+def lots():
+    return fetchall("SELECT LotNumber, Quantity FROM MedicationLots ORDER BY ExpiryDate")
+
+
+def stock():
+    return fetchall("SELECT Stock FROM PharmacyInventory WHERE MedicationName = 'Aspirin'")[0][0]
+
+
+def stocked_pharmacy():
+    pharmacy = Pharmacy()
+    pharmacy.update_inventory("Aspirin", 5, expiry_date=days(30), lot_number="B")
+    pharmacy.update_inventory("Aspirin", 5, expiry_date=days(10), lot_number="A")
+    pharmacy.update_inventory("Aspirin", 3, expiry_date=days(-1), lot_number="X")
+    execute("UPDATE PharmacyInventory SET Price = 2.5 WHERE MedicationName = 'Aspirin'")
+    pharmacy.load_inventory()
+    return pharmacy
+
+
+def test_dispensing_takes_the_first_expiring_usable_lot_first(db):
+    pharmacy = stocked_pharmacy()
+    pharmacy.dispense_medication("jdoe", "Aspirin", 6)
+
+    assert lots() == [("X", 3), ("B", 4)]
+    assert stock() == 7
+    assert fetchall("SELECT Amount FROM FinancialTransactions WHERE Patient = 'jdoe'") == [(-15,)]
+
+
+def test_unlotted_stock_is_taken_before_lots(db):
+    pharmacy = stocked_pharmacy()
+    pharmacy.update_inventory("Aspirin", 2)
+    pharmacy.dispense_medication("jdoe", "Aspirin", 3)
+
+    assert lots() == [("X", 3), ("A", 4), ("B", 5)]
+    assert stock() == 12
+
+
+def test_expired_lots_are_not_dispensed(db):
+    pharmacy = stocked_pharmacy()
+    pharmacy.dispense_medication("jdoe", "Aspirin", 11)
+
+    assert stock() == 13
+    assert lots() == [("X", 3), ("A", 5), ("B", 5)]
+    assert fetchall("SELECT COUNT(*) FROM FinancialTransactions") == [(0,)]
+
+
+def test_expired_lots_are_written_off(db):
+    pharmacy = stocked_pharmacy()
+    assert [row.LotNumber for row in pharmacy.expiring_lots()] == ["X"]
+    assert [row.LotNumber for row in pharmacy.expiring_lots(days=15)] == ["X", "A"]
+
+    assert pharmacy.remove_expired_lots() == 1
+    assert lots() == [("A", 5), ("B", 5)]
+    assert stock() == 10
+    assert pharmacy.inventory["Aspirin"]["stock"] == 10
+
+
+def test_removed_stock_comes_out_of_the_lots(db):
+    pharmacy = stocked_pharmacy()
+    pharmacy.update_inventory("Aspirin", 1)
+    pharmacy.update_inventory("Aspirin", -5)
+
+    assert lots() == [("A", 4), ("B", 5)]
+    assert stock() == 9
+
+    assert pharmacy.remove_expired_lots() == 0
+    assert stock() == 9
+
+
+def test_removing_more_than_is_on_hand_is_refused(db):
+    pharmacy = stocked_pharmacy()
+    pharmacy.update_inventory("Aspirin", -14)
+
+    assert stock() == 13
+    assert lots() == [("X", 3), ("A", 5), ("B", 5)]
+    assert pharmacy.inventory["Aspirin"]["stock"] == 13
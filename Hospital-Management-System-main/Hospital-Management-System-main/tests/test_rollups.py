@@ -0,0 +1,74 @@
+import datetime
+
+import numpy as np
+import pytest
+
+import modules.database as database
+import modules.rollups as rollups
+from modules.finance import Finance
+
+from conftest import execute, fetchall
+
+TODAY = datetime.date.today()
+LAST_MONTH = (TODAY.replace(day=1) - datetime.timedelta(days=1)).replace(day=1)
+
+
+def revenue(source, amount, day):
+    execute("INSERT INTO Revenue (Source, Amount, Date) VALUES (?, ?, ?)", (source, amount, day.isoformat()))
+
+
+def test_period_starts():
+    days = np.array(['2024-02-29', '2024-03-03', '2024-03-04'], dtype='datetime64[D]')
+    assert rollups.period_starts(days, 'week').astype(str).tolist() == ['2024-02-26', '2024-02-26', '2024-03-04']
+    assert rollups.period_starts(days, 'month').astype(str).tolist() == ['2024-02-01', '2024-03-01', '2024-03-01']
+    assert rollups.next_period(np.array(['2024-12-01'], dtype='datetime64[D]'), 'month').astype(str).tolist() == ['2025-01-01']
+    with pytest.raises(ValueError):
+        rollups.period_starts(days, 'quarter')
+
+
+def test_report_sums_day_buckets_per_period(db):
+    revenue('insurance', 100, LAST_MONTH)
+    revenue('insurance', 50.25, LAST_MONTH + datetime.timedelta(days=3))
+    revenue('government', 10, LAST_MONTH)
+    rollups.rebuild()
+    Finance().track_revenue('insurance', 20)
+
+    report = rollups.FinancialRollups().report('source', 'month')
+
+    this_month = TODAY.replace(day=1)
+    assert report.reset_index()[['PeriodStart', 'Source', 'Entries', 'Revenue']].values.tolist() == [
+        [np.datetime64(LAST_MONTH, 'ns'), 'government', 1, 10.0],
+        [np.datetime64(LAST_MONTH, 'ns'), 'insurance', 2, 150.25],
+        [np.datetime64(this_month, 'ns'), 'insurance', 1, 20.0],
+    ]
+
+
+def test_closed_periods_are_cached_until_rebuilt(db):
+    revenue('insurance', 100, LAST_MONTH)
+    rollups.rebuild()
+    engine = rollups.FinancialRollups()
+    assert engine.report('source', 'month')['Revenue'].sum() == 100
+    assert fetchall("SELECT Period, PeriodStart FROM ClosedPeriods") == [('month', LAST_MONTH.isoformat())]
+
+    # Written behind the rollups' back: the closed month is served from PeriodTotals.
+    revenue('insurance', 1, LAST_MONTH)
+    assert engine.report('source', 'month')['Revenue'].sum() == 100
+
+    rollups.rebuild()
+    assert engine.report('source', 'month')['Revenue'].sum() == 101
+
+
+def test_closed_days_cannot_be_recorded(db):
+    with database.connection() as conn:
+        with pytest.raises(ValueError):
+            rollups.record(conn.cursor(), 'source', 'insurance', TODAY - datetime.timedelta(days=1), revenue=1)
+
+
+def test_profit_combines_revenue_and_costs(db):
+    finance = Finance()
+    finance.track_revenue('insurance', 300)
+    finance.track_costs('salaries', 120.5)
+
+    profit = rollups.FinancialRollups().profit('day')
+
+    assert profit.values.tolist() == [[300.0, 120.5, 179.5]]
@@ -0,0 +1,64 @@
+import sqlite3
+
+import modules.database as database
+from modules.search import SearchIndex
+
+from conftest import execute
+
+
+def names(index, query, entity):
+    hits, _ = index.search(query, entities=[entity], limit=100)
+    return sorted(hit.fields[index.entities[entity]['searched'][0]] for hit in hits)
+
+
+def test_refresh_picks_up_new_and_changed_staff_and_patients(db):
+    execute("INSERT INTO Staff (Username, Role, Specialization) VALUES ('drhouse', 'doctor', 'Diagnostics')")
+    index = SearchIndex()
+    index.rebuild()
+    assert names(index, 'drhouse', 'staff') == ['drhouse']
+
+    execute("INSERT INTO Staff (Username, Role, Specialization) VALUES ('drwilson', 'doctor', 'Oncology')")
+    execute("INSERT INTO Patient (Username, Age, Gender) VALUES ('jdoe', 40, 'Female')")
+    execute("UPDATE Staff SET Specialization = 'Nephrology' WHERE Username = 'drhouse'")
+    assert index.refresh() == 3
+
+    assert names(index, 'drwilson', 'staff') == ['drwilson']
+    assert names(index, 'jdoe', 'patient') == ['jdoe']
+    assert names(index, 'nephro', 'staff') == ['drhouse']
+    assert names(index, 'diagnostics', 'staff') == []
+
+
+def test_refresh_drops_deleted_rows(db):
+    execute("INSERT INTO Departments (DepartmentName, Description) VALUES ('Cardiology', 'Heart')")
+    execute("INSERT INTO Departments (DepartmentName, Description) VALUES ('Neurology', 'Brain')")
+    index = SearchIndex()
+    index.rebuild()
+
+    execute("DELETE FROM Departments WHERE DepartmentName = 'Cardiology'")
+    # A row added after the delete must not hide it by restoring the row count.
+    execute("INSERT INTO Departments (DepartmentName, Description) VALUES ('Oncology', 'Cancer')")
+    index.refresh()
+
+    assert names(index, 'ology', 'department') == ['Neurology', 'Oncology']
+    assert len(index) == 2
+
+
+def test_sqlite_database_without_change_versions_is_upgraded(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Staff (StaffID INTEGER PRIMARY KEY AUTOINCREMENT, Username VARCHAR(50) NOT NULL, "
+                 "Role VARCHAR(50) NOT NULL, Specialization VARCHAR(100), Shift VARCHAR(50), OvertimeHours INT, "
+                 "Certifications TEXT, TrainingPrograms TEXT)")
+    conn.execute("INSERT INTO Staff (Username, Role) VALUES ('nurse1', 'nurse')")
+    conn.commit()
+    conn.close()
+
+    pool = database.configure_backend("sqlite", sqlite_path=path, size=2)
+    try:
+        index = SearchIndex()
+        index.rebuild()
+        execute("UPDATE Staff SET Specialization = 'Pediatrics' WHERE Username = 'nurse1'")
+        assert index.refresh() == 1
+        assert names(index, 'pediatrics', 'staff') == ['nurse1']
+    finally:
+        pool.close()